@@ -0,0 +1,377 @@
+# File: alert_dispatcher.py
+"""
+Non-blocking alert delivery (email, Slack, desktop) off the monitoring loop.
+
+Callers only enqueue:
+
+    dispatcher = AlertDispatcher({
+        "email": EmailChannel(SMTPPool("smtp.gmail.com", 587, user, pw), user, [to]),
+        "slack": WebhookChannel(SLACK_WEBHOOK_URL),
+    })
+    dispatcher.submit("email", "Drawdown Alert: NAS100 #1", "Max drawdown -5.2%", key="NAS100|1")
+
+- A coordinator thread coalesces alerts per channel: the first alert opens
+  a COALESCE_SECS window and everything raised for that channel before it
+  closes goes out as one message. Alerts with the same key inside a window
+  collapse into the latest one (with a repeat count).
+- WORKERS threads deliver batches. Each channel is rate limited to
+  RATE_PER_MINUTE messages and a failed send is retried MAX_RETRIES times
+  with exponential backoff.
+- SMTPPool keeps logged-in SMTP connections open between messages
+  (STARTTLS + login once per connection, NOOP-checked after IDLE_SECS and
+  reopened if the server dropped them).
+- submit() never blocks: when the queue is full the alert is dropped and
+  counted. Pending alerts are delivered at interpreter exit (close() is
+  registered with atexit), so `sys.exit()` right after an alert still
+  sends it.
+
+A channel is any callable taking a list of Alert tuples.
+"""
+
+import atexit
+import json
+import os
+import queue
+import smtplib
+import threading
+import time
+import urllib.request
+from collections import namedtuple
+from email.message import EmailMessage
+
+WORKERS         = int(os.getenv("ALERT_WORKERS", "2"))
+COALESCE_SECS   = float(os.getenv("ALERT_COALESCE_SECS", "5"))
+RATE_PER_MINUTE = float(os.getenv("ALERT_RATE_PER_MINUTE", "20"))
+MAX_RETRIES     = int(os.getenv("ALERT_MAX_RETRIES", "3"))
+BACKOFF_SECS    = float(os.getenv("ALERT_BACKOFF_SECS", "2"))
+MAX_QUEUE       = int(os.getenv("ALERT_QUEUE_SIZE", "1000"))
+IDLE_SECS       = float(os.getenv("SMTP_IDLE_SECS", "60"))
+CLOSE_TIMEOUT   = float(os.getenv("ALERT_CLOSE_TIMEOUT", "30"))
+
+Alert = namedtuple("Alert", "channel subject body key attachments created count")
+
+_FLUSH = object()
+_STOP = object()
+
+
+def combine(batch) -> tuple:
+    """(subject, body, attachments) of one message carrying a whole batch."""
+    def line(a):
+        return a.subject + (f" (x{a.count})" if a.count > 1 else "")
+
+    attachments = [p for a in batch for p in a.attachments]
+    if len(batch) == 1:
+        return line(batch[0]), batch[0].body, attachments
+    subject = f"{len(batch)} alerts: {line(batch[0])}"
+    body = "\n\n".join(
+        f"[{time.strftime('%H:%M:%S', time.localtime(a.created))}] {line(a)}\n{a.body}" for a in batch)
+    return subject, body, attachments
+
+
+# -- transports ---------------------------------------------------------------------
+
+class SMTPPool:
+    """Up to `size` persistent SMTP connections shared by the dispatcher's workers."""
+
+    def __init__(self, host, port=587, username=None, password=None, starttls=True,
+                 size=2, timeout=30, idle_secs=IDLE_SECS, smtp_factory=smtplib.SMTP):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.idle_secs = idle_secs
+        self.smtp_factory = smtp_factory
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self.connects = 0
+
+    def _connect(self):
+        smtp = self.smtp_factory(self.host, self.port, timeout=self.timeout)
+        smtp.ehlo()
+        if self.starttls:
+            smtp.starttls()
+            smtp.ehlo()
+        if self.username:
+            smtp.login(self.username, self.password)
+        self.connects += 1
+        return smtp
+
+    @staticmethod
+    def _discard(smtp):
+        try:
+            smtp.close()
+        except Exception:
+            pass
+
+    def _borrow(self):
+        try:
+            smtp, last_used = self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+        if time.monotonic() - last_used > self.idle_secs:
+            try:
+                if smtp.noop()[0] == 250:
+                    return smtp
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._discard(smtp)
+            return self._connect()
+        return smtp
+
+    def send(self, msg: EmailMessage):
+        with self._slots:
+            smtp = self._borrow()
+            try:
+                smtp.send_message(msg)
+            except (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError):
+                # Server closed an idle connection under us: reconnect once
+                self._discard(smtp)
+                smtp = self._connect()
+                try:
+                    smtp.send_message(msg)
+                except Exception:
+                    self._discard(smtp)
+                    raise
+            except smtplib.SMTPResponseException:
+                # Message-level rejection; the connection itself is still usable
+                self._idle.put((smtp, time.monotonic()))
+                raise
+            except Exception:
+                self._discard(smtp)
+                raise
+            self._idle.put((smtp, time.monotonic()))
+
+    def close(self):
+        while True:
+            try:
+                smtp, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                smtp.quit()
+            except Exception:
+                self._discard(smtp)
+
+
+class EmailChannel:
+    """Sends a batch as one email through an SMTPPool."""
+
+    def __init__(self, pool: SMTPPool, from_addr, to_addrs):
+        self.pool = pool
+        self.from_addr = from_addr
+        self.to_addrs = [to_addrs] if isinstance(to_addrs, str) else list(to_addrs)
+
+    def __call__(self, batch):
+        subject, body, attachments = combine(batch)
+        msg = EmailMessage()
+        msg["From"] = self.from_addr
+        msg["To"] = ", ".join(self.to_addrs)
+        msg["Subject"] = subject
+        msg.set_content(body)
+        for path in attachments:
+            with open(path, "rb") as f:
+                msg.add_attachment(f.read(), maintype="application", subtype="octet-stream",
+                                   filename=os.path.basename(path))
+        self.pool.send(msg)
+
+    def close(self):
+        self.pool.close()
+
+
+class WebhookChannel:
+    """POSTs {"text": ...} to a Slack-style incoming webhook."""
+
+    def __init__(self, url, timeout=10):
+        self.url = url
+        self.timeout = timeout
+
+    def __call__(self, batch):
+        subject, body, _ = combine(batch)
+        text = body if len(batch) == 1 and subject == body else f"{subject}\n{body}"
+        req = urllib.request.Request(self.url, data=json.dumps({"text": text}).encode("utf-8"),
+                                     headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+            resp.read()
+
+
+class CallableChannel:
+    """Adapts fn(subject, body) (Slack SDK, desktop popup, ...) to a channel."""
+
+    def __init__(self, fn):
+        self.fn = fn
+
+    def __call__(self, batch):
+        subject, body, _ = combine(batch)
+        self.fn(subject, body)
+
+
+# -- dispatcher ---------------------------------------------------------------------
+
+class AlertDispatcher:
+    """Bounded inbox -> per-channel coalescing -> rate-limited, retrying worker pool."""
+
+    def __init__(self, channels: dict, workers: int = WORKERS, coalesce_secs: float = COALESCE_SECS,
+                 per_minute: float = RATE_PER_MINUTE, max_retries: int = MAX_RETRIES,
+                 backoff: float = BACKOFF_SECS, max_queue: int = MAX_QUEUE, sleep=time.sleep):
+        self.channels = dict(channels)
+        self.coalesce_secs = coalesce_secs
+        self.min_interval = 60.0 / per_minute if per_minute else 0.0
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._sleep = sleep
+        self._inbox = queue.Queue(maxsize=max_queue)
+        self._work = queue.Queue()
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pending = 0
+        self._next_send = {}
+        self.stats = {"submitted": 0, "sent": 0, "messages": 0, "coalesced": 0,
+                      "retries": 0, "failed": 0, "dropped": 0}
+        self.errors = []
+        self.closed = False
+        self._threads = [threading.Thread(target=self._coordinate, name="alert-coordinator", daemon=True)]
+        self._threads += [threading.Thread(target=self._deliver, name=f"alert-worker-{i}", daemon=True)
+                          for i in range(max(1, workers))]
+        for t in self._threads:
+            t.start()
+        atexit.register(self.close, CLOSE_TIMEOUT)
+
+    # -- producer side ------------------------------------------------------------
+
+    def submit(self, channel: str, subject: str, body: str = "", key=None, attachments=()) -> bool:
+        """Enqueue an alert without blocking; False if it was dropped."""
+        if channel not in self.channels:
+            return False
+        alert = Alert(channel, subject, body or subject, key, tuple(attachments), time.time(), 1)
+        with self._lock:
+            if self.closed:
+                return False
+            self._pending += 1
+            self.stats["submitted"] += 1
+        try:
+            self._inbox.put_nowait(alert)
+        except queue.Full:
+            with self._lock:
+                self._pending -= 1
+                self.stats["dropped"] += 1
+                self._idle.notify_all()
+            print(f"[⚠️] Alert queue full, dropped {channel}: {subject}")
+            return False
+        return True
+
+    def flush(self, timeout: float = None) -> bool:
+        """Close open coalescing windows and wait until everything queued is handled."""
+        self._inbox.put(_FLUSH)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._idle:
+            while self._pending:
+                left = None if deadline is None else deadline - time.monotonic()
+                if left is not None and left <= 0:
+                    return False
+                self._idle.wait(left)
+        return True
+
+    def close(self, timeout: float = CLOSE_TIMEOUT):
+        """Deliver what is pending, stop the threads and close channel transports."""
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+        self.flush(timeout)
+        self._inbox.put(_STOP)
+        for t in self._threads:
+            t.join(timeout)
+        for ch in self.channels.values():
+            if hasattr(ch, "close"):
+                ch.close()
+        atexit.unregister(self.close)
+
+    # -- coordinator ----------------------------------------------------------------
+
+    def _coordinate(self):
+        windows = {}   # channel -> [deadline, [alerts]]
+
+        def release(channel):
+            _, batch = windows.pop(channel)
+            self._work.put((channel, batch))
+
+        while True:
+            now = time.monotonic()
+            timeout = min((w[0] for w in windows.values()), default=None)
+            try:
+                item = self._inbox.get(timeout=None if timeout is None else max(0.0, timeout - now))
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                for ch in list(windows):
+                    release(ch)
+                for _ in self._threads[1:]:
+                    self._work.put(None)
+                return
+            if item is _FLUSH:
+                for ch in list(windows):
+                    release(ch)
+            elif item is not None:
+                window = windows.setdefault(item.channel, [time.monotonic() + self.coalesce_secs, []])
+                batch = window[1]
+                same = next((i for i, a in enumerate(batch) if item.key is not None and a.key == item.key), None)
+                if same is not None:
+                    batch[same] = item._replace(count=batch[same].count + 1)
+                    with self._lock:
+                        self.stats["coalesced"] += 1
+                else:
+                    batch.append(item)
+            now = time.monotonic()
+            for ch in [ch for ch, w in windows.items() if w[0] <= now]:
+                release(ch)
+
+    # -- workers ----------------------------------------------------------------------
+
+    def _throttle(self, channel):
+        with self._lock:
+            now = time.monotonic()
+            at = max(now, self._next_send.get(channel, now))
+            self._next_send[channel] = at + self.min_interval
+        if at > now:
+            self._sleep(at - now)
+
+    def _deliver(self):
+        while True:
+            job = self._work.get()
+            if job is None:
+                return
+            channel, batch = job
+            n = sum(a.count for a in batch)
+            ok = False
+            for attempt in range(self.max_retries + 1):
+                if attempt:
+                    with self._lock:
+                        self.stats["retries"] += 1
+                    self._sleep(self.backoff * 2 ** (attempt - 1))
+                self._throttle(channel)
+                try:
+                    self.channels[channel](batch)
+                    ok = True
+                    break
+                except Exception as e:
+                    err = e
+            with self._lock:
+                if ok:
+                    self.stats["sent"] += n
+                    self.stats["messages"] += 1
+                else:
+                    self.stats["failed"] += n
+                    self.errors.append((channel, repr(err)))
+                # Coalesced duplicates were counted as pending when submitted
+                self._pending -= n
+                self._idle.notify_all()
+            if not ok:
+                print(f"[❌] {channel} alert failed after {self.max_retries + 1} attempts: {err}")
+
+    def report(self) -> str:
+        s = self.stats
+        return (f"Alerts: {s['sent']}/{s['submitted']} delivered in {s['messages']} messages, "
+                f"{s['coalesced']} coalesced, {s['retries']} retries, {s['failed']} failed, "
+                f"{s['dropped']} dropped")
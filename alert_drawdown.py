@@ -1,12 +1,10 @@
 # File: alert_drawdown.py
 
 import json
-import smtplib
 import os
 from pathlib import Path
-from email.message import EmailMessage
-from typing import List
-import requests  # make sure you have this installed if using Slack
+
+from alert_dispatcher import AlertDispatcher, EmailChannel, SMTPPool, WebhookChannel
 
 # ── CONFIGURATION ─────────────────────────────────────────────────────────────
 RESULTS_DIR       = Path("results")
@@ -18,29 +16,18 @@ SMTP_PASS         = os.getenv("SMTP_PASS", "yourpassword")
 ALERT_TO          = os.getenv("ALERT_TO", "you@example.com")
 SLACK_WEBHOOK_URL = os.getenv("SLACK_WEBHOOK_URL", None)  # e.g. "https://hooks.slack.com/…"
 
-# ── EMAIL / SLACK HELPERS ──────────────────────────────────────────────────────
-def send_email(smtp_server: str,
-               port: int,
-               username: str,
-               password: str,
-               to_addrs: List[str],
-               subject: str,
-               body: str):
-    msg = EmailMessage()
-    msg["From"]    = username
-    msg["To"]      = ", ".join(to_addrs)
-    msg["Subject"] = subject
-    msg.set_content(body)
-
-    with smtplib.SMTP(smtp_server, port) as smtp:
-        smtp.starttls()
-        smtp.login(username, password)
-        smtp.send_message(msg)
+# ── EMAIL / SLACK DISPATCH ─────────────────────────────────────────────────────
+_dispatcher = None
 
-def send_slack(text: str):
-    if not SLACK_WEBHOOK_URL:
-        return
-    requests.post(SLACK_WEBHOOK_URL, json={"text": text})
+def get_dispatcher() -> AlertDispatcher:
+    global _dispatcher
+    if _dispatcher is None:
+        channels = {"email": EmailChannel(SMTPPool(SMTP_SERVER, SMTP_PORT, SMTP_USER, SMTP_PASS),
+                                          SMTP_USER, [ALERT_TO])}
+        if SLACK_WEBHOOK_URL:
+            channels["slack"] = WebhookChannel(SLACK_WEBHOOK_URL)
+        _dispatcher = AlertDispatcher(channels)
+    return _dispatcher
 
 # ── MAIN ALERT ROUTINE ─────────────────────────────────────────────────────────
 def run_alerts():
@@ -62,17 +49,14 @@ def run_alerts():
     body = "⚠️ Drawdown Alerts:\n\n" + "\n".join(lines)
     subject = f"Drawdown Alert: {len(alerts)} symbol(s) breached"
 
-    # Send notifications
-    send_email(
-        SMTP_SERVER, SMTP_PORT,
-        SMTP_USER, SMTP_PASS,
-        [ALERT_TO],
-        subject, body
-    )
-    print("✉️  Email alert sent.")
-    send_slack(body)
-    if SLACK_WEBHOOK_URL:
-        print("📨 Slack alert sent.")
+    # Queue notifications (delivered by the dispatcher's workers)
+    dispatcher = get_dispatcher()
+    for channel in dispatcher.channels:
+        dispatcher.submit(channel, subject, body)
+    print(f"✉️  Queued {len(alerts)} drawdown alert(s) for {', '.join(dispatcher.channels)}.")
 
 if __name__ == "__main__":
     run_alerts()
+    if _dispatcher is not None:
+        _dispatcher.close()
+        print(_dispatcher.report())
@@ -0,0 +1,268 @@
+# File: alert_journal.py
+"""
+Append-only alert history in SQLite.
+
+Replaces the results/alert_history.json list that was re-read and
+rewritten on every alert. Each alert is one INSERT in its own transaction
+(WAL mode, so concurrent monitors append without clobbering each other
+and readers never block writers), indexed by (symbol, config, timestamp).
+
+    journal = get_journal()
+    journal.append({"timestamp": ..., "symbol": "BTCUSD.a", "config": 1, "drawdown": -5.3})
+    journal.recent(limit=20, symbol="BTCUSD.a")
+    journal.frame(since="2024-06-01")          # DataFrame for the dashboard
+
+Records keep every field they were appended with (stored as JSON next to
+the indexed columns), so queries return the same dicts log_alert wrote.
+
+Retention: rows older than RETENTION_DAYS are pruned every
+RETENTION_CHECK_EVERY appends, and the file is checkpointed and vacuumed
+once at least COMPACT_MIN_DELETED rows have been dropped since the last
+compaction. An existing alert_history.json is imported once and renamed
+to alert_history.json.migrated.
+
+CLI:
+    python alert_journal.py recent --symbol BTCUSD.a --limit 20
+    python alert_journal.py summary --since 2024-06-01
+    python alert_journal.py prune --days 30
+"""
+
+import argparse
+import datetime
+import json
+import os
+import sqlite3
+import threading
+
+import pandas as pd
+
+RESULTS_DIR           = "results"
+ALERT_DB              = os.getenv("ALERT_DB", os.path.join(RESULTS_DIR, "alert_history.db"))
+LEGACY_JSON           = os.path.join(RESULTS_DIR, "alert_history.json")
+RETENTION_DAYS        = float(os.getenv("ALERT_RETENTION_DAYS", "180"))
+RETENTION_CHECK_EVERY = int(os.getenv("ALERT_RETENTION_CHECK_EVERY", "500"))
+COMPACT_MIN_DELETED   = int(os.getenv("ALERT_COMPACT_MIN_DELETED", "10000"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS alerts (
+    id        INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    symbol    TEXT,
+    config    TEXT,
+    kind      TEXT,
+    value     REAL,
+    data      TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS alerts_symbol_config_ts ON alerts (symbol, config, timestamp);
+CREATE INDEX IF NOT EXISTS alerts_ts ON alerts (timestamp);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+def _iso(ts) -> str:
+    """ISO-8601 text in the same form monitor records use (sorts as time)."""
+    return pd.Timestamp(ts).isoformat()
+
+
+class AlertJournal:
+    """Thread-safe SQLite alert log with indexed queries and retention."""
+
+    def __init__(self, path: str = ALERT_DB, retention_days: float = RETENTION_DAYS,
+                 check_every: int = RETENTION_CHECK_EVERY,
+                 compact_min_deleted: int = COMPACT_MIN_DELETED, legacy_json: str = None):
+        self.path = path
+        self.retention_days = retention_days
+        self.check_every = max(1, check_every)
+        self.compact_min_deleted = compact_min_deleted
+        self._appends = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Autocommit: every statement is its own atomic transaction
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        if legacy_json:
+            self.import_json(legacy_json)
+
+    # -- writing ----------------------------------------------------------------
+
+    def _row(self, record: dict) -> tuple:
+        ts = record.get("timestamp") or datetime.datetime.now().isoformat()
+        record = {**record, "timestamp": ts}
+        value = record.get("value", record.get("drawdown"))
+        config = record.get("config")
+        return (_iso(ts), record.get("symbol"), None if config is None else str(config),
+                record.get("kind", "drawdown" if "drawdown" in record else None),
+                None if value is None else float(value),
+                json.dumps(record, default=str))
+
+    def append(self, record: dict) -> int:
+        """Insert one alert; returns its row id."""
+        row = self._row(record)
+        with self._lock:
+            cur = self.conn.execute(
+                "INSERT INTO alerts (timestamp, symbol, config, kind, value, data) VALUES (?,?,?,?,?,?)", row)
+            self._appends += 1
+            due = self._appends % self.check_every == 0
+        if due and self.retention_days:
+            self.apply_retention()
+        return cur.lastrowid
+
+    def import_json(self, path: str) -> int:
+        """One-off import of the legacy JSON list; renames the file when done."""
+        if not os.path.isfile(path):
+            return 0
+        try:
+            with open(path, "r") as fp:
+                records = json.load(fp)
+        except ValueError as e:
+            print(f"[⚠️] Could not import {path}: {e}")
+            return 0
+        rows = [self._row(r) for r in records if isinstance(r, dict)]
+        key = f"imported:{os.path.abspath(path)}"
+        with self._lock:
+            # The write lock makes a second process see the first one's import
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self._meta(key):
+                    self.conn.execute("COMMIT")
+                    return 0
+                self.conn.executemany(
+                    "INSERT INTO alerts (timestamp, symbol, config, kind, value, data) VALUES (?,?,?,?,?,?)", rows)
+                self._set_meta(key, len(rows))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        os.replace(path, path + ".migrated")
+        print(f"[ℹ️] Imported {len(rows)} alerts from {path}")
+        return len(rows)
+
+    # -- retention ----------------------------------------------------------------
+
+    def prune(self, older_than_days: float = None) -> int:
+        """Delete alerts older than the retention window; returns rows deleted."""
+        days = self.retention_days if older_than_days is None else older_than_days
+        cutoff = (datetime.datetime.now() - datetime.timedelta(days=days)).isoformat()
+        with self._lock:
+            deleted = self.conn.execute("DELETE FROM alerts WHERE timestamp < ?", (cutoff,)).rowcount
+            if deleted:
+                pending = int(self._meta("deleted_since_compact") or 0) + deleted
+                self._set_meta("deleted_since_compact", pending)
+        return deleted
+
+    def compact(self):
+        """Fold the WAL into the main file and reclaim space from pruned rows."""
+        with self._lock:
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self.conn.execute("VACUUM")
+            self._set_meta("deleted_since_compact", 0)
+
+    def apply_retention(self) -> int:
+        deleted = self.prune()
+        with self._lock:
+            pending = int(self._meta("deleted_since_compact") or 0)
+        if pending >= self.compact_min_deleted:
+            self.compact()
+        return deleted
+
+    def _meta(self, key):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    # -- queries ----------------------------------------------------------------
+
+    def _where(self, symbol=None, config=None, since=None, until=None, kind=None):
+        clauses, params = [], []
+        for col, value in (("symbol", symbol), ("config", config), ("kind", kind)):
+            if value is not None:
+                clauses.append(f"{col} = ?")
+                params.append(str(value) if col == "config" else value)
+        if since is not None:
+            clauses.append("timestamp >= ?")
+            params.append(_iso(since))
+        if until is not None:
+            clauses.append("timestamp < ?")
+            params.append(_iso(until))
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def query(self, symbol=None, config=None, since=None, until=None, kind=None,
+              limit: int = None, newest_first: bool = True) -> list:
+        """Alert records (as appended, plus 'id') matching the filters."""
+        where, params = self._where(symbol, config, since, until, kind)
+        sql = f"SELECT id, data FROM alerts{where} ORDER BY timestamp {'DESC' if newest_first else 'ASC'}, id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        with self._lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [{"id": rid, **json.loads(data)} for rid, data in rows]
+
+    def recent(self, limit: int = 50, **filters) -> list:
+        return self.query(limit=limit, **filters)
+
+    def last_alert(self, symbol, config=None):
+        rows = self.query(symbol=symbol, config=config, limit=1)
+        return rows[0] if rows else None
+
+    def summary(self, since=None) -> list:
+        """Per (symbol, config): alert count, worst value and latest timestamp."""
+        where, params = self._where(since=since)
+        sql = (f"SELECT symbol, config, COUNT(*), MIN(value), MAX(timestamp) FROM alerts{where} "
+               "GROUP BY symbol, config ORDER BY MAX(timestamp) DESC")
+        with self._lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [{"symbol": s, "config": c, "alerts": n, "worst": w, "last": t} for s, c, n, w, t in rows]
+
+    def frame(self, **filters) -> pd.DataFrame:
+        """query() as a DataFrame with a parsed timestamp column."""
+        df = pd.DataFrame(self.query(**filters))
+        if not df.empty:
+            df["timestamp"] = pd.to_datetime(df["timestamp"], format="ISO8601")
+        return df
+
+    def count(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM alerts").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+_journal = None
+
+
+def get_journal() -> AlertJournal:
+    """Process-wide journal on ALERT_DB (imports the legacy JSON on first use)."""
+    global _journal
+    if _journal is None:
+        _journal = AlertJournal(ALERT_DB, legacy_json=LEGACY_JSON)
+    return _journal
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Query and maintain the alert journal")
+    p.add_argument("command", choices=["recent", "summary", "prune", "compact"])
+    p.add_argument("--symbol")
+    p.add_argument("--config")
+    p.add_argument("--since")
+    p.add_argument("--limit", type=int, default=50)
+    p.add_argument("--days", type=float, default=None, help="prune: retention window in days")
+    args = p.parse_args()
+
+    journal = get_journal()
+    if args.command == "recent":
+        for rec in journal.recent(args.limit, symbol=args.symbol, config=args.config, since=args.since):
+            print(json.dumps(rec, default=str))
+    elif args.command == "summary":
+        print(pd.DataFrame(journal.summary(since=args.since)).to_string(index=False))
+    elif args.command == "prune":
+        print(f"[✅] Pruned {journal.prune(args.days)} alerts")
+    else:
+        journal.compact()
+        print(f"[✅] Compacted {journal.path}")
@@ -1,21 +1,23 @@
 import os
-import smtplib
-from email.message import EmailMessage
 from slack_sdk import WebClient
 
+from alert_dispatcher import AlertDispatcher, CallableChannel, EmailChannel, SMTPPool
+
 # Slack configuration (set these env vars in your shell)
 SLACK_TOKEN   = os.getenv("SLACK_BOT_TOKEN")
 SLACK_CHANNEL = os.getenv("SLACK_CHANNEL", "#trading-bot")
 slack_client  = WebClient(token=SLACK_TOKEN)
 
+def _post_slack(subject: str, body: str):
+    text = body if subject == body else f"{subject}\n{body}"
+    slack_client.chat_postMessage(channel=SLACK_CHANNEL, text=text)
+
 def slack_alert(text: str):
     """
-    Send a Slack message to SLACK_CHANNEL.
+    Queue a Slack message to SLACK_CHANNEL (sent by the dispatcher's workers).
     """
-    try:
-        slack_client.chat_postMessage(channel=SLACK_CHANNEL, text=text)
-    except Exception as e:
-        print(f"[⚠️] Slack alert failed: {e}")
+    if not get_dispatcher().submit("slack", text, text):
+        print(f"[⚠️] Slack alert not queued: {text}")
 
 # Email configuration (set these env vars in your shell)
 EMAIL_HOST = os.getenv("SMTP_HOST")
@@ -24,19 +26,25 @@ EMAIL_USER = os.getenv("SMTP_USER")
 EMAIL_PASS = os.getenv("SMTP_PASS")
 EMAIL_TO   = os.getenv("ALERT_EMAIL_TO")
 
+_dispatcher = None
+
+def get_dispatcher() -> AlertDispatcher:
+    """
+    Shared background dispatcher: one pooled SMTP login instead of one per
+    email, coalescing and retries (see alert_dispatcher.py).
+    """
+    global _dispatcher
+    if _dispatcher is None:
+        channels = {"slack": CallableChannel(_post_slack)}
+        if EMAIL_HOST:
+            channels["email"] = EmailChannel(SMTPPool(EMAIL_HOST, EMAIL_PORT, EMAIL_USER, EMAIL_PASS),
+                                             EMAIL_USER, EMAIL_TO)
+        _dispatcher = AlertDispatcher(channels)
+    return _dispatcher
+
 def email_alert(subject: str, body: str):
     """
-    Send an email alert via SMTP.
+    Queue an email alert; delivery happens off the calling thread.
     """
-    msg = EmailMessage()
-    msg["Subject"] = subject
-    msg["From"]    = EMAIL_USER
-    msg["To"]      = EMAIL_TO
-    msg.set_content(body)
-    try:
-        with smtplib.SMTP(EMAIL_HOST, EMAIL_PORT) as smtp:
-            smtp.starttls()
-            smtp.login(EMAIL_USER, EMAIL_PASS)
-            smtp.send_message(msg)
-    except Exception as e:
-        print(f"[⚠️] Email alert failed: {e}")
+    if not get_dispatcher().submit("email", subject, body):
+        print(f"[⚠️] Email alert not queued: {subject}")
@@ -5,6 +5,10 @@ import MetaTrader5 as mt5
 from datetime import datetime
 from typing import List, Optional, Tuple
 from strategies.strategy_sma_stoch_rr_v2 import run_strategy
+from candle_cache import CandleCache
+
+# Bars fetched on earlier runs are served from disk; only the tail is re-fetched
+candles = CandleCache(mt5)
 
 def backtest(
     symbol: str,
@@ -33,7 +37,7 @@ def backtest(
     # Map timeframe (240m is H4)
     tf_attr = f"TIMEFRAME_M{timeframe}" if timeframe != 240 else "TIMEFRAME_H4"
     tf = getattr(mt5, tf_attr, mt5.TIMEFRAME_M5)
-    rates = mt5.copy_rates_from_pos(symbol, tf, 0, bars)
+    rates = candles.copy_rates_from_pos(symbol, tf, 0, bars)
     mt5.shutdown()
 
     # Build DataFrame
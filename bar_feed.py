@@ -1,11 +1,15 @@
-import os
-import json
+import math
 import time
+import asyncio
+from collections import deque
 import pandas as pd
-from utils.data_utils import get_data
+from state_store import StateStore
 
 STATE_FILE      = "bot_state.json"
 DEFAULT_BALANCE = 100_000.0
+# Seconds added after the expected bar open before polling, and the floor
+# between polls once a bar is overdue
+POLL_GRACE      = 1.0
 
 class BarFeed:
     """
@@ -14,8 +18,14 @@ class BarFeed:
     Modes:
     - 'replay': iterate once through historical bars up to full_bars.
     - 'live':  warm up with initial_window bars then poll for new bars.
+               Each poll asks only for the bars since last_ts and sleeps
+               until the next bar is due rather than every `delay` seconds.
 
-    State persistence (bot_state.json) tracks:
+    `async for bar in feed` yields bars without blocking the event loop (the
+    fetch runs in a worker thread), so several symbols (each with its own
+    state_file) can share one loop; see run_feeds().
+
+    State persistence (bot_state.json, via StateStore's batched journal) tracks:
       - last_ts:  ISO timestamp of the last processed bar
       - balance: current account balance
     """
@@ -26,7 +36,9 @@ class BarFeed:
                  initial_window: int = 1000,
                  mode: str = 'replay',
                  delay: int = 5,
-                 state_file: str = STATE_FILE):
+                 state_file: str = STATE_FILE,
+                 fetch=None,
+                 clock_offset: float = 0.0):
         self.symbol         = symbol
         self.timeframe      = timeframe
         self.full_bars      = full_bars
@@ -34,15 +46,24 @@ class BarFeed:
         self.mode           = mode
         self.delay          = delay
         self.state_file     = state_file
+        # fetch(symbol=, timeframe=, bars=) -> time-indexed frame, newest last
+        if fetch is None:
+            # Imported here so feeds with their own fetch don't need the MT5 helpers
+            from utils.data_utils import get_data
+            fetch = get_data
+        self.fetch          = fetch
+        # Seconds the bar timestamps run ahead of local UTC (broker server time)
+        self.clock_offset   = clock_offset
+        self._pending       = deque()
 
         # load or init state
         self.state = self._load_state()
 
         if self.mode == 'replay':
             # load full history once
-            self.df_all  = get_data(symbol=symbol,
-                                    timeframe=timeframe,
-                                    bars=full_bars)
+            self.df_all  = self.fetch(symbol=symbol,
+                                      timeframe=timeframe,
+                                      bars=full_bars)
             # determine start index
             if self.state['last_ts']:
                 last_dt = pd.to_datetime(self.state['last_ts'])
@@ -52,9 +73,9 @@ class BarFeed:
 
         elif self.mode == 'live':
             # warm-up: load initial history
-            self.df_hist = get_data(symbol=symbol,
-                                    timeframe=timeframe,
-                                    bars=initial_window)
+            self.df_hist = self.fetch(symbol=symbol,
+                                      timeframe=timeframe,
+                                      bars=initial_window)
             # update last_ts from history tail if not set
             if not self.state['last_ts'] and not self.df_hist.empty:
                 self.state['last_ts'] = self.df_hist.index[-1].isoformat()
@@ -63,17 +84,113 @@ class BarFeed:
             raise ValueError(f"Unknown mode: {self.mode}")
 
     def _load_state(self) -> dict:
-        if os.path.exists(self.state_file):
-            raw = json.load(open(self.state_file))
-            return {
-                'last_ts': raw.get('last_ts', None),
-                'balance': raw.get('balance', DEFAULT_BALANCE)
-            }
-        return {'last_ts': None, 'balance': DEFAULT_BALANCE}
+        # Journaled store: per-bar updates are batched instead of rewriting the file
+        self.store = StateStore(self.state_file, defaults={
+            'last_ts': None, 'balance': DEFAULT_BALANCE
+        })
+        return {
+            'last_ts': self.store.state.get('last_ts', None),
+            'balance': self.store.state.get('balance', DEFAULT_BALANCE)
+        }
 
     def _save_state(self):
-        with open(self.state_file, 'w') as f:
-            json.dump(self.state, f, indent=2)
+        self.store.update(**self.state)
+
+    def close(self):
+        """Flush and compact the state file."""
+        self.store.close()
+
+    def now(self) -> pd.Timestamp:
+        """Current time on the bar clock (naive, like the bar index)."""
+        return pd.Timestamp.now(tz="UTC").tz_localize(None) + pd.Timedelta(seconds=self.clock_offset)
+
+    def _bar_delta(self) -> pd.Timedelta:
+        return pd.Timedelta(minutes=self.timeframe)
+
+    def _poll(self):
+        """
+        Fetch only the bars newer than last_ts and queue them. The request size
+        is the number of bars that can have opened since last_ts (plus one for
+        slack), capped at full_bars.
+        """
+        last_ts = pd.to_datetime(self.state['last_ts']) if self.state['last_ts'] else None
+        if last_ts is None:
+            bars = self.full_bars
+        else:
+            elapsed = (self.now() - last_ts) / self._bar_delta()
+            bars = min(self.full_bars, max(2, math.ceil(elapsed) + 1))
+        df = self.fetch(symbol=self.symbol, timeframe=self.timeframe, bars=bars)
+        if df is None or df.empty:
+            return
+        if last_ts is not None and df.index[0] > last_ts and bars < self.full_bars:
+            # No overlap with last_ts (clock offset off, or a long outage): widen
+            df = self.fetch(symbol=self.symbol, timeframe=self.timeframe, bars=self.full_bars)
+        new_bars = df[df.index > last_ts] if last_ts is not None else df
+        self._pending.extend(row for _, row in new_bars.iterrows())
+
+    def _pop(self, commit: bool = True):
+        bar = self._pending.popleft()
+        if commit:
+            self.commit(bar)
+        return bar
+
+    def commit(self, bar, **changes):
+        """
+        Record `bar` as processed. Extra changes (e.g. a strategy snapshot)
+        go in the same journal update, so a flush never persists last_ts
+        without the state that goes with it.
+        """
+        self.state['last_ts'] = bar.name.isoformat()
+        if 'balance' in changes:
+            self.state['balance'] = changes.pop('balance')
+        self.store.update(**self.state, **changes)
+
+    def drain(self, commit: bool = True) -> list:
+        """
+        Live mode: one tail poll, returning every new bar (oldest first).
+        With commit=False the caller must commit() each bar once handled.
+        """
+        if not self._pending:
+            self._poll()
+        return self._take(commit)
+
+    async def adrain(self, commit: bool = True) -> list:
+        """drain() with the poll in a worker thread, like __anext__."""
+        if not self._pending:
+            await asyncio.to_thread(self._poll)
+        return self._take(commit)
+
+    def _take(self, commit: bool) -> list:
+        bars = []
+        while self._pending:
+            bars.append(self._pop(commit))
+        return bars
+
+    def _next_replay(self):
+        if self.next_idx >= len(self.df_all):
+            self.close()
+            return None
+        bar = self.df_all.iloc[self.next_idx]
+        # update state
+        ts = bar.name
+        self.state['last_ts'] = ts.isoformat()
+        self._save_state()
+        self.next_idx += 1
+        return bar
+
+    def seconds_until_next_bar(self) -> float:
+        """
+        Sleep before the next poll: until the bar after last_ts is due (plus
+        POLL_GRACE), or `delay` seconds once it is overdue.
+        """
+        if not self.state['last_ts']:
+            return self.delay
+        due = pd.to_datetime(self.state['last_ts']) + self._bar_delta()
+        wait = (due - self.now()).total_seconds() + POLL_GRACE
+        if wait <= 0:
+            return min(self.delay, POLL_GRACE * 5)
+        # A wrong clock_offset must not park the feed for longer than a bar
+        return min(wait, self._bar_delta().total_seconds() + POLL_GRACE)
 
     def get_next_bar(self):
         """
@@ -81,36 +198,57 @@ class BarFeed:
         or None if replay is complete.
         """
         if self.mode == 'replay':
-            if self.next_idx >= len(self.df_all):
-                return None
-            bar = self.df_all.iloc[self.next_idx]
-            # update state
-            ts = bar.name
-            self.state['last_ts'] = ts.isoformat()
-            self._save_state()
-            self.next_idx += 1
-            return bar
+            return self._next_replay()
 
-        # live mode: poll until a new bar appears
-        while True:
-            df = get_data(symbol=self.symbol,
-                          timeframe=self.timeframe,
-                          bars=self.full_bars)
-            last_ts = pd.to_datetime(self.state['last_ts']) if self.state['last_ts'] else None
-            new_bars = df[df.index > last_ts] if last_ts is not None else df
-            if not new_bars.empty:
-                bar = new_bars.iloc[0]
-                ts = bar.name
-                self.state['last_ts'] = ts.isoformat()
-                self._save_state()
-                return bar
-            time.sleep(self.delay)
+        # live mode: poll (tail only) until a new bar appears
+        while not self._pending:
+            self._poll()
+            if not self._pending:
+                # Idle until the next bar: a good moment to make state durable
+                self.store.flush()
+                time.sleep(self.seconds_until_next_bar())
+        return self._pop()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        """
+        Async get_next_bar: the network fetch and state flush run in a worker
+        thread, so a slow poll for one symbol never stalls the other feeds.
+        """
+        if self.mode == 'replay':
+            bar = self._next_replay()
+            if bar is None:
+                raise StopAsyncIteration
+            await asyncio.sleep(0)
+            return bar
+        while not self._pending:
+            await asyncio.to_thread(self._poll)
+            if not self._pending:
+                await asyncio.to_thread(self.store.flush)
+                await asyncio.sleep(self.seconds_until_next_bar())
+        return self._pop()
 
     def get_balance(self) -> float:
         """Return the current balance."""
         return self.state['balance']
 
     def update_balance(self, new_balance: float):
-        """Persist a new balance value."""
+        """Persist a new balance value (flushed immediately)."""
         self.state['balance'] = new_balance
         self._save_state()
+        self.store.flush()
+
+
+async def run_feeds(feeds, on_bar):
+    """
+    Drive several feeds on one event loop, calling on_bar(feed, bar) for each
+    bar as it arrives. Returns when every replay feed is exhausted (live
+    feeds run until cancelled).
+    """
+    async def consume(feed):
+        async for bar in feed:
+            on_bar(feed, bar)
+
+    await asyncio.gather(*(consume(f) for f in feeds))
@@ -0,0 +1,356 @@
+# File: bar_store.py
+"""
+Columnar on-disk bar store.
+
+Every bar source (CSV exports, MT5 rates) is normalized to one schema --
+Time, Open, High, Low, Close, Volume -- and written as Parquet (or Feather)
+partitions per symbol, timeframe and year:
+
+    data/store/NAS100/M5/2024.parquet
+
+Range reads only open the partitions that overlap the requested window.
+
+    store = BarStore()
+    store.import_csv("data/NAS100_5m.csv", "NAS100", "M5")
+    df = store.read("NAS100", "M5", start="2024-03-01", end="2024-04-01")
+
+For scripts that still take a CSV path, load_bars(path) returns the same
+normalized frame and keeps a columnar copy next to the store, so only the
+first call pays for text and datetime parsing.
+
+For multi-process backtests, write_mmap() lays bars out as one .npy file
+per column (float64 OHLCV plus an int64 epoch_ns array); open_mmap()
+maps them read-only, so every worker shares the OS page cache instead of
+holding a private copy:
+
+    store.export_mmap("NAS100", "M5")
+    bars = open_mmap(store.mmap_dir("NAS100", "M5"))   # {'Time', 'Open', ...}
+
+CLI:
+    python bar_store.py import data/            # every CSV under data/
+    python bar_store.py benchmark data/         # CSV vs store load times
+    python bar_store.py import data/ --mmap     # also write the .npy layout
+
+Requires pyarrow for both formats.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+STORE_ROOT     = os.getenv("BAR_STORE_ROOT", os.path.join("data", "store"))
+DEFAULT_FORMAT = os.getenv("BAR_STORE_FORMAT", "parquet")
+SCHEMA         = ["Time", "Open", "High", "Low", "Close", "Volume"]
+
+_COLUMN_ALIASES = {
+    "time": "Time", "date": "Time", "datetime": "Time", "timestamp": "Time",
+    "open": "Open", "high": "High", "low": "Low", "close": "Close",
+    "volume": "Volume", "tick_volume": "Volume", "real_volume": "Volume",
+}
+_EXTENSIONS = {"parquet": ".parquet", "feather": ".feather"}
+
+
+def normalize_bars(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Map common column spellings onto SCHEMA, parse Time (datetime strings or
+    MT5 epoch seconds), and return a sorted, de-duplicated frame.
+    """
+    if "Time" not in df.columns and "time" not in df.columns and isinstance(df.index, pd.DatetimeIndex):
+        df = df.reset_index().rename(columns={df.index.name or "index": "Time"})
+    col_map = {}
+    for col in df.columns:
+        target = _COLUMN_ALIASES.get(str(col).lower())
+        if target and target not in col_map.values():
+            col_map[col] = target
+    df = df.rename(columns=col_map)
+
+    if "Time" not in df.columns:
+        raise ValueError("Missing Time column")
+    missing = [c for c in ["Open", "High", "Low", "Close"] if c not in df.columns]
+    if missing:
+        raise ValueError(f"Missing OHLC columns: {missing}")
+
+    out = pd.DataFrame(index=df.index)
+    if pd.api.types.is_numeric_dtype(df["Time"]):
+        out["Time"] = pd.to_datetime(df["Time"], unit="s")
+    else:
+        out["Time"] = pd.to_datetime(df["Time"], errors="coerce")
+    for col in SCHEMA[1:]:
+        out[col] = df[col].astype("float64") if col in df.columns else 0.0
+    out["Time"] = out["Time"].astype("datetime64[ns]")
+    out = out.dropna(subset=["Time"]).sort_values("Time", kind="stable")
+    return out.drop_duplicates("Time", keep="last").reset_index(drop=True)
+
+
+def read_csv_bars(path: str) -> pd.DataFrame:
+    """Parse a CSV into the normalized schema (the slow path)."""
+    return normalize_bars(pd.read_csv(path))
+
+
+def parse_symbol_timeframe(filename: str, default_timeframe: str = "M5"):
+    """
+    Split names like 'NAS100_5m.csv' or 'EURUSD.a_m5.csv' into
+    ('NAS100', 'M5'); falls back to default_timeframe.
+    """
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    m = re.match(r"^(.+?)[_-]([mhd]\d+|\d+[mhd])$", stem, re.IGNORECASE)
+    if not m:
+        return stem, default_timeframe
+    tf = m.group(2).upper()
+    if tf[0].isdigit():
+        tf = tf[-1] + tf[:-1]
+    return m.group(1), tf
+
+
+MMAP_COLUMNS = SCHEMA[1:]
+MMAP_TIME_FILE = "epoch_ns.npy"
+
+
+def write_mmap(folder: str, df: pd.DataFrame):
+    """Write normalized bars as contiguous per-column .npy files."""
+    bars = normalize_bars(df)
+    os.makedirs(folder, exist_ok=True)
+    columns = {MMAP_TIME_FILE: bars["Time"].to_numpy(dtype="datetime64[ns]").view(np.int64)}
+    for col in MMAP_COLUMNS:
+        columns[f"{col}.npy"] = bars[col].to_numpy(dtype=np.float64)
+    for fname, arr in columns.items():
+        tmp = os.path.join(folder, f"{fname}.tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, np.ascontiguousarray(arr))
+        os.replace(tmp, os.path.join(folder, fname))
+    return len(bars)
+
+
+def open_mmap(folder: str) -> dict:
+    """
+    Read-only memory maps of a write_mmap() folder. 'Time' is a zero-copy
+    datetime64[ns] view of the epoch array.
+    """
+    epoch = np.load(os.path.join(folder, MMAP_TIME_FILE), mmap_mode="r")
+    arrays = {"Time": epoch.view("datetime64[ns]")}
+    for col in MMAP_COLUMNS:
+        path = os.path.join(folder, f"{col}.npy")
+        if os.path.isfile(path):
+            arrays[col] = np.load(path, mmap_mode="r")
+    return arrays
+
+
+def _write_frame(df: pd.DataFrame, path: str, fmt: str):
+    """Write atomically: temp file then rename over the target."""
+    tmp = f"{path}.tmp"
+    if fmt == "feather":
+        df.reset_index(drop=True).to_feather(tmp)
+    else:
+        df.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def _read_frame(path: str, fmt: str) -> pd.DataFrame:
+    if fmt == "feather":
+        return pd.read_feather(path)
+    return pd.read_parquet(path)
+
+
+class BarStore:
+    """Partitioned Parquet/Feather bars, one directory per symbol/timeframe."""
+
+    def __init__(self, root: str = STORE_ROOT, fmt: str = DEFAULT_FORMAT):
+        if fmt not in _EXTENSIONS:
+            raise ValueError(f"Unknown bar store format: {fmt}")
+        self.root = root
+        self.fmt = fmt
+        self.ext = _EXTENSIONS[fmt]
+
+    def _dir(self, symbol: str, timeframe: str) -> str:
+        return os.path.join(self.root, symbol, str(timeframe))
+
+    def _partitions(self, symbol: str, timeframe: str) -> dict:
+        """{year: path} of existing partitions."""
+        folder = self._dir(symbol, timeframe)
+        if not os.path.isdir(folder):
+            return {}
+        parts = {}
+        for fname in os.listdir(folder):
+            stem, ext = os.path.splitext(fname)
+            if ext == self.ext and stem.isdigit():
+                parts[int(stem)] = os.path.join(folder, fname)
+        return dict(sorted(parts.items()))
+
+    def symbols(self) -> list:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(d for d in os.listdir(self.root)
+                      if not d.startswith("_") and os.path.isdir(os.path.join(self.root, d)))
+
+    def timeframes(self, symbol: str) -> list:
+        folder = os.path.join(self.root, symbol)
+        return sorted(os.listdir(folder)) if os.path.isdir(folder) else []
+
+    def write(self, symbol: str, timeframe: str, df: pd.DataFrame) -> int:
+        """
+        Merge bars into the store; rows with an existing Time are replaced.
+        Returns the number of rows written.
+        """
+        bars = normalize_bars(df)
+        if bars.empty:
+            return 0
+        os.makedirs(self._dir(symbol, timeframe), exist_ok=True)
+        existing = self._partitions(symbol, timeframe)
+        for year, chunk in bars.groupby(bars["Time"].dt.year, sort=True):
+            path = os.path.join(self._dir(symbol, timeframe), f"{year}{self.ext}")
+            if year in existing:
+                chunk = pd.concat([_read_frame(path, self.fmt), chunk], ignore_index=True)
+                chunk = chunk.sort_values("Time", kind="stable").drop_duplicates("Time", keep="last")
+            _write_frame(chunk.reset_index(drop=True), path, self.fmt)
+        return len(bars)
+
+    def read(self, symbol: str, timeframe: str, start=None, end=None) -> pd.DataFrame:
+        """Bars with start <= Time < end (either bound optional)."""
+        start = pd.Timestamp(start) if start is not None else None
+        end = pd.Timestamp(end) if end is not None else None
+        frames = []
+        for year, path in self._partitions(symbol, timeframe).items():
+            if start is not None and year < start.year:
+                continue
+            if end is not None and year > end.year:
+                continue
+            frames.append(_read_frame(path, self.fmt))
+        if not frames:
+            return pd.DataFrame({c: pd.Series(dtype="datetime64[ns]" if c == "Time" else "float64")
+                                 for c in SCHEMA})
+        df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        times = df["Time"].to_numpy()
+        lo = np.searchsorted(times, start.to_datetime64()) if start is not None else 0
+        hi = np.searchsorted(times, end.to_datetime64()) if end is not None else len(df)
+        return df.iloc[lo:hi].reset_index(drop=True)
+
+    def last_time(self, symbol: str, timeframe: str):
+        """Timestamp of the newest stored bar, or None."""
+        parts = self._partitions(symbol, timeframe)
+        if not parts:
+            return None
+        last = _read_frame(list(parts.values())[-1], self.fmt)
+        return last["Time"].iloc[-1] if not last.empty else None
+
+    def mmap_dir(self, symbol: str, timeframe: str) -> str:
+        return os.path.join(self._dir(symbol, timeframe), "npy")
+
+    def export_mmap(self, symbol: str, timeframe: str) -> str:
+        """Refresh the .npy layout of one symbol/timeframe; returns its folder."""
+        folder = self.mmap_dir(symbol, timeframe)
+        write_mmap(folder, self.read(symbol, timeframe))
+        return folder
+
+    def import_csv(self, path: str, symbol: str = None, timeframe: str = None) -> int:
+        guess_symbol, guess_tf = parse_symbol_timeframe(path)
+        return self.write(symbol or guess_symbol, timeframe or guess_tf, read_csv_bars(path))
+
+    def import_mt5_rates(self, rates, symbol: str, timeframe: str) -> int:
+        """Store the structured array returned by mt5.copy_rates_*()."""
+        return self.write(symbol, timeframe, pd.DataFrame(rates))
+
+
+def load_bars(path: str, root: str = STORE_ROOT, fmt: str = DEFAULT_FORMAT) -> pd.DataFrame:
+    """
+    Normalized bars for a CSV path. The parsed result is cached in columnar
+    form under {root}/_csv and reused until the CSV's size or mtime changes.
+    """
+    st = os.stat(path)
+    key = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:16]
+    cache_dir = os.path.join(root, "_csv")
+    data_path = os.path.join(cache_dir, key + _EXTENSIONS[fmt])
+    meta_path = os.path.join(cache_dir, key + ".json")
+    stamp = {"path": os.path.abspath(path), "size": st.st_size, "mtime": st.st_mtime}
+
+    if os.path.isfile(data_path) and os.path.isfile(meta_path):
+        try:
+            with open(meta_path) as f:
+                if json.load(f) == stamp:
+                    return _read_frame(data_path, fmt)
+        except (OSError, ValueError):
+            pass
+
+    df = read_csv_bars(path)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        _write_frame(df, data_path, fmt)
+        with open(meta_path, "w") as f:
+            json.dump(stamp, f)
+    except OSError as e:
+        print(f"[⚠️] Could not cache {path}: {e}")
+    return df
+
+
+def _csv_files(folder: str) -> list:
+    paths = []
+    for root, dirs, files in os.walk(folder):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != os.path.normpath(STORE_ROOT)]
+        paths.extend(os.path.join(root, f) for f in files if f.lower().endswith(".csv"))
+    return sorted(paths)
+
+
+def benchmark(folder: str = "data", repeats: int = 3, fmt: str = DEFAULT_FORMAT):
+    """Compare the old CSV parse path with store reads for every CSV in folder."""
+    store = BarStore(fmt=fmt)
+    rows = []
+    for path in _csv_files(folder):
+        symbol, tf = parse_symbol_timeframe(path)
+        try:
+            store.import_csv(path, symbol, tf)
+        except ValueError as e:
+            print(f"[⚠️] Skipping {path}: {e}")
+            continue
+
+        def best_of(fn):
+            best = float("inf")
+            for _ in range(repeats):
+                t0 = time.perf_counter()
+                fn()
+                best = min(best, time.perf_counter() - t0)
+            return best
+
+        csv_secs = best_of(lambda: read_csv_bars(path))
+        store_secs = best_of(lambda: store.read(symbol, tf))
+        rows.append({"file": path, "rows": len(store.read(symbol, tf)),
+                     "csv_s": round(csv_secs, 4), f"{fmt}_s": round(store_secs, 4),
+                     "speedup": round(csv_secs / store_secs, 1) if store_secs else float("inf")})
+    result = pd.DataFrame(rows)
+    print(result.to_string(index=False) if not result.empty else f"No CSVs found under {folder}")
+    return result
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Normalized Parquet/Feather bar store")
+    p.add_argument("command", choices=["import", "benchmark"])
+    p.add_argument("paths", nargs="*", default=["data"],
+                   help="CSV files or folders to import / benchmark")
+    p.add_argument("--symbol", help="Override the symbol parsed from the file name")
+    p.add_argument("--timeframe", help="Override the timeframe parsed from the file name")
+    p.add_argument("--format", default=DEFAULT_FORMAT, choices=sorted(_EXTENSIONS))
+    p.add_argument("--mmap", action="store_true",
+                   help="Also export memory-mappable .npy columns after importing")
+    args = p.parse_args()
+
+    if args.command == "benchmark":
+        for folder in args.paths:
+            benchmark(folder, fmt=args.format)
+    else:
+        store = BarStore(fmt=args.format)
+        for target in args.paths:
+            files = _csv_files(target) if os.path.isdir(target) else [target]
+            for path in files:
+                try:
+                    n = store.import_csv(path, args.symbol, args.timeframe)
+                    print(f"[✅] {path}: {n} bars")
+                    if args.mmap:
+                        symbol, tf = parse_symbol_timeframe(path)
+                        folder = store.export_mmap(args.symbol or symbol, args.timeframe or tf)
+                        print(f"[✅] {path}: memory-mapped columns in {folder}")
+                except ValueError as e:
+                    print(f"[⚠️] Skipping {path}: {e}")
@@ -2,9 +2,12 @@
 
 import os
 import pandas as pd
-import numpy as np
-from strategies.strategy_sma_stoch_rr_v2 import run_strategy
+from vectorized_backtest import select_run_strategy
 from utils.logger import log
+from bar_store import load_bars
+from metrics import backtest_summary
+
+run_strategy = select_run_strategy()
 
 # Default strategy parameters
 DEFAULT_KWARGS = {
@@ -32,57 +35,25 @@ def backtest_csv_folder(folder="data", test_mode=False):
         csv_path = os.path.join(folder, fname)
         log(f"Loading {symbol} from {csv_path}")
 
-        # Read CSV without forced parse_dates
+        # Load normalized bars (Time/OHLC checked, bad timestamps dropped)
         try:
-            df = pd.read_csv(csv_path)
+            df = load_bars(csv_path)
+        except ValueError as e:
+            log(f"Skipping {symbol}: {e}", level="WARN")
+            continue
         except Exception as e:
             log(f"Failed to read {csv_path}: {e}", level="ERROR")
             continue
-
-        # Detect and parse time column
-        if 'Time' in df.columns:
-            df['Time'] = pd.to_datetime(df['Time'], errors='coerce')
-        elif 'time' in df.columns:
-            df['Time'] = pd.to_datetime(df['time'], errors='coerce')
-        else:
-            log(f"Skipping {symbol}: no 'Time' column found", level="WARN")
-            continue
-
-        # Drop rows with invalid or missing times
-        df = df.dropna(subset=['Time'])
         if df.empty:
             log(f"Skipping {symbol}: no valid timestamps after parsing", level="WARN")
             continue
 
-        # Ensure we have OHLC data
-        required_cols = ['Open', 'High', 'Low', 'Close']
-        if not all(col in df.columns for col in required_cols):
-            log(f"Skipping {symbol}: missing one of {required_cols}", level="WARN")
-            continue
-
         # Run strategy
         df_out, trades, equity_curve, debug_log, extra = run_strategy(
             df.copy(), test_mode=test_mode, **DEFAULT_KWARGS
         )
 
-        # Compute metrics
-        total = len(trades)
-        wins = sum(1 for t in trades if t.get("pnl", 0) > 0)
-        win_rate = wins / total * 100 if total > 0 else 0.0
-        avg_return = sum(t.get("pnl", 0) for t in trades) / total if total > 0 else 0.0
-
-        returns = np.diff(equity_curve) / equity_curve[:-1]
-        sharpe = (
-            returns.mean() / returns.std(ddof=1) * np.sqrt(len(returns))
-        ) if len(returns) > 1 and returns.std(ddof=1) != 0 else 0.0
-
-        results.append({
-            "symbol": symbol,
-            "trades": total,
-            "win_rate": round(win_rate, 2),
-            "avg_return": round(avg_return, 4),
-            "sharpe": round(sharpe, 2),
-        })
+        results.append({"symbol": symbol, **backtest_summary(trades, equity_curve)})
 
     summary_df = pd.DataFrame(results)
     os.makedirs("results", exist_ok=True)
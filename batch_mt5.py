@@ -1,16 +1,24 @@
+import os
 import sys
-import json
+import time
+import argparse
 import traceback
-from datetime import datetime
+from datetime import datetime, timezone
 
 import MetaTrader5 as mt5
 import pandas as pd
 
 from alerts import slack_alert, email_alert
+from candle_cache import CandleCache
+from live_params import load_params, strategy_kwargs
+from metrics import trade_stats
+from order_executor import OrderExecutor, action_intent
+from state_store import StateStore
+from streaming_strategy import StreamingStrategy
+from session_pnl import SessionPnL
 
 # Load optimized parameters
-with open('best_params.json', 'r') as f:
-    params = json.load(f)
+params = load_params()
 
 SYMBOL        = params['symbol']
 TP            = params['take_profit_pips']
@@ -23,12 +31,21 @@ LOT_SIZE      = params.get('lot_size', 1.0)
 daily_pnl      = 0.0
 DAILY_MAX_LOSS = params.get('daily_max_loss', -100.0)
 
+# Sessions (and the daily PnL) roll over at this server-time hour
+SESSION_RESET_HOUR = params.get('session_reset_hour', 0)
+
 # Live trade log filename
 LIVE_LOG_FILE = 'live_trade_log.csv'
+# Incremental mode: engine, last bar and daily PnL carried between runs
+STATE_FILE    = 'batch_mt5_state.json'
+TIMEFRAME     = mt5.TIMEFRAME_M5
+
+# Local bar cache: each run only fetches bars newer than the cached tail
+candles = CandleCache(mt5)
 
 
 def get_data(symbol, timeframe, bars):
-    rates = mt5.copy_rates_from_pos(symbol, timeframe, 0, bars)
+    rates = candles.copy_rates_from_pos(symbol, timeframe, 0, bars)
     if rates is None or len(rates) == 0:
         raise RuntimeError("No data returned from MT5")
     df = pd.DataFrame(rates)
@@ -37,7 +54,96 @@ def get_data(symbol, timeframe, bars):
     return df
 
 
-def main():
+def fetch_closed_since(last_ts):
+    """Completed bars with time > last_ts; the still-forming newest bar is dropped."""
+    since = pd.Timestamp(last_ts).tz_localize(timezone.utc).to_pydatetime()
+    rates = mt5.copy_rates_range(SYMBOL, TIMEFRAME, since, datetime(2100, 1, 1, tzinfo=timezone.utc))
+    if rates is None or len(rates) == 0:
+        return pd.DataFrame()
+    df = pd.DataFrame(rates).iloc[:-1]
+    df['time'] = pd.to_datetime(df['time'], unit='s')
+    df.rename(columns={'open':'Open','high':'High','low':'Low','close':'Close','tick_volume':'Volume'}, inplace=True)
+    return df[df['time'] > pd.Timestamp(last_ts)].set_index('time')
+
+
+def append_live_trades(trades):
+    """Append closed trades to the live log instead of rewriting it each run."""
+    if not trades:
+        return
+    header = not os.path.isfile(LIVE_LOG_FILE) or os.path.getsize(LIVE_LOG_FILE) == 0
+    pd.DataFrame(trades).to_csv(LIVE_LOG_FILE, mode='a', header=header, index=False)
+
+
+def run_incremental():
+    """
+    Resume the persisted engine and feed it only bars closed since the last
+    run. The first run warms the engine up on BARS of history instead.
+    Opens and closes go to MT5 through the OrderExecutor; client IDs are
+    derived from the signal, so re-processing a bar does not send twice.
+    """
+    t0 = time.perf_counter()
+    store = StateStore(STATE_FILE, defaults={'last_ts': None, 'engine': None, 'pnl': None})
+    state = store.state
+    if state['engine']:
+        engine = StreamingStrategy.from_snapshot(state['engine'])
+        bars = fetch_closed_since(state['last_ts'])
+    else:
+        print(f"[INFO] No saved state; warming up on {BARS} bars for {SYMBOL} @ M5…")
+        kw = strategy_kwargs(params)
+        engine = StreamingStrategy(initial_equity=kw.pop('initial_equity'), **kw)
+        hist = get_data(SYMBOL, TIMEFRAME, BARS).set_index('time').iloc[:-1]
+        if hist.empty:
+            print(f"[⚠️] No closed bars for {SYMBOL} yet; nothing to warm up on")
+            store.close()
+            return
+        for _, bar in hist.iterrows():
+            engine.warm_up(bar)
+        state['last_ts'] = hist.index[-1].isoformat()
+        bars = hist.iloc[0:0]
+    pnl = SessionPnL.from_dict(state['pnl']) if state['pnl'] else SessionPnL(SESSION_RESET_HOUR)
+
+    executor = OrderExecutor(mt5, max_queue=2 * len(bars) + 1, on_result=lambda r: print(
+        f"[ORDER] {r['side']} {r['symbol']} {r['status']} @ {r.get('price')}"))
+    closed = []
+    for ts, bar in bars.iterrows():
+        pnl.roll(ts)
+        for action in engine.on_bar(bar):
+            # Circuit breaker: once the session is below the limit nothing more
+            # is sent until it rolls over (open positions keep their broker SL/TP)
+            halted = pnl.today <= DAILY_MAX_LOSS
+            price = action.get('exit_price', action['entry_price'])
+            print(f"[TRADE] {action['action'].upper()} {action['side']} @ {price:.2f}"
+                  + (" (halted, not sent)" if halted else ""))
+            if not halted:
+                executor.submit(action_intent(SYMBOL, action, LOT_SIZE))
+            if action['action'] == 'close':
+                pnl.add(ts, action['pnl'])
+                closed.append({k: v for k, v in action.items() if k != 'action'})
+    # Orders are settled before the bars are marked done, so a crash re-sends
+    # (and the client IDs de-duplicate) rather than skipping them
+    executor.close()
+    if len(bars):
+        state['last_ts'] = bars.index[-1].isoformat()
+    append_live_trades(closed)
+    store.update(last_ts=state['last_ts'], engine=engine.snapshot(), pnl=pnl.to_dict())
+    store.close()
+    print(f"[ℹ️] {executor.report()}")
+    print(f"[✅] Processed {len(bars)} new bar(s) in {(time.perf_counter() - t0) * 1000:.1f}ms; "
+          f"session {pnl.session} PnL {pnl.today:.2f}")
+
+    # Circuit breaker on the running session total
+    if pnl.today <= DAILY_MAX_LOSS:
+        msg = f"Daily PnL {pnl.today:.2f} <= limit {DAILY_MAX_LOSS}, halting trading."
+        slack_alert(msg)
+        email_alert("Circuit Breaker Triggered", msg)
+        sys.exit(0)
+
+    s = pnl.summary()
+    print(f"[SUMMARY] Trades: {s['trades']}  Wins: {s['wins']}  Losses: {s['losses']}  Win Rate: {s['win_rate']:.2%}")
+    print(f"[METRICS] PF: {s['profit_factor']:.2f}  Expectancy: {s['expectancy']:.4f}")
+
+
+def main(incremental=False):
     global daily_pnl
 
     # dynamic import to avoid circular issues
@@ -50,29 +156,17 @@ def main():
     print("[✅] MT5 initialized")
 
     try:
+        if incremental:
+            run_incremental()
+            return
+
         # 2) Fetch data
         print(f"[INFO] Fetching {BARS} bars for {SYMBOL} @ M5…")
         df = get_data(SYMBOL, mt5.TIMEFRAME_M5, BARS)
         print(f"[✅] Got {len(df)} rows")
 
         # 3) Run strategy (live orders inside)
-        results = run_strategy(
-            df,
-            take_profit_pips=TP,
-            stop_loss_pips=int(TP * ATR_STOP_MULT),
-            pip_factor=PIP_FACTORS[SYMBOL],
-            use_atr_stop=True,
-            atr_stop_multiplier=ATR_STOP_MULT,
-            atr_period=params.get('atr_period',10),
-            atr_multiplier=params.get('atr_multiplier',1.0),
-            sma50_distance_pips=params.get('sma50_distance_pips',30),
-            min_candle_size_pips=params.get('min_candle_size_pips',0.5),
-            min_leg_move=params.get('min_leg_move',0.3),
-            max_leg_gap=params.get('max_leg_gap',10),
-            initial_equity=params.get('initial_equity',1000.0),
-            symbol=SYMBOL,
-            lot_size=LOT_SIZE
-        )
+        results = run_strategy(df, symbol=SYMBOL, **strategy_kwargs(params))
 
         # 4) Circuit breaker: sum PnL of all closed trades
         trades = results['trade_log']
@@ -89,9 +183,8 @@ def main():
         total  = wins + losses
         win_rate = wins / total if total else 0
 
-        avg_win  = trades.loc[trades['profit']>0,'profit'].mean()  or 0
-        avg_loss = trades.loc[trades['profit']<=0,'profit'].mean() or 0
-        pf       = trades.loc[trades['profit']>0,'profit'].sum() / abs(trades.loc[trades['profit']<=0,'profit'].sum() or 1)
+        stats    = trade_stats(trades['profit'].to_numpy(dtype=float))
+        avg_win, avg_loss, pf = stats['avg_win'], stats['avg_loss'], stats['profit_factor']
         expct    = win_rate * avg_win + (1 - win_rate) * avg_loss
         achieved_rr = (avg_win / abs(avg_loss)) if avg_loss else float('inf')
         target_rr   = TP / (TP * ATR_STOP_MULT)
@@ -120,4 +213,8 @@ def main():
         print("[ℹ️] MT5 shutdown complete")
 
 if __name__ == '__main__':
-    main()
+    p = argparse.ArgumentParser(description="Scheduled MT5 strategy run")
+    p.add_argument("--incremental", action="store_true",
+                   help=f"Resume from {STATE_FILE} and process only newly closed bars")
+    args = p.parse_args()
+    main(incremental=args.incremental)
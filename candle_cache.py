@@ -0,0 +1,202 @@
+# File: candle_cache.py
+"""
+Persistent, incremental candle cache in front of mt5.copy_rates_from_pos.
+
+Scripts that pull the same 10,000 bars on every run (or overlapping
+windows on every loop iteration) go through CandleCache instead:
+
+    import MetaTrader5 as mt5
+    from candle_cache import CandleCache
+
+    candles = CandleCache(mt5)
+    rates = candles.copy_rates_from_pos("NAS100.a", mt5.TIMEFRAME_M5, 0, 10000)
+
+Bars are kept per (symbol, timeframe) in a BarStore under data/store/_mt5.
+Each call first asks the terminal only for bars from the cached tail
+onwards (copy_rates_range), then serves the requested positions from
+memory/disk. The terminal is asked for older history only when a request
+reaches further back than what is cached.
+
+Backfilled history is written to the store right away. Tail refreshes stay
+in memory and are written in batches (FLUSH_BARS new bars or FLUSH_SECS,
+whichever comes first) and by flush()/close() or at interpreter exit, since
+each store write rewrites the current year's partition. Bars lost to a
+crash are simply fetched again on the next run.
+
+The return value mimics MT5: a structured array with time (epoch seconds),
+open, high, low, close and tick_volume, oldest first. Set CANDLE_CACHE=off
+to bypass the cache.
+"""
+
+import atexit
+import os
+import time
+import weakref
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from bar_store import STORE_ROOT, BarStore, normalize_bars
+
+CACHE_ROOT   = os.getenv("CANDLE_CACHE_ROOT", os.path.join(STORE_ROOT, "_mt5"))
+CACHE_ENABLED = os.getenv("CANDLE_CACHE", "on").lower() != "off"
+# Seconds between tail refreshes for the same symbol/timeframe
+REFRESH_SECS = float(os.getenv("CANDLE_CACHE_REFRESH_SECS", "1"))
+# Refreshed tail bars held in memory before they are written to the store
+FLUSH_BARS   = int(os.getenv("CANDLE_CACHE_FLUSH_BARS", "500"))
+FLUSH_SECS   = float(os.getenv("CANDLE_CACHE_FLUSH_SECS", "300"))
+
+RATES_DTYPE = np.dtype([
+    ("time", "<i8"), ("open", "<f8"), ("high", "<f8"),
+    ("low", "<f8"), ("close", "<f8"), ("tick_volume", "<u8"),
+])
+# copy_rates_range upper bound; the terminal clips it to the current bar
+_FAR_FUTURE = datetime(2100, 1, 1, tzinfo=timezone.utc)
+
+_open_caches = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_open_caches():
+    for cache in list(_open_caches):
+        cache.flush()
+
+
+def timeframe_name(mt5, timeframe: int) -> str:
+    """'M5', 'H4', ... for an mt5.TIMEFRAME_* value."""
+    for attr in dir(mt5):
+        if attr.startswith("TIMEFRAME_") and getattr(mt5, attr) == timeframe:
+            return attr[len("TIMEFRAME_"):]
+    return str(timeframe)
+
+
+def bars_to_rates(bars: pd.DataFrame) -> np.ndarray:
+    """Normalized bars -> MT5-style structured rates array."""
+    rates = np.empty(len(bars), dtype=RATES_DTYPE)
+    rates["time"] = bars["Time"].to_numpy(dtype="datetime64[ns]").view(np.int64) // 1_000_000_000
+    rates["open"] = bars["Open"].to_numpy()
+    rates["high"] = bars["High"].to_numpy()
+    rates["low"] = bars["Low"].to_numpy()
+    rates["close"] = bars["Close"].to_numpy()
+    rates["tick_volume"] = bars["Volume"].to_numpy().astype(np.uint64)
+    return rates
+
+
+class CandleCache:
+    """Disk-backed copy_rates_from_pos that only fetches what it lacks."""
+
+    def __init__(self, mt5, root: str = CACHE_ROOT, refresh_secs: float = REFRESH_SECS,
+                 enabled: bool = CACHE_ENABLED, flush_bars: int = FLUSH_BARS,
+                 flush_secs: float = FLUSH_SECS):
+        self.mt5 = mt5
+        # Absolute: the exit-time flush may run after the working directory changed
+        self.store = BarStore(root=os.path.abspath(root))
+        self.refresh_secs = refresh_secs
+        self.enabled = enabled
+        self.flush_bars = flush_bars
+        self.flush_secs = flush_secs
+        self._bars = {}          # (symbol, tf) -> normalized DataFrame, oldest first
+        self._refreshed = {}     # (symbol, tf) -> monotonic time of last tail refresh
+        self._exhausted = set()  # keys whose full terminal history is cached
+        self._dirty = {}         # (symbol, tf) -> (tf_name, oldest unsaved Time, monotonic since)
+        self.terminal_bars = 0   # bars received from the terminal (for reporting)
+        _open_caches.add(self)
+
+    # -- internals ------------------------------------------------------------
+
+    def _merge(self, key, tf_name, new_rates, persist=True):
+        if new_rates is None or len(new_rates) == 0:
+            return self._bars[key]
+        new = normalize_bars(pd.DataFrame(new_rates))
+        self.terminal_bars += len(new)
+        bars = pd.concat([self._bars[key], new], ignore_index=True)
+        bars = bars.sort_values("Time", kind="stable").drop_duplicates("Time", keep="last")
+        self._bars[key] = bars.reset_index(drop=True)
+        if persist:
+            self.store.write(key[0], tf_name, new)
+        else:
+            self._mark_dirty(key, tf_name, new["Time"].iloc[0])
+        return self._bars[key]
+
+    def _mark_dirty(self, key, tf_name, since):
+        now = time.monotonic()
+        _, oldest, dirty_at = self._dirty.get(key, (tf_name, since, now))
+        oldest = min(oldest, since)
+        self._dirty[key] = (tf_name, oldest, dirty_at)
+        times = self._bars[key]["Time"].to_numpy()
+        unsaved = len(times) - np.searchsorted(times, oldest.to_datetime64())
+        if unsaved >= self.flush_bars or now - dirty_at >= self.flush_secs:
+            self._flush_key(key)
+
+    def _flush_key(self, key):
+        tf_name, oldest, _ = self._dirty.pop(key)
+        bars = self._bars[key]
+        self.store.write(key[0], tf_name, bars[bars["Time"] >= oldest])
+
+    def _refresh_tail(self, key, tf_name):
+        symbol, timeframe = key
+        if key not in self._bars:
+            self._bars[key] = self.store.read(symbol, tf_name)
+        bars = self._bars[key]
+        if bars.empty:
+            return bars
+        now = time.monotonic()
+        if now - self._refreshed.get(key, -np.inf) < self.refresh_secs:
+            return bars
+        # Re-read the last cached bar too: it may have been the forming bar
+        last = bars["Time"].iloc[-1].tz_localize(timezone.utc).to_pydatetime()
+        rates = self.mt5.copy_rates_range(symbol, timeframe, last, _FAR_FUTURE)
+        self._refreshed[key] = now
+        return self._merge(key, tf_name, rates, persist=False)
+
+    def _backfill(self, key, tf_name, need):
+        symbol, timeframe = key
+        bars = self._bars[key]
+        n = len(bars)
+        if n:
+            # Overlap one bar so a gap (e.g. a bar formed meanwhile) is detectable
+            rates = self.mt5.copy_rates_from_pos(symbol, timeframe, n - 1, need - n + 1)
+            fetched = 0 if rates is None else len(rates)
+            if fetched and pd.Timestamp(int(rates["time"][-1]), unit="s") != bars["Time"].iloc[0]:
+                rates = self.mt5.copy_rates_from_pos(symbol, timeframe, 0, need)
+                fetched = 0 if rates is None else len(rates)
+                if fetched < need:
+                    self._exhausted.add(key)
+            elif fetched < need - n + 1:
+                self._exhausted.add(key)
+        else:
+            rates = self.mt5.copy_rates_from_pos(symbol, timeframe, 0, need)
+            if rates is None or len(rates) < need:
+                self._exhausted.add(key)
+        self._refreshed[key] = time.monotonic()
+        return self._merge(key, tf_name, rates)
+
+    # -- public API -------------------------------------------------------------
+
+    def flush(self):
+        """Write refreshed tail bars that are still only in memory."""
+        for key in list(self._dirty):
+            self._flush_key(key)
+
+    def close(self):
+        self.flush()
+        _open_caches.discard(self)
+
+    def bars(self, symbol: str, timeframe: int, start_pos: int, count: int) -> pd.DataFrame:
+        """Normalized bars at positions start_pos .. start_pos+count-1 (0 = newest)."""
+        key = (symbol, timeframe)
+        tf_name = timeframe_name(self.mt5, timeframe)
+        bars = self._refresh_tail(key, tf_name)
+        need = start_pos + count
+        if len(bars) < need and key not in self._exhausted:
+            bars = self._backfill(key, tf_name, need)
+        n = len(bars)
+        return bars.iloc[max(0, n - need):max(0, n - start_pos)].reset_index(drop=True)
+
+    def copy_rates_from_pos(self, symbol: str, timeframe: int, start_pos: int, count: int):
+        """Drop-in for mt5.copy_rates_from_pos; returns None when no bars are available."""
+        if not self.enabled:
+            return self.mt5.copy_rates_from_pos(symbol, timeframe, start_pos, count)
+        bars = self.bars(symbol, timeframe, start_pos, count)
+        return bars_to_rates(bars) if len(bars) else None
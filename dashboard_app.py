@@ -2,8 +2,9 @@
 """
 A simple Flask web dashboard to view overall and per-symbol trade statistics.
 """
-from flask import Flask, render_template_string, abort
+from flask import Flask, render_template_string, abort, request
 from utils.db_utils import get_all_symbols_summary, get_overall_summary, get_symbol_trades
+from alert_journal import get_journal
 
 app = Flask(__name__)
 
@@ -98,6 +99,45 @@ template_detail = '''
 </html>
 '''
 
+# HTML template for the alert history
+template_alerts = '''
+<!doctype html>
+<html lang="en">
+<head>
+  <meta charset="utf-8">
+  <title>Alerts</title>
+  <style>
+    body { font-family: Arial, sans-serif; margin: 40px; }
+    table { border-collapse: collapse; width: 100%; margin-bottom: 40px; }
+    th, td { border: 1px solid #ddd; padding: 8px; text-align: center; }
+    th { background-color: #f2f2f2; }
+  </style>
+</head>
+<body>
+  <h1>Alerts by Symbol</h1>
+  <table>
+    <tr><th>Symbol</th><th>Config</th><th>Alerts</th><th>Worst</th><th>Last</th></tr>
+    {% for s in summary %}
+      <tr>
+        <td><a href="/alerts?symbol={{ s.symbol }}">{{ s.symbol }}</a></td>
+        <td>{{ s.config }}</td><td>{{ s.alerts }}</td>
+        <td>{{ '%.2f'|format(s.worst) if s.worst is not none else '' }}</td><td>{{ s.last }}</td>
+      </tr>
+    {% endfor %}
+  </table>
+  <h1>Recent Alerts{% if symbol %} for {{ symbol }}{% endif %}</h1>
+  <table>
+    <tr><th>Time</th><th>Symbol</th><th>Config</th><th>Drawdown</th></tr>
+    {% for a in alerts %}
+      <tr><td>{{ a.timestamp }}</td><td>{{ a.symbol }}</td><td>{{ a.config }}</td>
+          <td>{{ '%.2f'|format(a.drawdown) if a.drawdown is defined else '' }}</td></tr>
+    {% endfor %}
+  </table>
+  <p><a href="/">Back to Dashboard</a></p>
+</body>
+</html>
+'''
+
 @app.route('/')
 def index():
     db_path = 'centralized/results/test_master_summary.db'
@@ -125,5 +165,16 @@ def symbol_detail(symbol):
         rows=rows
     )
 
+@app.route('/alerts')
+def alerts():
+    symbol = request.args.get('symbol')
+    journal = get_journal()
+    return render_template_string(
+        template_alerts,
+        symbol=symbol,
+        summary=journal.summary(),
+        alerts=journal.recent(limit=100, symbol=symbol)
+    )
+
 if __name__ == '__main__':
     app.run(debug=True)
@@ -1,6 +1,7 @@
-import pandas as pd
 import numpy as np
 
+from metrics import sharpe, trade_stats
+
 def evaluate_trades(trades, initial_equity=1000):
     if not trades:
         return {
@@ -10,20 +11,13 @@ def evaluate_trades(trades, initial_equity=1000):
             "final_equity": initial_equity,
         }
 
-    df = pd.DataFrame(trades)
-    df["pnl"] = df["profit"]
-
-    equity = initial_equity + df["pnl"].cumsum()
-    returns = df["pnl"] / initial_equity
-
-    win_rate = (df["pnl"] > 0).mean()
-    avg_return = returns.mean()
-
-    sharpe = returns.mean() / (returns.std() + 1e-9) * np.sqrt(252) if len(returns) > 1 else 0
+    pnl = np.fromiter((t["profit"] for t in trades), dtype=float, count=len(trades))
+    returns = pnl / initial_equity
+    stats = trade_stats(returns)
 
     return {
-        "win_rate": win_rate,
-        "avg_return": avg_return,
-        "sharpe_ratio": sharpe,
-        "final_equity": equity.iloc[-1],
+        "win_rate": stats["win_rate"],
+        "avg_return": stats["avg_return"],
+        "sharpe_ratio": sharpe(returns, periods=252, eps=1e-9),
+        "final_equity": initial_equity + pnl.sum(),
     }
@@ -17,6 +17,8 @@ def main():
 
     # Load full optimization results
     df = pd.read_csv(RESULTS_CSV)
+    # The optimizer keeps zero-trade combos so resumed runs can skip them
+    df = df[df['trades'] > 0]
 
     # Ensure numeric types
     for col in ['win_rate', 'avg_return', 'sharpe']:
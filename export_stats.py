@@ -6,6 +6,8 @@ import json
 import pandas as pd
 from typing import Optional
 
+from metrics import max_drawdown, returns_from_equity, sharpe, trade_stats
+
 
 def compute_stats_for(symbol: str,
                       trades_csv: Path,
@@ -16,30 +18,20 @@ def compute_stats_for(symbol: str,
     """
     df = pd.read_csv(trades_csv)
 
-    # Win rate
-    win_rate = float((df.get("profit", pd.Series()).gt(0).mean())) if "profit" in df else 0.0
+    # Win rate and profit factor (sum(wins)/sum(losses))
+    win_rate, pf = 0.0, float("nan")
+    if "profit" in df:
+        stats = trade_stats(df["profit"].to_numpy(dtype=float))
+        win_rate, pf = stats["win_rate"], stats["profit_factor"]
 
-    # Max drawdown from equity curve if provided
+    # Max drawdown and daily Sharpe from the equity curve if provided
     max_dd = 0.0
+    sharpe_ratio = 0.0
     if equity_csv and equity_csv.exists():
-        eq = pd.read_csv(equity_csv)
-        cum_max = eq["equity"].cummax()
-        drawdown = (cum_max - eq["equity"]) / cum_max
-        max_dd = float(drawdown.max())
-
-    # Sharpe ratio
-    sharpe = 0.0
-    if equity_csv and equity_csv.exists():
-        daily_returns = eq["equity"].pct_change().dropna()
-        if not daily_returns.empty and daily_returns.std() != 0:
-            sharpe = float((daily_returns.mean() / daily_returns.std()) * (252 ** 0.5))
-
-    # Profit factor: sum(wins)/sum(losses)
-    pf = float("nan")
-    if "profit" in df:
-        wins   = df.loc[df.profit > 0, "profit"].sum()
-        losses = -df.loc[df.profit < 0, "profit"].sum()
-        pf = wins / losses if losses > 0 else float("inf")
+        equity = pd.read_csv(equity_csv)["equity"].to_numpy(dtype=float)
+        max_dd = max_drawdown(equity, relative=True)
+        if len(equity) > 1:
+            sharpe_ratio = sharpe(returns_from_equity(equity), periods=252)
 
     # Average holding time in minutes, if entry/exit columns exist
     avg_hold = None
@@ -54,7 +46,7 @@ def compute_stats_for(symbol: str,
     return {
         "win_rate":        win_rate,
         "max_drawdown":    max_dd,
-        "sharpe":          sharpe,
+        "sharpe":          sharpe_ratio,
         "profit_factor":   pf,
         "avg_holding_min": avg_hold if avg_hold is not None else 0.0
     }
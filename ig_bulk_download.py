@@ -0,0 +1,240 @@
+# File: ig_bulk_download.py
+"""
+Concurrent IG history download into the bar store.
+
+Many (epic, resolution, date range) jobs run at once over asyncio, at most
+`concurrency` in flight. IGClient is requests-based, so each job runs
+fetch_range in a worker thread; the client's shared rate limiter keeps the
+combined request rate under REQUESTS_PER_MINUTE, so concurrency overlaps
+network latency rather than raising the request budget.
+
+    jobs = [DownloadJob("IX.D.NASDAQ.CASH.IP", "MINUTE_5", "2024-01-01", "2024-07-01"),
+            DownloadJob("IX.D.DOW.DAILY.IP", "HOUR", "2023-01-01")]
+    report = bulk_download(client, jobs, concurrency=4)
+
+- Every chunk is written straight into the BarStore (symbol = job.symbol
+  or the epic, timeframe = M5/H1/D1 ... from the IG resolution).
+- After each stored chunk the job's progress is journalled in
+  <store root>/_ig_download.json, so a rerun after a crash, network error
+  or exhausted allowance resumes each job from its last completed chunk.
+  A job without an end date resumes up to the open of the bar still
+  forming "now" (incremental top-up), so a partial bar is never stored.
+- A progress line (jobs, bars, bars/sec) is printed every PROGRESS_SECS.
+- IGAllowanceExceeded stops the whole run; other errors only fail their job.
+
+CLI:
+    python ig_bulk_download.py --epics IX.D.NASDAQ.CASH.IP IX.D.DOW.DAILY.IP \\
+        --resolutions MINUTE_5 HOUR --start 2024-01-01 --end 2024-07-01 --concurrency 4
+
+Credentials come from IG_API_KEY, IG_USERNAME and IG_PASSWORD (--live for
+the live gateway).
+"""
+
+import argparse
+import asyncio
+import os
+import threading
+import time
+from collections import namedtuple
+
+import pandas as pd
+
+from bar_store import BarStore
+from ig_data_fetcher import CHUNK_BARS, RESOLUTIONS, IGAllowanceExceeded, IGClient
+from state_store import StateStore
+
+CONCURRENCY   = int(os.getenv("IG_DOWNLOAD_CONCURRENCY", "4"))
+PROGRESS_SECS = float(os.getenv("IG_DOWNLOAD_PROGRESS_SECS", "10"))
+MANIFEST_NAME = "_ig_download.json"
+
+# IG resolution -> bar store timeframe folder
+TIMEFRAMES = {
+    "SECOND": "S1", "MINUTE": "M1", "MINUTE_2": "M2", "MINUTE_3": "M3",
+    "MINUTE_5": "M5", "MINUTE_10": "M10", "MINUTE_15": "M15", "MINUTE_30": "M30",
+    "HOUR": "H1", "HOUR_2": "H2", "HOUR_3": "H3", "HOUR_4": "H4",
+    "DAY": "D1", "WEEK": "W1", "MONTH": "MN1",
+}
+
+DownloadJob = namedtuple("DownloadJob", "epic resolution start end symbol", defaults=(None, None))
+
+
+def utc_now() -> pd.Timestamp:
+    return pd.Timestamp.utcnow().tz_localize(None)
+
+
+def closed_until(resolution: str, now: pd.Timestamp) -> pd.Timestamp:
+    """Exclusive end of the closed bars at `now`: the forming bar's open."""
+    return now.floor(RESOLUTIONS[resolution])
+
+
+def job_key(job: DownloadJob) -> str:
+    """Manifest key; the end date is left out so open-ended jobs can top up."""
+    return f"{job.epic}|{job.resolution}|{pd.Timestamp(job.start).isoformat()}"
+
+
+class Progress:
+    """Thread-safe bar/job counters with a bars/sec rate."""
+
+    def __init__(self, total_jobs: int):
+        self.total_jobs = total_jobs
+        self.done = 0
+        self.failed = 0
+        self.bars = 0
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add_bars(self, n: int):
+        with self._lock:
+            self.bars += n
+
+    def finish(self, ok: bool):
+        with self._lock:
+            if ok:
+                self.done += 1
+            else:
+                self.failed += 1
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    @property
+    def rate(self) -> float:
+        return self.bars / self.elapsed if self.elapsed > 0 else 0.0
+
+    def line(self) -> str:
+        return (f"[📊] {self.done + self.failed}/{self.total_jobs} jobs "
+                f"({self.failed} failed) | {self.bars:,} bars | {self.rate:,.0f} bars/s")
+
+
+class BulkDownloader:
+    """Runs DownloadJobs against one IGClient and persists per-chunk progress."""
+
+    def __init__(self, client: IGClient, store: BarStore = None, concurrency: int = CONCURRENCY,
+                 side: str = "bid", chunk_bars: int = CHUNK_BARS, manifest: StateStore = None,
+                 progress_secs: float = PROGRESS_SECS, clock=utc_now):
+        self.client = client
+        self.store = store or BarStore()
+        self.concurrency = max(1, concurrency)
+        self.side = side
+        self.chunk_bars = chunk_bars
+        self.manifest = manifest or StateStore(os.path.join(self.store.root, MANIFEST_NAME),
+                                               flush_every=1)
+        self.progress_secs = progress_secs
+        self.clock = clock
+        self._manifest_lock = threading.Lock()
+        self._abort = threading.Event()
+
+    def resume_from(self, job: DownloadJob) -> pd.Timestamp:
+        """Where the job should restart: its start, or the end of its last stored chunk."""
+        done_to = self.manifest.state.get(job_key(job))
+        start = pd.Timestamp(job.start)
+        return max(start, pd.Timestamp(done_to)) if done_to else start
+
+    def _run_job(self, job: DownloadJob, progress: Progress) -> int:
+        """Blocking body of one job (runs in a worker thread)."""
+        key = job_key(job)
+        symbol = job.symbol or job.epic
+        timeframe = TIMEFRAMES[job.resolution]
+        if job.end is not None:
+            end = pd.Timestamp(job.end)
+        else:
+            # Stop before the forming bar: the manifest marks everything up to
+            # `end` done, so a partial bar stored now would never be refetched
+            end = closed_until(job.resolution, self.clock())
+        lo = self.resume_from(job)
+        if lo >= end:
+            return 0
+        written = 0
+
+        def on_chunk(df, hi):
+            nonlocal written
+            if self._abort.is_set():
+                raise IGAllowanceExceeded("run aborted")
+            if not df.empty:
+                self.store.write(symbol, timeframe, df.rename_axis("Time").reset_index())
+            # Only mark the window done once its bars are on disk
+            with self._manifest_lock:
+                self.manifest.update(**{key: hi.isoformat()})
+            written += len(df)
+            progress.add_bars(len(df))
+
+        self.client.fetch_range(job.epic, job.resolution, lo, end, side=self.side,
+                                chunk_bars=self.chunk_bars, on_chunk=on_chunk)
+        return written
+
+    async def _worker(self, job, sem, progress, results):
+        async with sem:
+            key = job_key(job)
+            if self._abort.is_set():
+                results["pending"].append(key)
+                return
+            try:
+                bars = await asyncio.to_thread(self._run_job, job, progress)
+            except IGAllowanceExceeded as e:
+                if not self._abort.is_set():
+                    self._abort.set()
+                    print(f"[❌] IG allowance exhausted on {key}: {e} -- stopping, rerun to resume")
+                results["pending"].append(key)
+                progress.finish(False)
+                return
+            except Exception as e:
+                print(f"[⚠️] {key} failed: {e}")
+                results["failed"][key] = str(e)
+                progress.finish(False)
+                return
+            results["bars"][key] = bars
+            progress.finish(True)
+
+    async def _report(self, progress):
+        while True:
+            await asyncio.sleep(self.progress_secs)
+            print(progress.line())
+
+    async def run(self, jobs) -> dict:
+        """
+        Download every job; returns {'bars': {key: n}, 'failed': {key: error},
+        'pending': [keys], 'total_bars', 'secs', 'bars_per_sec'}.
+        """
+        # Two jobs for the same key would race on the same partitions
+        jobs = list({job_key(j): j for j in jobs}.values())
+        progress = Progress(len(jobs))
+        results = {"bars": {}, "failed": {}, "pending": []}
+        sem = asyncio.Semaphore(self.concurrency)
+        reporter = asyncio.create_task(self._report(progress))
+        try:
+            await asyncio.gather(*(self._worker(j, sem, progress, results) for j in jobs))
+        finally:
+            reporter.cancel()
+            self.manifest.compact()
+        print(progress.line())
+        results.update(total_bars=progress.bars, secs=progress.elapsed, bars_per_sec=progress.rate)
+        return results
+
+
+def bulk_download(client: IGClient, jobs, **kwargs) -> dict:
+    """Synchronous wrapper around BulkDownloader.run (see module docstring)."""
+    return asyncio.run(BulkDownloader(client, **kwargs).run(jobs))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download IG price history into the bar store")
+    parser.add_argument("--epics", nargs="+", required=True)
+    parser.add_argument("--resolutions", nargs="+", default=["MINUTE_5"], choices=sorted(RESOLUTIONS))
+    parser.add_argument("--start", required=True)
+    parser.add_argument("--end", default=None, help="exclusive; default is now")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--side", default="bid", choices=["bid", "ask", "mid"])
+    parser.add_argument("--store", default=None, help="bar store root (default BAR_STORE_ROOT)")
+    parser.add_argument("--live", action="store_true", help="use the live gateway instead of demo")
+    args = parser.parse_args()
+
+    client = IGClient(os.environ["IG_API_KEY"], os.environ["IG_USERNAME"], os.environ["IG_PASSWORD"],
+                      demo=not args.live, pool_size=args.concurrency)
+    store = BarStore(args.store) if args.store else BarStore()
+    jobs = [DownloadJob(epic, res, args.start, args.end) for epic in args.epics for res in args.resolutions]
+    report = bulk_download(client, jobs, store=store, concurrency=args.concurrency, side=args.side)
+    if report["failed"] or report["pending"]:
+        print(f"[⚠️] {len(report['failed'])} failed, {len(report['pending'])} pending -- rerun to resume")
+    else:
+        print(f"[✅] {report['total_bars']:,} bars in {report['secs']:.1f}s")
@@ -1,16 +1,122 @@
-import requests
+# File: ig_data_fetcher.py
+"""
+IG REST client for historical prices.
+
+    client = IGClient(api_key, username, password, demo=True)
+    df = client.fetch_range("IX.D.NASDAQ.CASH.IP", "MINUTE_5", "2024-01-01", "2024-02-01")
+
+- One pooled requests.Session (keep-alive, retries on 5xx for GETs).
+- fetch_range splits [start, end) into chunks of CHUNK_BARS bars and walks
+  IG's v3 pageNumber/totalPages within each chunk.
+- An expired CST/X-SECURITY-TOKEN (401 token error) triggers one
+  re-authentication and a retry of the request.
+- Requests are spaced to stay under REQUESTS_PER_MINUTE, and the weekly
+  historical-data allowance reported in each response is tracked; a chunk
+  that would overrun it raises IGAllowanceExceeded instead of burning the
+  rest of the week's points.
+- Prices are parsed column-wise into float64/datetime64 arrays.
+- The client may be shared by threads (see ig_bulk_download.py): the rate
+  limiter is locked and concurrent token errors trigger one re-login.
+"""
+
+import threading
+import time
+from collections import deque
+
+import numpy as np
 import pandas as pd
-import datetime
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEMO_URL = "https://demo-api.ig.com/gateway/deal"
+LIVE_URL = "https://api.ig.com/gateway/deal"
+
+REQUESTS_PER_MINUTE = 30   # IG's non-trading limit is 60/min per app; stay well under
+CHUNK_BARS          = 1000
+PAGE_SIZE           = 500
+TOKEN_ERRORS = ("error.security.client-token-invalid", "error.security.oauth-token-invalid",
+                "error.security.account-token-invalid")
+
+RESOLUTIONS = {
+    "SECOND": "1s", "MINUTE": "1min", "MINUTE_2": "2min", "MINUTE_3": "3min",
+    "MINUTE_5": "5min", "MINUTE_10": "10min", "MINUTE_15": "15min", "MINUTE_30": "30min",
+    "HOUR": "1h", "HOUR_2": "2h", "HOUR_3": "3h", "HOUR_4": "4h",
+    "DAY": "1D", "WEEK": "7D", "MONTH": "31D",
+}
+
+
+class IGAllowanceExceeded(RuntimeError):
+    """The weekly historical-price allowance cannot cover the request."""
+
+
+class RateLimiter:
+    """Sliding one-minute window: wait() blocks until a request slot is free (thread-safe)."""
+
+    def __init__(self, per_minute: int = REQUESTS_PER_MINUTE, clock=time.monotonic, sleep=time.sleep):
+        self.per_minute = per_minute
+        self.clock = clock
+        self.sleep = sleep
+        self._sent = deque()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = self.clock()
+            while self._sent and now - self._sent[0] >= 60:
+                self._sent.popleft()
+            if len(self._sent) >= self.per_minute:
+                self.sleep(60 - (now - self._sent[0]))
+                self._sent.popleft()
+            self._sent.append(self.clock())
+
+
+def parse_prices(prices: list, side: str = "bid") -> pd.DataFrame:
+    """IG 'prices' list -> Date-indexed OHLCV frame (side: bid, ask or mid)."""
+    n = len(prices)
+    if not n:
+        return pd.DataFrame(columns=["Open", "High", "Low", "Close", "Volume"],
+                            index=pd.DatetimeIndex([], name="Date"))
+
+    def column(field):
+        if side == "mid":
+            bid = np.fromiter((np.nan if (v := p[field].get("bid")) is None else v for p in prices), float, n)
+            ask = np.fromiter((np.nan if (v := p[field].get("ask")) is None else v for p in prices), float, n)
+            return (bid + ask) / 2
+        return np.fromiter((np.nan if (v := p[field].get(side)) is None else v for p in prices), float, n)
+
+    # v3 has snapshotTimeUTC; older payloads only 'YYYY/MM/DD hh:mm:ss' snapshotTime
+    times = pd.to_datetime([p.get("snapshotTimeUTC") or p["snapshotTime"].replace("/", "-")
+                            for p in prices], format="ISO8601")
+    df = pd.DataFrame({
+        "Open": column("openPrice"),
+        "High": column("highPrice"),
+        "Low": column("lowPrice"),
+        "Close": column("closePrice"),
+        "Volume": np.fromiter((p.get("lastTradedVolume") or 0 for p in prices), float, n),
+    }, index=pd.DatetimeIndex(times, name="Date"))
+    return df.sort_index()
+
 
 class IGClient:
-    def __init__(self, api_key, username, password, demo=True):
+    def __init__(self, api_key, username, password, demo=True, base_url=None,
+                 requests_per_minute=REQUESTS_PER_MINUTE, pool_size=4):
         self.api_key = api_key
         self.username = username
         self.password = password
         self.demo = demo
+        self.base_url = base_url or (DEMO_URL if demo else LIVE_URL)
         self.session = requests.Session()
-        self.base_url = "https://demo-api.ig.com/gateway/deal" if demo else "https://api.ig.com/gateway/deal"
+        retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(502, 503, 504),
+                      allowed_methods=("GET",))
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.limiter = RateLimiter(requests_per_minute)
+        self.allowance = None        # last metadata.allowance from IG
+        self.reauths = 0
         self.authenticated = False
+        self._auth_lock = threading.Lock()
         self.authenticate()
 
     def authenticate(self):
@@ -18,6 +124,7 @@ class IGClient:
             "X-IG-API-KEY": self.api_key,
             "Content-Type": "application/json; charset=UTF-8",
             "Accept": "application/json; charset=UTF-8",
+            "Version": "2",
         }
         data = {
             "identifier": self.username,
@@ -34,31 +141,96 @@ class IGClient:
         })
         self.authenticated = True
 
-    def fetch_historical_prices(self, epic, resolution="MINUTE_5", num_points=500):
+    # -- transport ------------------------------------------------------------------
+
+    def _get(self, path, params, version="3"):
+        """Throttled GET; re-authenticates once if IG rejects the session tokens."""
         if not self.authenticated:
             raise Exception("Not authenticated")
+        for attempt in range(2):
+            self.limiter.wait()
+            cst = self.session.headers.get("CST")
+            response = self.session.get(f"{self.base_url}{path}", params=params,
+                                        headers={"Version": version})
+            if response.status_code == 401 and attempt == 0:
+                code = _error_code(response)
+                if code in TOKEN_ERRORS:
+                    self._reauthenticate(cst)
+                    continue
+            if response.status_code == 403 and "allowance" in _error_code(response):
+                raise IGAllowanceExceeded(_error_code(response))
+            response.raise_for_status()
+            return response.json()
 
-        params = {
-            "resolution": resolution,
-            "max": num_points,
-        }
-        url = f"{self.base_url}/prices/{epic}"
-        response = self.session.get(url, params=params)
-        response.raise_for_status()
-        data = response.json()
-
-        prices = data.get("prices", [])
-        records = []
-        for p in prices:
-            record = {
-                "Date": datetime.datetime.strptime(p["snapshotTime"], "%Y-%m-%dT%H:%M:%S"),
-                "Open": p.get("openPrice", {}).get("bid", None),
-                "High": p.get("highPrice", {}).get("bid", None),
-                "Low": p.get("lowPrice", {}).get("bid", None),
-                "Close": p.get("closePrice", {}).get("bid", None),
-                "Volume": p.get("lastTradedVolume", 0),
-            }
-            records.append(record)
-
-        df = pd.DataFrame(records).set_index("Date").sort_index()
-        return df
+    def _reauthenticate(self, stale_cst):
+        """Log in again unless another thread already replaced stale_cst."""
+        with self._auth_lock:
+            if self.session.headers.get("CST") == stale_cst:
+                self.reauths += 1
+                self.authenticate()
+
+    def _check_allowance(self, points):
+        if self.allowance and self.allowance.get("remainingAllowance", points) < points:
+            raise IGAllowanceExceeded(
+                f"Need {points} points, {self.allowance['remainingAllowance']} left "
+                f"(resets in {self.allowance.get('allowanceExpiry', '?')}s)")
+
+    # -- prices -----------------------------------------------------------------------
+
+    def _fetch_pages(self, epic, params, side):
+        frames, page = [], 1
+        while True:
+            data = self._get(f"/prices/{epic}", {**params, "pageSize": PAGE_SIZE, "pageNumber": page})
+            meta = data.get("metadata", {})
+            self.allowance = meta.get("allowance", self.allowance)
+            frames.append(parse_prices(data.get("prices", []), side))
+            page_data = meta.get("pageData", {})
+            if page >= page_data.get("totalPages", 1):
+                break
+            page += 1
+        return pd.concat(frames) if len(frames) > 1 else frames[0]
+
+    def fetch_range(self, epic, resolution="MINUTE_5", start=None, end=None,
+                    side="bid", chunk_bars=CHUNK_BARS, on_chunk=None):
+        """
+        All bars with start <= Date < end, fetched in chunk_bars-sized date
+        windows. on_chunk(df, hi) is called per chunk, hi being the exclusive
+        end of the window just fetched (e.g. to persist progress and resume).
+        """
+        bar = pd.Timedelta(RESOLUTIONS[resolution])
+        step = bar * chunk_bars
+        start = pd.Timestamp(start)
+        end = pd.Timestamp(end) if end is not None else pd.Timestamp.utcnow().tz_localize(None)
+        frames = []
+        lo = start
+        while lo < end:
+            hi = min(lo + step, end)
+            # Upper bound: closed-market gaps make IG return fewer points
+            self._check_allowance(int((hi - lo) / bar))
+            df = self._fetch_pages(epic, {
+                "resolution": resolution,
+                "from": lo.strftime("%Y-%m-%dT%H:%M:%S"),
+                # IG's 'to' is inclusive; stop short so chunk edges aren't fetched twice
+                "to": (hi - pd.Timedelta("1s")).strftime("%Y-%m-%dT%H:%M:%S"),
+            }, side)
+            df = df[(df.index >= lo) & (df.index < hi)]
+            if on_chunk is not None:
+                on_chunk(df, hi)
+            frames.append(df)
+            lo = hi
+        if not frames:
+            return parse_prices([], side)
+        out = pd.concat(frames)
+        return out[~out.index.duplicated(keep="last")].sort_index()
+
+    def fetch_historical_prices(self, epic, resolution="MINUTE_5", num_points=500):
+        """The most recent num_points bars."""
+        self._check_allowance(num_points)
+        return self._fetch_pages(epic, {"resolution": resolution, "max": num_points}, "bid")
+
+
+def _error_code(response) -> str:
+    try:
+        return response.json().get("errorCode", "")
+    except ValueError:
+        return ""
@@ -0,0 +1,128 @@
+# File: indicator_cache.py
+"""
+Process-local LRU cache for indicator arrays.
+
+Parameter grids re-run the strategy hundreds of times on the same dataset
+while only a couple of parameters touch the indicators (e.g. atr_period in
+{10, 14}).  Entries are keyed by (dataset fingerprint, indicator name,
+params), so each distinct indicator is computed once per dataset and
+reused by every other combo.
+
+    cache = get_cache()
+    fp = cache.fingerprint(df["High"], df["Low"], df["Close"])
+    atr = cache.get_or_compute(fp, "wilder_atr", (14,), lambda: wilder_atr(h, l, c, 14))
+    print(format_stats(cache.stats()))
+
+Cached arrays are marked read-only so a caller cannot corrupt them for the
+next hit.
+"""
+
+import hashlib
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+# Default memory budget, overridable via INDICATOR_CACHE_MB
+DEFAULT_MAX_BYTES = int(float(os.getenv("INDICATOR_CACHE_MB", "256")) * 1024 * 1024)
+
+
+def _nbytes(value) -> int:
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(v) for v in value)
+    return 0
+
+
+def _freeze(value):
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+        return value
+    if isinstance(value, tuple):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+class IndicatorCache:
+    """LRU mapping (fingerprint, name, params) -> array(s), bounded by bytes."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def fingerprint(*columns) -> str:
+        """Content hash of one or more price columns (Series or arrays)."""
+        h = hashlib.blake2b(digest_size=16)
+        for col in columns:
+            arr = np.ascontiguousarray(np.asarray(col, dtype=np.float64))
+            h.update(str(arr.shape).encode())
+            # Hash the buffer in place; read-only window views are not copied
+            h.update(memoryview(arr).cast('B'))
+        return h.hexdigest()
+
+    def get_or_compute(self, fingerprint: str, name: str, params: tuple, compute):
+        key = (fingerprint, name, tuple(params))
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+        self.misses += 1
+        value = _freeze(compute())
+        size = _nbytes(value)
+        if size > self.max_bytes:
+            return value
+        self._entries[key] = value
+        self.bytes_used += size
+        while self.bytes_used > self.max_bytes:
+            _, old = self._entries.popitem(last=False)
+            self.bytes_used -= _nbytes(old)
+            self.evictions += 1
+        return value
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes_used = 0
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self.bytes_used,
+        }
+
+
+def merge_stats(stats_list) -> dict:
+    """Sum stats() dicts, e.g. one per worker process."""
+    total = {"hits": 0, "misses": 0, "evictions": 0, "entries": 0, "bytes": 0}
+    for s in stats_list:
+        for k in total:
+            total[k] += s.get(k, 0)
+    return total
+
+
+def format_stats(stats: dict) -> str:
+    lookups = stats["hits"] + stats["misses"]
+    rate = stats["hits"] / lookups * 100 if lookups else 0.0
+    return (f"Indicator cache: {stats['hits']}/{lookups} hits ({rate:.1f}%), "
+            f"{stats['misses']} computed, {stats['evictions']} evicted, "
+            f"{stats['bytes'] / 1024 / 1024:.1f} MB held")
+
+
+_default_cache = None
+
+
+def get_cache() -> IndicatorCache:
+    """Process-wide cache instance (created lazily, one per worker process)."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = IndicatorCache()
+    return _default_cache
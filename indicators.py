@@ -0,0 +1,126 @@
+# File: indicators.py
+"""
+NumPy implementations of the indicators used by the SMA50 / stochastic / ATR
+strategy.  Each function takes contiguous float64 arrays and returns an array
+of the same length, NaN-padded during warm-up.
+
+Values match the streaming engine in streaming_strategy.py to
+floating-point rounding (it keeps running sums instead of re-summing).
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def _as_f64(values) -> np.ndarray:
+    return np.ascontiguousarray(values, dtype=np.float64)
+
+
+def sma(values, period: int) -> np.ndarray:
+    """Simple moving average; window values summed left to right."""
+    values = _as_f64(values)
+    n = len(values)
+    out = np.full(n, np.nan)
+    if n < period:
+        return out
+    m = n - period + 1
+    acc = np.zeros(m)
+    for j in range(period):
+        acc += values[j:j + m]
+    out[period - 1:] = acc / period
+    return out
+
+
+def rolling_max(values, period: int) -> np.ndarray:
+    values = _as_f64(values)
+    out = np.full(len(values), np.nan)
+    if len(values) >= period:
+        out[period - 1:] = sliding_window_view(values, period).max(axis=1)
+    return out
+
+
+def rolling_min(values, period: int) -> np.ndarray:
+    values = _as_f64(values)
+    out = np.full(len(values), np.nan)
+    if len(values) >= period:
+        out[period - 1:] = sliding_window_view(values, period).min(axis=1)
+    return out
+
+
+def stochastic(high, low, close, k_period: int = 14, d_period: int = 3):
+    """
+    Stochastic oscillator.  Returns (%K, %D); a flat window (high == low)
+    yields %K = 50.
+    """
+    close = _as_f64(close)
+    hh = rolling_max(high, k_period)
+    ll = rolling_min(low, k_period)
+    rng = hh - ll
+    with np.errstate(divide="ignore", invalid="ignore"):
+        k = np.where(rng != 0, 100.0 * (close - ll) / rng, 50.0)
+    k[np.isnan(hh)] = np.nan
+    d = np.full(len(close), np.nan)
+    start = k_period - 1
+    if len(close) > start:
+        d[start:] = sma(k[start:], d_period)
+    return k, d
+
+
+def true_range(high, low, close) -> np.ndarray:
+    """True range; the first bar has no previous close and uses high - low."""
+    high, low, close = _as_f64(high), _as_f64(low), _as_f64(close)
+    tr = high - low
+    if len(tr) > 1:
+        prev = close[:-1]
+        tr[1:] = np.maximum(np.maximum(tr[1:], np.abs(high[1:] - prev)), np.abs(low[1:] - prev))
+    return tr
+
+
+# Block length for wilder_smooth: a^-k stays far from overflow for any period >= 2
+WILDER_BLOCK = 64
+
+
+def wilder_smooth(values, period: int, seed: float) -> np.ndarray:
+    """
+    y[i] = (y[i-1] * (period - 1) + values[i]) / period, starting from y[-1] = seed.
+
+    The recurrence is solved a block at a time: one matrix product gives every
+    block's response from a zero start, and only the carry between blocks is
+    a Python loop (len / WILDER_BLOCK steps instead of one per bar).
+    """
+    x = _as_f64(values)
+    n = len(x)
+    if n == 0:
+        return np.empty(0)
+    a = (period - 1) / period
+    nb = -(-n // WILDER_BLOCK)
+    blocks = np.zeros(nb * WILDER_BLOCK)
+    blocks[:n] = x
+    blocks = blocks.reshape(nb, WILDER_BLOCK)
+
+    powers = a ** np.arange(WILDER_BLOCK + 1, dtype=np.float64)
+    lag = np.subtract.outer(np.arange(WILDER_BLOCK), np.arange(WILDER_BLOCK))
+    decay = np.where(lag >= 0, powers[np.clip(lag, 0, None)], 0.0)
+    zero_start = (blocks @ decay.T) / period
+
+    starts = np.empty(nb)
+    y = float(seed)
+    a_block = powers[WILDER_BLOCK]
+    for r, last in enumerate(zero_start[:, -1].tolist()):
+        starts[r] = y
+        y = a_block * y + last
+    out = zero_start + np.outer(starts, powers[1:])
+    return out.ravel()[:n]
+
+
+def wilder_atr(high, low, close, period: int = 14) -> np.ndarray:
+    """ATR with Wilder smoothing, seeded by the mean of the first `period` TRs."""
+    tr = true_range(high, low, close)
+    n = len(tr)
+    out = np.full(n, np.nan)
+    if n < period:
+        return out
+    seed = sum(tr[:period].tolist()) / period
+    out[period - 1] = seed
+    out[period:] = wilder_smooth(tr[period:], period, seed)
+    return out
@@ -1,8 +1,156 @@
 # File: live_data.py
+"""
+Today's closed deals from MT5, tracked incrementally.
+
+DealsTrackers share one module-level MT5 connection and, on each poll, ask only
+for deals from the last seen deal time onwards (dropping tickets it has
+already counted). Running intraday aggregates (PnL, deal count, wins,
+losses, per-magic totals) are updated as deals arrive, so summary() is
+O(1) however long the day has been. Aggregates reset at 00:00 UTC.
+
+    tracker = DealsTracker("NAS100.a")
+    tracker.poll()
+    print(tracker.summary()["pnl"])
+
+get_live_trades(symbol) keeps its original DataFrame output on top of a
+per-symbol tracker. close() (or any tracker's close()) shuts the shared
+connection down for all of them; the next poll reconnects.
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
 
 import pandas as pd
 import MetaTrader5 as mt5
-from datetime import datetime, timedelta
+
+
+# One terminal connection per process, shared by every tracker
+_connected = False
+
+
+def connect():
+    """Initialize the shared MT5 connection if it is not already up."""
+    global _connected
+    if not _connected:
+        if not mt5.initialize():
+            raise RuntimeError(f"MT5 initialize() failed: {mt5.last_error()}")
+        _connected = True
+
+
+def close():
+    """Shut the shared MT5 connection down (for every tracker)."""
+    global _connected
+    if _connected:
+        mt5.shutdown()
+        _connected = False
+
+
+def _blank_totals() -> dict:
+    return {"pnl": 0.0, "closed": 0, "wins": 0, "losses": 0}
+
+
+class DealsTracker:
+    """Incremental history_deals_get consumer with O(1) intraday aggregates."""
+
+    def __init__(self, group: str):
+        self.group = group
+        self._reset(self._today())
+
+    @staticmethod
+    def _utcnow() -> datetime:
+        return datetime.now(timezone.utc).replace(tzinfo=None)
+
+    def _today(self) -> datetime:
+        return self._utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def _reset(self, day: datetime):
+        self.day = day
+        self.last_ticket = 0
+        self.last_time = day
+        self.deals = 0
+        self.totals = _blank_totals()
+        self.per_magic = defaultdict(_blank_totals)
+        self._times, self._profits = [], []
+
+    @property
+    def connected(self) -> bool:
+        return _connected
+
+    def _add(self, deal):
+        self.deals += 1
+        self._times.append(deal.time)
+        self._profits.append(deal.profit)
+        if deal.entry == getattr(mt5, "DEAL_ENTRY_IN", 0):
+            return
+        for bucket in (self.totals, self.per_magic[deal.magic]):
+            bucket["pnl"] += deal.profit
+            bucket["closed"] += 1
+            if deal.profit > 0:
+                bucket["wins"] += 1
+            else:
+                bucket["losses"] += 1
+
+    def poll(self) -> int:
+        """Fetch deals newer than the last seen ticket; returns how many were new."""
+        today = self._today()
+        if today != self.day:
+            self._reset(today)
+        deals = self._fetch()
+        if deals is None:
+            # Terminal connection lost, e.g. shut down under us: reconnect once
+            print(f"[⚠️] history_deals_get({self.group}) failed: {mt5.last_error()}; reconnecting")
+            close()
+            deals = self._fetch()
+        if deals is None:
+            print(f"[⚠️] No deal history for {self.group}: {mt5.last_error()}; will retry next poll")
+            close()
+            return 0
+        new = sorted((d for d in deals if d.ticket > self.last_ticket), key=lambda d: d.ticket)
+        for deal in new:
+            self._add(deal)
+        if new:
+            self.last_ticket = new[-1].ticket
+            # Deals in the same second as the newest one are re-listed and skipped by ticket
+            newest = datetime.fromtimestamp(max(d.time for d in new), timezone.utc).replace(tzinfo=None)
+            self.last_time = max(self.last_time, newest)
+        return len(new)
+
+    def _fetch(self):
+        connect()
+        # Server clocks can run ahead of UTC, so leave the upper bound open a day
+        return mt5.history_deals_get(self.last_time, self._utcnow() + timedelta(days=1),
+                                     group=self.group)
+
+    def summary(self) -> dict:
+        t = self.totals
+        return {
+            "day": self.day.date().isoformat(),
+            "deals": self.deals,
+            **t,
+            "win_rate": t["wins"] / t["closed"] if t["closed"] else 0.0,
+            "per_magic": {m: dict(v) for m, v in self.per_magic.items()},
+        }
+
+    def frame(self) -> pd.DataFrame:
+        """Today's deals as a 'P/L' frame indexed by execution time."""
+        if not self._times:
+            return pd.DataFrame(columns=['P/L'])
+        return pd.DataFrame({'P/L': self._profits},
+                            index=pd.Index(pd.to_datetime(self._times, unit='s'), name='time'))
+
+    def close(self):
+        """Shuts the connection shared by every tracker; the next poll reconnects."""
+        close()
+
+
+_trackers = {}
+
+
+def get_tracker(symbol: str) -> DealsTracker:
+    """Shared tracker per symbol (kept across calls, like its MT5 connection)."""
+    if symbol not in _trackers:
+        _trackers[symbol] = DealsTracker(symbol)
+    return _trackers[symbol]
 
 
 def get_live_trades(symbol: str) -> pd.DataFrame:
@@ -12,29 +160,13 @@ def get_live_trades(symbol: str) -> pd.DataFrame:
 
     If no trades are found, returns an empty DataFrame with a 'P/L' column.
     """
-    # Initialize MT5
-    if not mt5.initialize():
-        raise RuntimeError(f"MT5 initialize() failed: {mt5.last_error()}")
-
-    # Define the time window (from 00:00 UTC today to now)
-    utc_end = datetime.utcnow()
-    utc_start = utc_end.replace(hour=0, minute=0, second=0, microsecond=0)
-
-    # Fetch closed deals for the symbol
-    deals = mt5.history_deals_get(utc_start, utc_end, group=symbol)
-    mt5.shutdown()
-
-    # No deals → empty DataFrame
-    if deals is None or len(deals) == 0:
-        return pd.DataFrame(columns=['P/L'])
-
-    # Convert to DataFrame
-    df = pd.DataFrame(list(deals), columns=deals[0]._asdict().keys())
-    df['time'] = pd.to_datetime(df['time'], unit='s')
-    df.set_index('time', inplace=True)
+    tracker = get_tracker(symbol)
+    tracker.poll()
+    return tracker.frame()
 
-    # Use the 'profit' field as P/L
-    df['P/L'] = df['profit']
 
-    # Keep only the P/L column
-    return df[['P/L']]
+def get_live_summary(symbol: str) -> dict:
+    """Intraday aggregates for symbol after one incremental poll."""
+    tracker = get_tracker(symbol)
+    tracker.poll()
+    return tracker.summary()
@@ -0,0 +1,237 @@
+# File: live_engine.py
+"""
+Multi-symbol live engine: one process, one MT5 connection, one scheduler.
+
+Each symbol gets a live BarFeed (tail-only polling, its own journaled
+state file) and an incremental StreamingStrategy restored from that state.
+A single asyncio scheduler sleeps until the earliest bar boundary across
+all symbols, polls only the feeds that are due and runs on_bar for each
+new bar, so 20 symbols cost 20 small strategy states instead of 20
+processes re-running the full backtest.
+
+Strategy settings come from best_params.json (live_params.strategy_kwargs,
+with each symbol's pip factor), as in batch_mt5 and mt5_place_order.
+By default the engine is signal-only: actions are printed and no order is
+sent. With --trade every open/close also goes to MT5 through an
+OrderExecutor (client IDs from the signal, so restarts do not resend).
+
+Polls run in worker threads (BarFeed.adrain), so a slow fetch for one
+symbol does not hold up the others; strategies run on the loop thread.
+
+Latency per symbol is recorded as:
+  - decision_ms: poll start -> strategy decision (fetch + on_bar)
+  - bar_lag_ms:  bar timestamp -> decision, on the feed's bar clock
+
+    python live_engine.py --symbols NAS100.a,US30.a,GER40.a --timeframe 5 [--trade]
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from bar_feed import BarFeed
+from live_params import PARAMS_FILE, load_params, strategy_kwargs
+from order_executor import OrderExecutor, action_intent
+from streaming_strategy import StreamingStrategy
+
+STATE_DIR       = os.path.join("state", "live")
+REPORT_EVERY    = int(os.getenv("LIVE_REPORT_EVERY", "12"))  # scheduler wakes between reports
+# Feeds due within this many seconds of the earliest one are polled together
+SCHED_TOLERANCE = 0.5
+MIN_IDLE        = 0.25
+
+
+class LatencyStats:
+    """Bounded sample window with percentile summaries (milliseconds)."""
+
+    def __init__(self, maxlen: int = 1000):
+        self.samples = deque(maxlen=maxlen)
+        self.count = 0
+
+    def add(self, ms: float):
+        self.samples.append(ms)
+        self.count += 1
+
+    def summary(self) -> dict:
+        if not self.samples:
+            return {"n": 0}
+        arr = np.fromiter(self.samples, dtype=float)
+        return {
+            "n": self.count,
+            "mean": float(arr.mean()),
+            "p50": float(np.percentile(arr, 50)),
+            "p95": float(np.percentile(arr, 95)),
+            "max": float(arr.max()),
+        }
+
+
+class SymbolRunner:
+    """One symbol's feed, strategy state and latency counters."""
+
+    def __init__(self, feed: BarFeed, **strategy_params):
+        # Equity starts from the feed's balance, not the params file
+        strategy_params.pop("initial_equity", None)
+        self.feed = feed
+        self.symbol = feed.symbol
+        snap = feed.store.state.get("engine")
+        if snap:
+            self.strategy = StreamingStrategy.from_snapshot(snap)
+            # The engine's own position wins if an older state file disagrees
+            if snap.get("last_ts"):
+                feed.state["last_ts"] = snap["last_ts"]
+        else:
+            self.strategy = StreamingStrategy(initial_equity=feed.get_balance(), **strategy_params)
+            last_ts = pd.to_datetime(feed.state["last_ts"]) if feed.state["last_ts"] else None
+            for ts, bar in feed.df_hist.iterrows():
+                if last_ts is None or ts <= last_ts:
+                    self.strategy.warm_up(bar)
+        self.decision = LatencyStats()
+        self.bar_lag = LatencyStats()
+        self.bars = 0
+
+    def process(self, on_action) -> int:
+        """Poll the feed once and run every new bar through the strategy."""
+        t0 = time.perf_counter()
+        return self._run_bars(self.feed.drain(commit=False), t0, on_action)
+
+    async def aprocess(self, on_action) -> int:
+        """process() with the poll in a worker thread."""
+        t0 = time.perf_counter()
+        return self._run_bars(await self.feed.adrain(commit=False), t0, on_action)
+
+    def _run_bars(self, bars, t0, on_action) -> int:
+        for bar in bars:
+            for action in self.strategy.on_bar(bar):
+                on_action(self.symbol, action)
+            now = time.perf_counter()
+            self.decision.add((now - t0) * 1000)
+            self.bar_lag.add((self.feed.now() - bar.name).total_seconds() * 1000)
+            # last_ts only advances after on_bar, in the same journal update as
+            # the engine (snapshotted per flush), so the two never disagree
+            self.feed.commit(bar, balance=self.strategy.equity, engine=self.strategy.snapshot)
+            self.bars += 1
+        return len(bars)
+
+    def report(self) -> str:
+        d, lag = self.decision.summary(), self.bar_lag.summary()
+        if not d["n"]:
+            return f"{self.symbol}: no bars yet"
+        return (f"{self.symbol}: {self.bars} bars, equity {self.strategy.equity:.2f} | "
+                f"decision p50 {d['p50']:.1f}ms p95 {d['p95']:.1f}ms max {d['max']:.1f}ms | "
+                f"bar lag p50 {lag['p50'] / 1000:.1f}s")
+
+
+def print_action(symbol: str, action: dict):
+    price = action.get("exit_price", action["entry_price"])
+    print(f"[{symbol}] {action['action'].upper()} {action['side']} @ {price:.2f}")
+
+
+def order_actions(executor: OrderExecutor, volume: float):
+    """on_action that prints each action and sends it through `executor`."""
+    def on_action(symbol: str, action: dict):
+        print_action(symbol, action)
+        executor.submit(action_intent(symbol, action, volume))
+    return on_action
+
+
+def make_runners(symbols, timeframe: int, initial_window: int, state_dir: str,
+                 params: dict, fetch=None) -> list:
+    """One live SymbolRunner per symbol, configured from best_params.json."""
+    os.makedirs(state_dir, exist_ok=True)
+    return [
+        SymbolRunner(BarFeed(sym, timeframe=timeframe, initial_window=initial_window,
+                             mode="live", state_file=os.path.join(state_dir, f"{sym}.json"),
+                             fetch=fetch),
+                     **strategy_kwargs(params, sym))
+        for sym in symbols
+    ]
+
+
+class LiveEngine:
+    """Bar-boundary scheduler over many SymbolRunners on one event loop."""
+
+    def __init__(self, runners, on_action=print_action, report_every: int = REPORT_EVERY):
+        self.runners = list(runners)
+        self.on_action = on_action
+        self.report_every = report_every
+        self.wakeups = 0
+
+    def due(self):
+        """(sleep seconds, runners due at that wake-up)."""
+        waits = [(r.feed.seconds_until_next_bar(), r) for r in self.runners]
+        earliest = min(w for w, _ in waits)
+        return max(earliest, MIN_IDLE), [r for w, r in waits if w <= earliest + SCHED_TOLERANCE]
+
+    def step(self, runners) -> int:
+        return sum(r.process(self.on_action) for r in runners)
+
+    async def astep(self, runners) -> int:
+        """step() with every due feed polled concurrently off the loop thread."""
+        return sum(await asyncio.gather(*(r.aprocess(self.on_action) for r in runners)))
+
+    def report(self):
+        for r in self.runners:
+            print(f"[📊] {r.report()}")
+
+    async def run(self, max_wakeups: int = None):
+        while max_wakeups is None or self.wakeups < max_wakeups:
+            delay, runners = self.due()
+            await asyncio.sleep(delay)
+            await self.astep(runners)
+            self.wakeups += 1
+            if self.report_every and self.wakeups % self.report_every == 0:
+                self.report()
+
+    def close(self):
+        for r in self.runners:
+            r.feed.close()
+
+
+def main(symbols, timeframe: int, initial_window: int, state_dir: str = STATE_DIR,
+         params_file: str = PARAMS_FILE, trade: bool = False):
+    import MetaTrader5 as mt5
+
+    params = load_params(params_file)
+    # One terminal connection shared by every feed in this process
+    if not mt5.initialize():
+        print(f"[❌] MT5 init failed: {mt5.last_error()}")
+        return
+    runners = make_runners(symbols, timeframe, initial_window, state_dir, params)
+    executor = OrderExecutor(mt5) if trade else None
+    on_action = order_actions(executor, params.get('lot_size', 1.0)) if trade else print_action
+    print(f"[✅] Live engine: {len(runners)} symbols on one connection "
+          f"({'trading' if trade else 'signals only, no orders sent'})")
+    engine = LiveEngine(runners, on_action=on_action)
+    try:
+        asyncio.run(engine.run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.report()
+        engine.close()
+        if executor is not None:
+            executor.close()
+            print(f"[ℹ️] {executor.report()}")
+        mt5.shutdown()
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Run the strategy live on many symbols in one process")
+    p.add_argument("--symbols", type=str, default="NAS100.a",
+                   help="Comma-separated MT5 symbols")
+    p.add_argument("--timeframe", type=int, default=5)
+    p.add_argument("--initial_window", type=int, default=1000,
+                   help="Warm-up bars per symbol on first run")
+    p.add_argument("--state_dir", type=str, default=STATE_DIR)
+    p.add_argument("--params", type=str, default=PARAMS_FILE,
+                   help="Strategy settings (pip_factors needs every symbol)")
+    p.add_argument("--trade", action="store_true",
+                   help="Send orders through OrderExecutor (default: signals only)")
+    args = p.parse_args()
+    main([s.strip() for s in args.symbols.split(",") if s.strip()],
+         args.timeframe, args.initial_window, args.state_dir, args.params, args.trade)
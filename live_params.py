@@ -0,0 +1,38 @@
+# File: live_params.py
+"""
+Optimized parameters (best_params.json) as used by the live MT5 scripts.
+
+batch_mt5 and mt5_place_order build the strategy from the same file;
+strategy_kwargs() is the single mapping from its keys to run_strategy /
+StreamingStrategy keyword arguments.
+"""
+
+import json
+
+PARAMS_FILE = 'best_params.json'
+
+
+def load_params(path: str = PARAMS_FILE) -> dict:
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def strategy_kwargs(params: dict, symbol: str = None) -> dict:
+    """Strategy settings from best_params.json (pip factor of `symbol`, default its own)."""
+    tp = params['take_profit_pips']
+    atr_stop_mult = params['atr_stop_multiplier']
+    return dict(
+        take_profit_pips=tp,
+        stop_loss_pips=int(tp * atr_stop_mult),
+        pip_factor=params['pip_factors'][symbol or params['symbol']],
+        use_atr_stop=True,
+        atr_stop_multiplier=atr_stop_mult,
+        atr_period=params.get('atr_period',10),
+        atr_multiplier=params.get('atr_multiplier',1.0),
+        sma50_distance_pips=params.get('sma50_distance_pips',30),
+        min_candle_size_pips=params.get('min_candle_size_pips',0.5),
+        min_leg_move=params.get('min_leg_move',0.3),
+        max_leg_gap=params.get('max_leg_gap',10),
+        initial_equity=params.get('initial_equity',1000.0),
+        lot_size=params.get('lot_size', 1.0)
+    )
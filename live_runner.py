@@ -1,29 +1,24 @@
-import os
-import json
 import argparse
 import pandas as pd
 from utils.data_utils import get_data
 from strategies.strategy_sma_stoch_rr_v2 import run_strategy
+from streaming_strategy import StreamingStrategy
+from state_store import StateStore
 
 STATE_FILE      = "bot_state.json"
 DEFAULT_BALANCE = 100_000.0
 
-def load_state():
-    if os.path.exists(STATE_FILE):
-        raw = json.load(open(STATE_FILE))
-        return {
-            "last_ts": raw.get("last_ts", None),
-            "balance": raw.get("balance", DEFAULT_BALANCE)
-        }
-    return {"last_ts": None, "balance": DEFAULT_BALANCE}
+def load_state() -> StateStore:
+    """Open the journaled state (snapshot + replayed journal) with defaults."""
+    return StateStore(STATE_FILE, defaults={
+        "last_ts": None, "balance": DEFAULT_BALANCE, "engine": None
+    })
 
-def save_state(state):
-    with open(STATE_FILE, "w") as f:
-        json.dump(state, f, indent=2)
-
-def main(symbol: str, timeframe: int, full_bars: int, initial_window: int):
+def main(symbol: str, timeframe: int, full_bars: int, initial_window: int,
+         streaming: bool = False):
     # 1) Load shared state
-    state = load_state()
+    store = load_state()
+    state = store.state
 
     # 2) Fetch full history once
     df_all = get_data(symbol=symbol, timeframe=timeframe, bars=full_bars)
@@ -36,23 +31,46 @@ def main(symbol: str, timeframe: int, full_bars: int, initial_window: int):
     else:
         start_idx = initial_window
 
+    # 4) --streaming: restore the incremental engine, or warm it up on the
+    #    bars before start_idx
+    engine = None
+    if streaming:
+        if state["engine"]:
+            engine = StreamingStrategy.from_snapshot(state["engine"])
+        else:
+            engine = StreamingStrategy(initial_equity=state["balance"])
+            for j in range(start_idx):
+                engine.warm_up(df_all.iloc[j])
+
     total = len(df_all)
 
-    # 4) Process each new bar exactly once
+    # 5) Process each new bar exactly once
     for i in range(start_idx, total):
-        window = df_all.iloc[: i+1]
-        ts     = window.index[-1]
+        if engine is None:
+            window = df_all.iloc[: i+1]
+            ts     = window.index[-1]
 
-        # ← pass in current balance, get updated balance back
-        new_balance = run_strategy(window, state["balance"])
+            # ← pass in current balance, get updated balance back
+            new_balance = run_strategy(window, state["balance"])
+            # a saved engine is stale once bars are processed without it
+            updates = {"engine": None}
+        else:
+            # O(1) per bar; the engine is snapshotted once per store flush
+            bar = df_all.iloc[i]
+            ts  = bar.name
+            for action in engine.on_bar(bar):
+                print(f"    {action['action'].upper()} {action['side']} @ "
+                      f"{action.get('exit_price', action['entry_price']):.2f}")
+            new_balance = engine.equity
+            updates = {"engine": engine.snapshot}
 
         # update state
-        state["last_ts"] = ts.isoformat()
-        state["balance"] = new_balance
-        save_state(state)
+        # journaled and batched
+        store.update(last_ts=ts.isoformat(), balance=new_balance, **updates)
 
         print(f"[{i+1}/{total}] {ts} → balance: {new_balance:.2f}")
 
+    store.close()
     print("All bars processed. Exiting.")
 
 if __name__ == "__main__":
@@ -65,6 +83,8 @@ if __name__ == "__main__":
                    help="Total bars to pull from MT5")
     p.add_argument("--initial_window", type=int, default=1000,
                    help="How many bars to skip on first run (warm-up)")
+    p.add_argument("--streaming",      action="store_true",
+                   help="Use the incremental StreamingStrategy instead of run_strategy")
     args = p.parse_args()
 
-    main(args.symbol, args.timeframe, args.full_bars, args.initial_window)
+    main(args.symbol, args.timeframe, args.full_bars, args.initial_window, args.streaming)
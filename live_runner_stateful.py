@@ -1,30 +1,25 @@
 # File: live_runner_stateful.py
 
-import os
-import json
 import argparse
 import pandas as pd
 from utils.data_utils import get_data
 from strategies.strategy_sma_stoch_rr_v2 import run_strategy
+from streaming_strategy import StreamingStrategy
+from state_store import StateStore
 
 STATE_FILE      = "bot_state.json"
 DEFAULT_BALANCE = 100_000.0
 
-def load_state():
-    if os.path.exists(STATE_FILE):
-        raw = json.load(open(STATE_FILE))
-        return {
-            "last_ts": raw.get("last_ts", None),
-            "balance": raw.get("balance", DEFAULT_BALANCE)
-        }
-    return {"last_ts": None, "balance": DEFAULT_BALANCE}
+def load_state() -> StateStore:
+    """Open the journaled state (snapshot + replayed journal) with defaults."""
+    return StateStore(STATE_FILE, defaults={
+        "last_ts": None, "balance": DEFAULT_BALANCE, "engine": None
+    })
 
-def save_state(state):
-    with open(STATE_FILE, "w") as f:
-        json.dump(state, f, indent=2)
-
-def main(symbol: str, timeframe: int, full_bars: int, initial_window: int):
-    state = load_state()
+def main(symbol: str, timeframe: int, full_bars: int, initial_window: int,
+         streaming: bool = False):
+    store = load_state()
+    state = store.state
 
     # 1) load all historical bars
     df_all = get_data(symbol=symbol, timeframe=timeframe, bars=full_bars)
@@ -37,23 +32,46 @@ def main(symbol: str, timeframe: int, full_bars: int, initial_window: int):
     else:
         start_idx = initial_window
 
+    # 3) --streaming: resume the incremental engine, or warm it up on the
+    #    skipped bars
+    engine = None
+    if streaming:
+        if state["engine"]:
+            engine = StreamingStrategy.from_snapshot(state["engine"])
+        else:
+            engine = StreamingStrategy(initial_equity=state["balance"])
+            for j in range(start_idx):
+                engine.warm_up(df_all.iloc[j])
+
     total = len(df_all)
 
-    # 3) process each unseen bar once
+    # 4) process each unseen bar once
     for i in range(start_idx, total):
-        window = df_all.iloc[: i+1]
-        ts     = window.index[-1]
+        if engine is None:
+            window = df_all.iloc[: i+1]
+            ts     = window.index[-1]
 
-        # ⬇️ **Pass both** the DataFrame AND the current balance
-        new_balance = run_strategy(window, state["balance"])
+            # ⬇️ **Pass both** the DataFrame AND the current balance
+            new_balance = run_strategy(window, state["balance"])
+            # a saved engine is stale once bars are processed without it
+            updates = {"engine": None}
+        else:
+            # O(1) per bar; the engine is snapshotted once per store flush
+            bar = df_all.iloc[i]
+            ts  = bar.name
+            for action in engine.on_bar(bar):
+                print(f"    {action['action'].upper()} {action['side']} @ "
+                      f"{action.get('exit_price', action['entry_price']):.2f}")
+            new_balance = engine.equity
+            updates = {"engine": engine.snapshot}
 
-        # 4) update & persist state
-        state["last_ts"] = ts.isoformat()
-        state["balance"] = new_balance
-        save_state(state)
+        # 5) update & persist state
+        # journaled and batched
+        store.update(last_ts=ts.isoformat(), balance=new_balance, **updates)
 
         print(f"[{i+1}/{total}] {ts} → balance: {new_balance:.2f}")
 
+    store.close()
     print("All bars processed. Exiting.")
 
 if __name__ == "__main__":
@@ -62,5 +80,7 @@ if __name__ == "__main__":
     p.add_argument("--timeframe",      type=int, default=5)
     p.add_argument("--full_bars",      type=int, default=5000)
     p.add_argument("--initial_window", type=int, default=1000)
+    p.add_argument("--streaming",      action="store_true",
+                   help="Use the incremental StreamingStrategy instead of run_strategy")
     args = p.parse_args()
-    main(args.symbol, args.timeframe, args.full_bars, args.initial_window)
+    main(args.symbol, args.timeframe, args.full_bars, args.initial_window, args.streaming)
@@ -0,0 +1,389 @@
+# File: metrics.py
+"""
+Vectorized performance metrics for trade PnL and equity curves.
+
+Every function takes a 1-D array (one curve -> Python scalars) or a 2-D
+array (one curve per row -> arrays). Ragged curves are stacked with
+as_matrix(), which pads short rows with NaN; padding is ignored by every
+metric, so thousands of sweep results can be scored in one call:
+
+    eq = as_matrix([r[2] for r in results])     # run_strategy equity curves
+    sh = equity_sharpe(eq)                       # shape (n_runs,)
+    dd = max_drawdown(eq, relative=True)
+
+    stats = trade_stats(pnl_array(trades))       # win_rate, profit_factor, ...
+
+Conventions (kept from the scripts that used to compute these inline):
+- equity_sharpe: per-bar simple returns, mean / std(ddof=1) * sqrt(n).
+- sharpe: 0.0 when there are not more than ddof samples or std is 0.
+- trade_stats: a trade with pnl <= 0 counts as a loss; profit_factor is
+  gross win / gross loss, inf when nothing was lost.
+- max_drawdown: in equity units, or as a fraction of the running peak.
+
+Parameter grids: gather each combo's trade PnLs with padded(), then
+grid_metrics() scores every combo (Sharpe, Sortino, drawdown, Calmar,
+profit factor, expectancy) at once and rank_grid() orders them:
+
+    pnl, lengths = padded(combo_pnls)
+    m = grid_metrics(pnl, initial_equity=1000.0)
+    best_first = rank_grid(m, by=("expectancy", "profit_factor"))
+
+CLI:
+    python metrics.py --curves 10000 --length 250          # loop vs 2-D benchmark
+    python metrics.py --grid --curves 2500 --length 200    # per-combo vs grid scoring
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+
+def padded(curves):
+    """(NaN-padded float64 2-D array, int lengths) for 1-D curves of any length."""
+    curves = [np.asarray(c, dtype=np.float64).ravel() for c in curves]
+    lengths = np.fromiter((len(c) for c in curves), dtype=np.int64, count=len(curves))
+    out = np.full((len(curves), lengths.max(initial=0)), np.nan)
+    for i, c in enumerate(curves):
+        out[i, :len(c)] = c
+    return out, lengths
+
+
+def as_matrix(curves) -> np.ndarray:
+    """Stack 1-D curves of any length into a NaN-padded float64 2-D array."""
+    return padded(curves)[0]
+
+
+def pnl_array(trades, key: str = "pnl") -> np.ndarray:
+    """PnL of a list of trade dicts (missing -> 0) as float64."""
+    return np.fromiter((t.get(key, 0) for t in trades), dtype=np.float64, count=len(trades))
+
+
+def _scalar(x, like: np.ndarray):
+    """Unwrap 0-d results for 1-D inputs."""
+    if like.ndim > 1:
+        return x
+    return x.item() if hasattr(x, "item") else x
+
+
+def _count(x: np.ndarray) -> np.ndarray:
+    return np.sum(~np.isnan(x), axis=-1)
+
+
+def _mean(x: np.ndarray, n: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.nansum(x, axis=-1) / n
+
+
+def _std(x: np.ndarray, n: np.ndarray, mean: np.ndarray, ddof: int) -> np.ndarray:
+    dev = x - np.expand_dims(mean, -1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.sqrt(np.nansum(dev * dev, axis=-1) / (n - ddof))
+
+
+def returns_from_equity(equity) -> np.ndarray:
+    """Simple per-step returns along the last axis (NaN where padded)."""
+    eq = np.asarray(equity, dtype=np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.diff(eq, axis=-1) / eq[..., :-1]
+
+
+def sharpe(returns, ddof: int = 1, periods: float = None, eps: float = 0.0):
+    """
+    mean / (std + eps) scaled by sqrt(periods), or by sqrt(sample count)
+    when periods is None. 0.0 where undefined.
+    """
+    r = np.asarray(returns, dtype=np.float64)
+    n = _count(r)
+    mean = _mean(r, n)
+    std = _std(r, n, mean, ddof) + eps
+    scale = np.sqrt(n) if periods is None else np.sqrt(periods)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = mean / std * scale
+    ok = (n > ddof) & (n > 0) & (std != 0) & np.isfinite(out)
+    return _scalar(np.where(ok, out, 0.0), r)
+
+
+def sortino(returns, periods: float = None):
+    """
+    mean / downside deviation (root mean square of the negative returns over
+    all samples), scaled like sharpe(). 0.0 where nothing was negative.
+    """
+    r = np.asarray(returns, dtype=np.float64)
+    n = _count(r)
+    mean = _mean(r, n)
+    down = np.minimum(r, 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        dd = np.sqrt(np.nansum(down * down, axis=-1) / n)
+    scale = np.sqrt(n) if periods is None else np.sqrt(periods)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = mean / dd * scale
+    ok = (n > 1) & (dd != 0) & np.isfinite(out)
+    return _scalar(np.where(ok, out, 0.0), r)
+
+
+def equity_sharpe(equity):
+    """Sharpe of an equity curve as the optimizers rank it (see module docstring)."""
+    eq = np.asarray(equity, dtype=np.float64)
+    if eq.shape[-1] < 2:
+        return _scalar(np.zeros(eq.shape[:-1]), eq)
+    return sharpe(returns_from_equity(eq))
+
+
+def max_drawdown(equity, relative: bool = False):
+    """Largest peak-to-trough fall (equity units, or fraction of the peak)."""
+    eq = np.asarray(equity, dtype=np.float64)
+    if eq.shape[-1] == 0:
+        return _scalar(np.zeros(eq.shape[:-1]), eq)
+    peak = np.fmax.accumulate(eq, axis=-1)
+    dd = peak - eq
+    if relative:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            dd = dd / peak
+    # fmax skips NaN padding; an all-NaN row stays NaN and becomes 0
+    return _scalar(np.nan_to_num(np.fmax.reduce(dd, axis=-1), nan=0.0), eq)
+
+
+def calmar(equity):
+    """Total return / max relative drawdown; 0.0 where there was no drawdown."""
+    s = summarize_equity(equity)
+    ret, dd = np.asarray(s["total_return"]), np.asarray(s["max_drawdown_pct"])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = np.where(dd > 0, ret / np.where(dd > 0, dd, 1), 0.0)
+    return _scalar(out, np.asarray(equity))
+
+
+def profit_factor(pnl):
+    """Gross win / gross loss; inf when nothing was lost."""
+    return trade_stats(pnl)["profit_factor"]
+
+
+def trade_stats(pnl) -> dict:
+    """
+    Per-trade statistics: trades, wins, losses, total, win_rate (fraction),
+    avg_return, avg_win, avg_loss, gross_win, gross_loss, profit_factor,
+    expectancy. Empty rows give zeros (profit_factor inf).
+    """
+    p = np.asarray(pnl, dtype=np.float64)
+    valid = ~np.isnan(p)
+    win = p > 0
+    loss = valid & ~win
+    n = valid.sum(axis=-1)
+    wins = win.sum(axis=-1)
+    losses = loss.sum(axis=-1)
+    gross_win = np.where(win, p, 0.0).sum(axis=-1)
+    gross_loss = np.where(loss, p, 0.0).sum(axis=-1)
+    total = gross_win + gross_loss
+
+    def ratio(a, b):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(b != 0, a / np.where(b != 0, b, 1), 0.0)
+
+    win_rate = ratio(wins, n)
+    avg_win = ratio(gross_win, wins)
+    avg_loss = ratio(gross_loss, losses)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        pf = np.where(gross_loss != 0, gross_win / -np.where(gross_loss != 0, gross_loss, 1), np.inf)
+    out = {
+        "trades": n,
+        "wins": wins,
+        "losses": losses,
+        "total": total,
+        "win_rate": win_rate,
+        "avg_return": ratio(total, n),
+        "avg_win": avg_win,
+        "avg_loss": avg_loss,
+        "gross_win": gross_win,
+        "gross_loss": gross_loss,
+        "profit_factor": pf,
+        "expectancy": win_rate * avg_win + (1 - win_rate) * avg_loss,
+    }
+    return {k: _scalar(v, p) for k, v in out.items()}
+
+
+def summarize_equity(equity) -> dict:
+    """Sharpe, drawdowns and return of one curve or a matrix of curves."""
+    eq = np.asarray(equity, dtype=np.float64)
+    if eq.ndim == 1:
+        eq = eq[None, :]
+        one = True
+    else:
+        one = False
+    n = _count(eq)
+    first = eq[:, 0] if eq.shape[1] else np.full(len(eq), np.nan)
+    last = eq[np.arange(len(eq)), np.maximum(n - 1, 0)] if eq.shape[1] else first
+    with np.errstate(invalid="ignore", divide="ignore"):
+        total_return = np.where(n > 0, last / first - 1, 0.0)
+    out = {
+        "sharpe": equity_sharpe(eq),
+        "max_drawdown": max_drawdown(eq),
+        "max_drawdown_pct": max_drawdown(eq, relative=True),
+        "total_return": total_return,
+        "final_equity": np.where(n > 0, last, np.nan),
+    }
+    if one:
+        return {k: v[0].item() for k, v in out.items()}
+    return out
+
+
+def backtest_summary(trades, equity_curve) -> dict:
+    """The trades/win_rate(%)/avg_return/sharpe row the optimizer CSVs store."""
+    stats = trade_stats(pnl_array(trades))
+    return {
+        "trades": stats["trades"],
+        "win_rate": round(stats["win_rate"] * 100, 2),
+        "avg_return": round(stats["avg_return"], 4),
+        "sharpe": round(equity_sharpe(equity_curve), 2),
+    }
+
+
+def backtest_rows(pnl, equity) -> list:
+    """backtest_summary() for every row of a PnL matrix and an equity matrix."""
+    stats = trade_stats(np.atleast_2d(pnl))
+    sh = equity_sharpe(np.atleast_2d(equity))
+    return [{"trades": int(n), "win_rate": round(float(w) * 100, 2),
+             "avg_return": round(float(a), 4), "sharpe": round(float(s), 2)}
+            for n, w, a, s in zip(stats["trades"], stats["win_rate"], stats["avg_return"], sh)]
+
+
+# -- parameter grids -------------------------------------------------------------
+
+def trade_equity(pnl, initial_equity: float = 1000.0) -> np.ndarray:
+    """Trade-by-trade equity: initial_equity followed by the running PnL (NaN-padded)."""
+    p = np.atleast_2d(np.asarray(pnl, dtype=np.float64))
+    start = np.full((p.shape[0], 1), float(initial_equity))
+    # NaN padding sits at the row ends, so cumsum keeps it NaN
+    return np.concatenate([start, initial_equity + np.cumsum(p, axis=-1)], axis=-1)
+
+
+def grid_metrics(pnl, equity=None, initial_equity: float = 1000.0) -> dict:
+    """
+    Every metric for a grid of runs in single vectorized calls. pnl is a
+    (combos, trades) NaN-padded matrix; equity defaults to trade_equity(pnl).
+    Returns {name: array of length combos}.
+    """
+    pnl = np.atleast_2d(np.asarray(pnl, dtype=np.float64))
+    equity = trade_equity(pnl, initial_equity) if equity is None else np.atleast_2d(equity)
+    stats = trade_stats(pnl)
+    curve = summarize_equity(equity)
+    returns = returns_from_equity(equity)
+    dd = curve["max_drawdown_pct"]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cal = np.where(dd > 0, curve["total_return"] / np.where(dd > 0, dd, 1), 0.0)
+    return {
+        "trades": stats["trades"],
+        "win_rate": stats["win_rate"],
+        "profit_factor": stats["profit_factor"],
+        "expectancy": stats["expectancy"],
+        "net_profit": stats["total"],
+        "sharpe": sharpe(returns),
+        "sortino": sortino(returns),
+        "max_drawdown": curve["max_drawdown"],
+        "max_drawdown_pct": dd,
+        "calmar": cal,
+        "total_return": curve["total_return"],
+    }
+
+
+def rank_grid(metrics: dict, by=("expectancy", "profit_factor"), ascending: bool = False) -> np.ndarray:
+    """Row order sorting by the `by` columns (first = primary key), via one lexsort."""
+    keys = [np.nan_to_num(np.asarray(metrics[k], dtype=np.float64), nan=-np.inf) for k in reversed(by)]
+    order = np.lexsort(keys)
+    return order if ascending else order[::-1]
+
+
+# -- benchmark -----------------------------------------------------------------
+
+def _loop_reference(curves):
+    """The per-curve code the scripts used to run, for the benchmark."""
+    out = []
+    for eq in curves:
+        r = np.diff(eq) / eq[:-1]
+        sh = r.mean() / r.std(ddof=1) * np.sqrt(len(r)) if len(r) > 1 and r.std(ddof=1) != 0 else 0.0
+        peak = np.maximum.accumulate(eq)
+        out.append((sh, (peak - eq).max()))
+    return out
+
+
+def benchmark(curves: int = 10_000, length: int = 250, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(length // 2, length + 1, curves)
+    data = [10_000 + np.cumsum(rng.normal(0, 10, n)) for n in lengths]
+
+    t0 = time.perf_counter()
+    ref = _loop_reference(data)
+    t_loop = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    eq = as_matrix(data)
+    sh, dd = equity_sharpe(eq), max_drawdown(eq)
+    t_vec = time.perf_counter() - t0
+
+    ref_sh, ref_dd = np.array(ref).T
+    assert np.allclose(sh, ref_sh) and np.allclose(dd, ref_dd)
+    print(f"[📊] {curves} curves x <= {length} bars: loop {t_loop * 1000:.1f}ms, "
+          f"2-D {t_vec * 1000:.1f}ms ({t_loop / t_vec:.1f}x)")
+    return t_loop, t_vec
+
+
+def _grid_loop_reference(pnls, initial_equity):
+    """Per-combo pandas .loc filters, as optimize_tp_sl used to score its grid."""
+    rows = []
+    for pnl in pnls:
+        profit = pd.Series(pnl)
+        wins, losses = profit[profit > 0], profit[profit <= 0]
+        win_rate = len(wins) / len(profit) if len(profit) else 0
+        avg_win = wins.mean() if len(wins) else 0
+        avg_loss = losses.mean() if len(losses) else 0
+        gross_losses = losses.sum()
+        equity = pd.concat([pd.Series([initial_equity]), initial_equity + profit.cumsum()],
+                           ignore_index=True)
+        r = equity.pct_change().dropna()
+        down = np.sqrt((r.clip(upper=0) ** 2).mean()) if len(r) else 0
+        peak = equity.cummax()
+        dd = ((peak - equity) / peak).max()
+        rows.append({
+            "profit_factor": wins.sum() / abs(gross_losses) if gross_losses != 0 else float("inf"),
+            "expectancy": win_rate * avg_win + (1 - win_rate) * avg_loss,
+            "sharpe": r.mean() / r.std() * np.sqrt(len(r)) if len(r) > 1 and r.std() != 0 else 0.0,
+            "sortino": r.mean() / down * np.sqrt(len(r)) if len(r) > 1 and down != 0 else 0.0,
+            "calmar": (equity.iloc[-1] / initial_equity - 1) / dd if dd > 0 else 0.0,
+        })
+    return pd.DataFrame(rows).sort_values(["expectancy", "profit_factor"], ascending=False)
+
+
+def benchmark_grid(combos: int = 2_500, trades: int = 200, seed: int = 0, initial_equity: float = 1000.0):
+    """Score a (combos x <= trades) grid per combo with pandas vs grid_metrics + rank_grid."""
+    rng = np.random.default_rng(seed)
+    pnls = [rng.normal(0.5, 10, n) for n in rng.integers(trades // 2, trades + 1, combos)]
+
+    t0 = time.perf_counter()
+    ref = _grid_loop_reference(pnls, initial_equity)
+    t_loop = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    pnl, _ = padded(pnls)
+    m = grid_metrics(pnl, initial_equity=initial_equity)
+    order = rank_grid(m)
+    t_vec = time.perf_counter() - t0
+
+    for k in ref.columns:
+        assert np.allclose(m[k][ref.index], ref[k]), k
+    assert np.allclose(m["expectancy"][order], ref["expectancy"].to_numpy())
+    print(f"[📊] {combos} combos x <= {trades} trades: per-combo {t_loop * 1000:.1f}ms, "
+          f"grid {t_vec * 1000:.1f}ms ({t_loop / t_vec:.1f}x)")
+    return t_loop, t_vec
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Benchmark per-curve vs 2-D metrics")
+    p.add_argument("--curves", type=int, help="curves (or grid combos); default 10000 / 2500")
+    p.add_argument("--length", type=int, help="bars per curve (or trades per combo); default 250 / 200")
+    p.add_argument("--grid", action="store_true", help="benchmark parameter-grid scoring instead")
+    args = p.parse_args()
+    sizes = {k: v for k, v in (("n", args.curves), ("length", args.length)) if v}
+    if args.grid:
+        benchmark_grid(sizes.get("n", 2_500), sizes.get("length", 200))
+    else:
+        benchmark(sizes.get("n", 10_000), sizes.get("length", 250))
@@ -1,16 +1,39 @@
 # File: monitor_drawdown.py
+"""
+Drawdown alerts for the results/{symbol}_equity_{cfg}.csv files.
 
+Each equity file is tailed: an EquityTail remembers its byte offset, the
+running peak and the worst drawdown so far, and each poll parses only the
+rows appended since the last one. Cost per poll depends on how much was
+written, not on how long the file is.
+
+Changes are picked up through watchdog (inotify on Linux): new and
+modified equity files are marked dirty and only those are read. Without
+watchdog installed every target is checked with one os.stat per poll.
+
+A file that shrinks, is replaced, or whose bytes before the saved offset
+change (e.g. rewritten by to_csv with different history) is re-read from
+the start.
+"""
+
+import io
 import os
-import time
-import argparse
+import threading
 import pandas as pd
+import numpy as np
 import ctypes
-import urllib.request
-import json
-import smtplib
 import datetime
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+
+from alert_dispatcher import (AlertDispatcher, CallableChannel, EmailChannel, SMTPPool,
+                              WebhookChannel)
+from alert_journal import get_journal
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:  # fall back to stat polling
+    Observer = None
+    FileSystemEventHandler = object
 
 # ------------ Configuration -------------
 # Hardcoded SMTP settings for email alerts
@@ -29,46 +52,43 @@ CONFIGS     = [1]
 THRESHOLD   = 5.0    # percent drawdown threshold
 INTERVAL    = 60     # seconds between polls
 RESULTS_DIR = "results"
-# History log file
+# Legacy history file, migrated into the alert journal (alert_journal.ALERT_DB)
 LOG_FILE    = os.path.join(RESULTS_DIR, "alert_history.json")
+# Bytes before the saved offset that must still match for a tail to resume
+TAIL_CHECK_BYTES = 64
 # ----------------------------------------
 
 
 def send_desktop_alert(title: str, message: str):
     """
-    Show a Windows desktop alert via MessageBox.
+    Show a Windows desktop alert via MessageBox. The box is modal, so it
+    gets its own thread; a popup nobody dismisses must not hold a dispatcher
+    worker (and with it Slack/email delivery).
     """
-    ctypes.windll.user32.MessageBoxW(0, message, title, 0x40)
+    threading.Thread(target=ctypes.windll.user32.MessageBoxW, args=(0, message, title, 0x40),
+                     name="desktop-alert", daemon=True).start()
 
 
-def send_slack_alert(webhook_url: str, message: str):
-    """
-    Post a message to a Slack Incoming Webhook.
-    """
-    payload = {'text': message}
-    data = json.dumps(payload).encode('utf-8')
-    req = urllib.request.Request(
-        webhook_url,
-        data=data,
-        headers={'Content-Type': 'application/json'}
-    )
-    urllib.request.urlopen(req)
+_dispatcher = None
 
 
-def send_email(smtp_server, port, username, password, to_addrs, subject, body):
+def get_dispatcher() -> AlertDispatcher:
     """
-    Send an email via SMTP using provided credentials.
+    Background delivery for desktop, Slack and email alerts (see
+    alert_dispatcher.py): pooled SMTP, coalescing, rate limits and retries.
     """
-    msg = MIMEMultipart()
-    msg['From'] = username
-    msg['To'] = ", ".join(to_addrs)
-    msg['Subject'] = subject
-    msg.attach(MIMEText(body, 'plain'))
-
-    with smtplib.SMTP(smtp_server, port) as server:
-        server.starttls()
-        server.login(username, password)
-        server.sendmail(username, to_addrs, msg.as_string())
+    global _dispatcher
+    if _dispatcher is None:
+        channels = {
+            "email": EmailChannel(SMTPPool(SMTP_SERVER, SMTP_PORT, SMTP_USER, SMTP_PASS),
+                                  SMTP_USER, TO_EMAILS),
+        }
+        if SLACK_WEBHOOK_URL:
+            channels["slack"] = WebhookChannel(SLACK_WEBHOOK_URL)
+        if hasattr(ctypes, "windll"):
+            channels["desktop"] = CallableChannel(send_desktop_alert)
+        _dispatcher = AlertDispatcher(channels)
+    return _dispatcher
 
 
 def compute_max_drawdown(equity: pd.DataFrame, bal_col: str) -> float:
@@ -81,80 +101,238 @@ def compute_max_drawdown(equity: pd.DataFrame, bal_col: str) -> float:
     return drawdowns.min()
 
 
+class EquityTail:
+    """Incremental max drawdown of one growing equity CSV."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.reset()
+
+    def reset(self):
+        self.offset = 0
+        self.inode = None
+        self.check = b""          # last TAIL_CHECK_BYTES before offset
+        self.bal_idx = None
+        self.rows = 0
+        self.peak = None
+        self.last = None
+        self.max_dd = 0.0         # most negative drawdown seen, in percent
+        self.resets = 0
+
+    def _unchanged(self, f, st) -> bool:
+        """True if the bytes read so far are still the file's prefix."""
+        if self.inode is not None and st.st_ino != self.inode:
+            return False
+        if st.st_size < self.offset:
+            return False
+        if self.check:
+            f.seek(self.offset - len(self.check))
+            if f.read(len(self.check)) != self.check:
+                return False
+        return True
+
+    def _header(self, line: bytes):
+        cols = [c.strip() for c in line.decode("utf-8-sig").split(",")]
+        self.bal_idx = next((i for i, c in enumerate(cols) if "balance" in c.lower()), 0)
+
+    def poll(self) -> int:
+        """Parse rows appended since the last poll; returns how many."""
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return 0
+        with f:
+            st = os.fstat(f.fileno())
+            if not self._unchanged(f, st):
+                self.reset()
+                self.resets += 1
+            self.inode = st.st_ino
+            if st.st_size == self.offset:
+                return 0
+            f.seek(self.offset)
+            chunk = f.read(st.st_size - self.offset)
+        # Leave a half-written last line for the next poll
+        end = chunk.rfind(b"\n") + 1
+        if end == 0:
+            return 0
+        body = chunk[:end]
+        if self.bal_idx is None:
+            nl = body.index(b"\n") + 1
+            self._header(body[:nl])
+            body = body[nl:]
+        n = self._consume(body)
+        self.check = (self.check + chunk[:end])[-TAIL_CHECK_BYTES:]
+        self.offset += end
+        return n
+
+    def _consume(self, body: bytes) -> int:
+        """Fold the balance column of complete CSV rows into peak/max_dd."""
+        if not body.strip():
+            return 0
+        col = pd.read_csv(io.BytesIO(body), header=None, usecols=[self.bal_idx],
+                          skip_blank_lines=True, on_bad_lines="skip").iloc[:, 0]
+        vals = pd.to_numeric(col, errors="coerce").dropna().to_numpy(dtype=float)
+        if not len(vals):
+            return len(col)
+        start = vals[0] if self.peak is None else self.peak
+        peaks = np.maximum.accumulate(np.concatenate(([start], vals)))[1:]
+        dd = (vals - peaks) / peaks * 100
+        self.max_dd = min(self.max_dd, float(dd.min()))
+        self.peak = float(peaks[-1])
+        self.last = float(vals[-1])
+        self.rows += len(vals)
+        return len(col)
+
+    @property
+    def drawdown(self) -> float:
+        """Current drawdown from the running peak, in percent (<= 0)."""
+        if self.peak is None:
+            return 0.0
+        return (self.last - self.peak) / self.peak * 100
+
+
+class _DirtyHandler(FileSystemEventHandler):
+    """watchdog handler: flags watched equity files that were created or written."""
+
+    def __init__(self, monitor):
+        super().__init__()
+        self.monitor = monitor
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        for path in (event.src_path, getattr(event, "dest_path", None)):
+            if path:
+                self.monitor.mark_dirty(path)
+
+
+class DrawdownMonitor:
+    """
+    Tails every {symbol}_equity_{cfg}.csv and reports threshold breaches as
+    on_alert(symbol, cfg, max_dd, threshold).
+    """
+
+    def __init__(self, symbols=SYMBOLS, configs=CONFIGS, threshold=THRESHOLD,
+                 results_dir=RESULTS_DIR, on_alert=None, use_watchdog=True):
+        self.threshold = threshold
+        self.results_dir = results_dir
+        self.on_alert = on_alert or raise_alert
+        self.targets = {
+            os.path.abspath(os.path.join(results_dir, f"{symbol}_equity_{cfg}.csv")): (symbol, cfg)
+            for symbol in symbols for cfg in configs
+        }
+        self.tails = {path: EquityTail(path) for path in self.targets}
+        self.sent = set()
+        self._dirty = set(self.targets)      # read everything once at start
+        self._sizes = {}
+        self._lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.observer = None
+        if use_watchdog and Observer is not None:
+            os.makedirs(results_dir, exist_ok=True)
+            self.observer = Observer()
+            self.observer.schedule(_DirtyHandler(self), results_dir, recursive=False)
+            self.observer.start()
+
+    def mark_dirty(self, path: str):
+        path = os.path.abspath(path)
+        if path in self.targets:
+            with self._lock:
+                self._dirty.add(path)
+            self.wakeup.set()
+
+    def _stat_changes(self):
+        """Fallback without watchdog: one stat per target."""
+        for path in self.targets:
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            sig = (st.st_ino, st.st_size, st.st_mtime_ns)
+            if self._sizes.get(path) != sig:
+                self._sizes[path] = sig
+                with self._lock:
+                    self._dirty.add(path)
+
+    def poll(self) -> list:
+        """Read appended rows of changed files; returns the alerts raised."""
+        if self.observer is None:
+            self._stat_changes()
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        raised = []
+        for path in dirty:
+            tail = self.tails[path]
+            tail.poll()
+            key = self.targets[path]
+            if tail.max_dd <= -self.threshold and key not in self.sent:
+                self.sent.add(key)
+                self.on_alert(*key, tail.max_dd, self.threshold)
+                raised.append((*key, tail.max_dd))
+        return raised
+
+    def run(self, interval=INTERVAL, max_polls=None):
+        polls = 0
+        while max_polls is None or polls < max_polls:
+            self.poll()
+            polls += 1
+            # watchdog events cut the wait short
+            self.wakeup.wait(interval)
+            self.wakeup.clear()
+
+    def close(self):
+        if self.observer is not None:
+            self.observer.stop()
+            self.observer.join()
+            self.observer = None
+
+
+def raise_alert(symbol, cfg, max_dd, threshold=THRESHOLD):
+    """
+    Queue desktop, Slack and email notifications (delivered in the
+    background, so a slow mail server never stalls polling) and record
+    the alert in the journal.
+    """
+    title = f"Drawdown Alert: {symbol} #{cfg}"
+    message = f"Max drawdown reached {max_dd:.2f}% (threshold {threshold}%)"
+    print(f"🚨 {title} - {message}")
+
+    dispatcher = get_dispatcher()
+    for channel in dispatcher.channels:
+        dispatcher.submit(channel, title, message, key=f"{symbol}|{cfg}")
+
+    # Log alert history
+    record = {
+        'timestamp': datetime.datetime.now().isoformat(),
+        'symbol': symbol,
+        'config': cfg,
+        'drawdown': max_dd
+    }
+    log_alert(record)
+
+
 def log_alert(record: dict):
     """
-    Append an alert record to the JSON log file.
+    Append an alert record to the alert journal (one indexed INSERT; see
+    alert_journal.py). LOG_FILE, the old JSON list, is imported on first use.
     """
-    os.makedirs(RESULTS_DIR, exist_ok=True)
-    # Load existing log
-    if os.path.isfile(LOG_FILE):
-        with open(LOG_FILE, 'r') as fp:
-            data = json.load(fp)
-    else:
-        data = []
-    # Append and save
-    data.append(record)
-    with open(LOG_FILE, 'w') as fp:
-        json.dump(data, fp, indent=2)
+    get_journal().append(record)
 
 
 def main():
     print(f"🔔 Monitoring drawdown <= -{THRESHOLD}% every {INTERVAL}s")
-    sent = set()
-
-    while True:
-        for symbol in SYMBOLS:
-            for cfg in CONFIGS:
-                path = os.path.join(RESULTS_DIR, f"{symbol}_equity_{cfg}.csv")
-                if not os.path.isfile(path):
-                    continue
-
-                equity = pd.read_csv(path)
-                bal_col = next((c for c in equity.columns if 'balance' in c.lower()), equity.columns[0])
-                max_dd = compute_max_drawdown(equity, bal_col)
-
-                key = (symbol, cfg)
-                if max_dd <= -THRESHOLD and key not in sent:
-                    title = f"Drawdown Alert: {symbol} #{cfg}"
-                    message = f"Max drawdown reached {max_dd:.2f}% (threshold {THRESHOLD}%)"
-                    print(f"🚨 {title} - {message}")
-
-                    # Desktop popup
-                    send_desktop_alert(title, message)
-
-                    # Slack alert
-                    if SLACK_WEBHOOK_URL:
-                        try:
-                            send_slack_alert(SLACK_WEBHOOK_URL, message)
-                        except Exception as e:
-                            print(f"⚠️ Slack alert failed: {e}")
-
-                    # Email alert
-                    try:
-                        send_email(
-                            smtp_server=SMTP_SERVER,
-                            port=SMTP_PORT,
-                            username=SMTP_USER,
-                            password=SMTP_PASS,
-                            to_addrs=TO_EMAILS,
-                            subject=title,
-                            body=message
-                        )
-                        print("✅ Email alert sent")
-                    except Exception as e:
-                        print(f"⚠️ Email alert failed: {e}")
-
-                    # Log alert history
-                    record = {
-                        'timestamp': datetime.datetime.now().isoformat(),
-                        'symbol': symbol,
-                        'config': cfg,
-                        'drawdown': max_dd
-                    }
-                    log_alert(record)
-
-                    sent.add(key)
-        time.sleep(INTERVAL)
+    monitor = DrawdownMonitor()
+    if monitor.observer is None:
+        print("[ℹ️] watchdog not installed; checking equity files with os.stat")
+    try:
+        monitor.run(INTERVAL)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        monitor.close()
+        if _dispatcher is not None:
+            _dispatcher.close()
+            print(f"[ℹ️] {_dispatcher.report()}")
 
 if __name__ == '__main__':
     main()
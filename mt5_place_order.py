@@ -1,5 +1,5 @@
 import sys
-import json
+import argparse
 import traceback
 from datetime import datetime
 
@@ -8,10 +8,13 @@ import pandas as pd
 
 from strategies.strategy_sma_stoch_rr_v2 import run_strategy
 from alerts import slack_alert, email_alert
+from candle_cache import CandleCache
+from live_params import load_params, strategy_kwargs
+from order_executor import OrderExecutor
+from streaming_strategy import StreamingStrategy
 
 # Load optimized parameters
-with open('best_params.json', 'r') as f:
-    params = json.load(f)
+params = load_params()
 
 SYMBOL        = params['symbol']
 TP            = params['take_profit_pips']
@@ -27,9 +30,12 @@ DAILY_MAX_LOSS = params.get('daily_max_loss', -100.0)
 # Live trade log filename
 LIVE_LOG_FILE = 'live_trade_log.csv'
 
+# Local bar cache: each run only fetches bars newer than the cached tail
+candles = CandleCache(mt5)
+
 
 def get_data(symbol, timeframe, bars):
-    rates = mt5.copy_rates_from_pos(symbol, timeframe, 0, bars)
+    rates = candles.copy_rates_from_pos(symbol, timeframe, 0, bars)
     if rates is None or len(rates) == 0:
         raise RuntimeError("No data returned from MT5")
     df = pd.DataFrame(rates)
@@ -38,7 +44,31 @@ def get_data(symbol, timeframe, bars):
     return df
 
 
-def main():
+def run_with_executor(df):
+    """
+    Generate signals with the streaming engine and hand entries on the
+    newest closed bar to the OrderExecutor; the bar loop never waits on MT5.
+    The last row of df is the bar still forming and is not traded on.
+    """
+    executor = OrderExecutor(mt5, on_result=lambda r: print(
+        f"[ORDER] {r['side']} {r['symbol']} {r['status']} @ {r.get('price')} "
+        f"after {r.get('attempts', 0)} attempt(s), {r.get('latency_ms', 0):.0f}ms"))
+    kw = strategy_kwargs(params)
+    engine = StreamingStrategy(initial_equity=kw.pop('initial_equity'), **kw)
+    closed = df.iloc[:-1]
+    last = len(closed) - 1
+    for i, row in enumerate(closed.itertuples()):
+        for action in engine.on_bar(row):
+            if i == last and action['action'] == 'open':
+                executor.submit({"symbol": SYMBOL, "side": action['side'], "volume": LOT_SIZE,
+                                 "sl": action['sl'], "tp": action['tp'],
+                                 "signal_time": action['entry_time']})
+    print(f"[SUMMARY] Wins: {engine.wins}  Losses: {engine.losses}  Equity: {engine.equity:.2f}")
+    executor.close()
+    print(f"[ℹ️] {executor.report()}")
+
+
+def main(use_executor=False):
     global daily_pnl
 
     # 1) Initialize MT5
@@ -53,24 +83,12 @@ def main():
         df = get_data(SYMBOL, mt5.TIMEFRAME_M5, BARS)
         print(f"[✅] Got {len(df)} rows")
 
+        if use_executor:
+            run_with_executor(df)
+            return
+
         # 3) Run strategy (with live orders inside)
-        results = run_strategy(
-            df,
-            take_profit_pips=TP,
-            stop_loss_pips=int(TP * ATR_STOP_MULT),
-            pip_factor=PIP_FACTORS[SYMBOL],
-            use_atr_stop=True,
-            atr_stop_multiplier=ATR_STOP_MULT,
-            atr_period=params.get('atr_period',10),
-            atr_multiplier=params.get('atr_multiplier',1.0),
-            sma50_distance_pips=params.get('sma50_distance_pips',30),
-            min_candle_size_pips=params.get('min_candle_size_pips',0.5),
-            min_leg_move=params.get('min_leg_move',0.3),
-            max_leg_gap=params.get('max_leg_gap',10),
-            initial_equity=params.get('initial_equity',1000.0),
-            symbol=SYMBOL,
-            lot_size=LOT_SIZE
-        )
+        results = run_strategy(df, symbol=SYMBOL, **strategy_kwargs(params))
 
         # 4) Circuit breaker: sum PnL of all closed trades
         trades = results['trade_log']
@@ -120,4 +138,8 @@ def main():
         print("[ℹ️] MT5 shutdown complete")
 
 if __name__ == '__main__':
-    main()
+    p = argparse.ArgumentParser(description="Run the strategy and place live MT5 orders")
+    p.add_argument("--executor", action="store_true",
+                   help="Queue orders through OrderExecutor (retries, latency metrics)")
+    args = p.parse_args()
+    main(use_executor=args.executor)
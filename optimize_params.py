@@ -1,13 +1,21 @@
 # optimize_params.py
 
+import io
 import os
+import json
+import time
+import argparse
 import pandas as pd
-import numpy as np
 from itertools import product
 from concurrent.futures import ProcessPoolExecutor, as_completed
 from tqdm import tqdm
-from strategies.strategy_sma_stoch_rr_v2 import run_strategy
+from vectorized_backtest import USE_VECTORIZED, select_run_strategy
 from utils.logger import log
+from indicator_cache import get_cache, merge_stats, format_stats
+from bar_store import STORE_ROOT, load_bars, open_mmap, write_mmap
+from metrics import as_matrix, backtest_rows, pnl_array
+
+run_strategy = select_run_strategy()
 
 # Define parameter grid
 param_grid = {
@@ -21,77 +29,242 @@ param_grid = {
 
 OUTPUT_CSV = os.path.join("results", "param_optimization.csv")
 MAX_WORKERS = os.cpu_count() or 4
+# Combos per submitted task; larger chunks amortise IPC over more work
+CHUNK_SIZE = int(os.getenv("OPT_CHUNK_SIZE", "16"))
+RESULT_COLUMNS = ['symbol', *param_grid.keys(), 'trades', 'win_rate', 'avg_return', 'sharpe']
+# USE_MMAP=true: workers memory-map the bars from .npy files instead of
+# each unpickling a private DataFrame
+USE_MMAP = os.getenv("USE_MMAP", "False").lower() == "true"
+MMAP_ROOT = os.path.join(STORE_ROOT, "_mmap")
 
 
-def score_params(args):
-    csv_path, combo, test_mode = args
-    symbol = os.path.splitext(os.path.basename(csv_path))[0]
-    df = pd.read_csv(csv_path)
-    if 'Time' in df.columns:
-        df['Time'] = pd.to_datetime(df['Time'], errors='coerce')
-        df = df.dropna(subset=['Time'])
-    else:
-        raise ValueError("No Time column in CSV for optimization")
+# Per-worker dataset, installed once by _init_worker instead of per task
+_worker_df = None
+_worker_symbol = None
+
+
+def load_dataset(csv_path):
+    """Read and date-parse one symbol's CSV (columnar-cached by bar_store)."""
+    return load_bars(csv_path)
+
+
+def _init_worker(data, symbol):
+    """
+    Pool initializer: the DataFrame is pickled once per worker, not per combo.
+    With USE_MMAP, `data` is a write_mmap() folder and the worker maps it.
+    """
+    global _worker_df, _worker_symbol
+    if isinstance(data, str):
+        data = open_mmap(data)
+        if not USE_VECTORIZED:
+            # run_strategy needs a frame; the vectorized kernel reads the maps directly
+            data = pd.DataFrame(data)
+    _worker_df = data
+    _worker_symbol = symbol
+
+
+def run_combo(combo, test_mode):
+    """(trade PnLs, equity curve) of one combo on the worker's dataset."""
+    df = _worker_df
     df_out, trades, equity_curve, _, _ = run_strategy(
-        df.copy(), test_mode=test_mode, **combo
+        df.copy() if isinstance(df, pd.DataFrame) else df, test_mode=test_mode, **combo
     )
-    total = len(trades)
-    wins = sum(1 for t in trades if t.get('pnl', 0) > 0)
-    win_rate = (wins / total * 100) if total > 0 else 0.0
-    avg_return = sum(t.get('pnl', 0) for t in trades) / total if total > 0 else 0.0
-    returns = np.diff(equity_curve) / equity_curve[:-1]
-    sharpe = (
-        returns.mean() / returns.std(ddof=1) * np.sqrt(len(returns))
-    ) if len(returns) > 1 and returns.std(ddof=1) != 0 else 0.0
-    result = {'symbol': symbol, **combo,
-              'trades': total,
-              'win_rate': round(win_rate,2),
-              'avg_return': round(avg_return,4),
-              'sharpe': round(sharpe,2)}
-    return result
-
-
-def optimize_single_symbol(csv_path, test_mode=False):
+    return pnl_array(trades), equity_curve
+
+
+def score_chunk(args):
+    """
+    Score a batch of combos in one task. Returns (results, errors, cache_stats)
+    where cache_stats is (pid, cumulative stats) for this worker.
+    """
+    combos, test_mode = args
+    done, pnls, curves, errors = [], [], [], []
+    for combo in combos:
+        try:
+            pnl, equity_curve = run_combo(combo, test_mode)
+        except Exception as e:
+            errors.append((combo, str(e)))
+            continue
+        done.append(combo)
+        pnls.append(pnl)
+        curves.append(equity_curve)
+    # Metrics for the whole chunk come from one pass over padded 2-D arrays
+    rows = backtest_rows(as_matrix(pnls), as_matrix(curves)) if done else []
+    results = [{'symbol': _worker_symbol, **combo, **row} for combo, row in zip(done, rows)]
+    return results, errors, (os.getpid(), get_cache().stats())
+
+
+def _combo_key(symbol, combo):
+    return (symbol, *(float(combo[k]) for k in param_grid))
+
+
+def _complete_length(path):
+    """Byte length of the file up to and including its last newline."""
+    with open(path, 'rb') as f:
+        pos = f.seek(0, os.SEEK_END)
+        while pos > 0:
+            step = min(1 << 16, pos)
+            pos -= step
+            f.seek(pos)
+            i = f.read(step).rfind(b'\n')
+            if i >= 0:
+                return pos + i + 1
+    return 0
+
+
+def run_fingerprint(paths, test_mode=False) -> dict:
+    """What the rows in the output CSV depend on; --resume requires a match."""
+    data = {}
+    for path in paths:
+        st = os.stat(path)
+        data[os.path.basename(path)] = [st.st_size, st.st_mtime]
+    return {"grid": param_grid, "test_mode": test_mode, "vectorized": USE_VECTORIZED, "data": data}
+
+
+def _meta_path(output_csv):
+    return output_csv + ".meta.json"
+
+
+def same_run(output_csv, fingerprint) -> bool:
+    """True if output_csv was produced for this fingerprint."""
+    try:
+        with open(_meta_path(output_csv)) as f:
+            return json.load(f) == json.loads(json.dumps(fingerprint))
+    except (OSError, ValueError):
+        return False
+
+
+def load_completed(path=OUTPUT_CSV):
+    """Keys of (symbol, combo) rows already present in the output file."""
+    if not os.path.isfile(path):
+        return set()
+    # A crash mid-append can leave an unterminated last line that still
+    # parses (e.g. a cut-off final field); only whole lines count
+    size = _complete_length(path)
+    if size == 0:
+        return set()
+    with open(path, 'rb') as f:
+        data = io.BytesIO(f.read(size))
+    done = pd.read_csv(data, on_bad_lines='skip').dropna(subset=['sharpe'])
+    return {_combo_key(row['symbol'], row) for _, row in done.iterrows()}
+
+
+def append_results(rows, path=OUTPUT_CSV):
+    """Append finished rows to the output CSV, writing the header on first use."""
+    if not rows:
+        return
+    if os.path.isfile(path):
+        # Cut off a half-written line left by a crash; load_completed ignored
+        # it, so that combo is being recomputed
+        size = _complete_length(path)
+        if size < os.path.getsize(path):
+            with open(path, 'rb+') as f:
+                f.truncate(size)
+    header = not os.path.isfile(path) or os.path.getsize(path) == 0
+    pd.DataFrame(rows, columns=RESULT_COLUMNS).to_csv(path, mode='a', header=header, index=False)
+
+
+def optimize_single_symbol(csv_path, test_mode=False, chunk_size=CHUNK_SIZE,
+                           output_csv=OUTPUT_CSV, completed=None):
+    """
+    Score every grid combo for one symbol, streaming rows to output_csv as
+    chunks finish. Combos whose keys are in `completed` are skipped.
+    Returns the number of rows written.
+    """
     symbol = os.path.splitext(os.path.basename(csv_path))[0]
     combos = [dict(zip(param_grid.keys(), vals)) for vals in product(*param_grid.values())]
-    args_list = [(csv_path, combo, test_mode) for combo in combos]
-    results = []
-    with ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = {executor.submit(score_params, args): args for args in args_list}
-        for future in tqdm(as_completed(futures), total=len(futures), desc=f"Optimizing {symbol}"):
-            combo = futures[future]
-            try:
-                res = future.result()
-                results.append(res)
-            except Exception as e:
-                log(f"Error on {symbol} {combo}: {e}", level='ERROR')
-    return pd.DataFrame(results)
-
-
-def main():
-    os.makedirs('results', exist_ok=True)
-    all_results = []
-    for fname in os.listdir('data'):
-        if not fname.lower().endswith('.csv'):
-            continue
-        path = os.path.join('data', fname)
+    completed = completed or set()
+    todo = [c for c in combos if _combo_key(symbol, c) not in completed]
+    if not todo:
+        print(f"{symbol}: all {len(combos)} combos already in {output_csv}, skipping.")
+        return 0
+    if len(todo) < len(combos):
+        print(f"{symbol}: resuming, {len(combos) - len(todo)} of {len(combos)} combos already done.")
+
+    # Load the dataset once; workers receive it through the pool initializer
+    t0 = time.perf_counter()
+    df = load_dataset(csv_path)
+    load_secs = time.perf_counter() - t0
+    # Loading per combo would repeat this exact call for each of them
+    print(f"{symbol}: dataset loaded once in {load_secs:.2f}s for {len(todo)} combos; "
+          f"per-combo loading would have cost ~{load_secs * len(todo):.1f}s "
+          f"(saved ~{load_secs * (len(todo) - 1):.1f}s)")
+    worker_data = df
+    if USE_MMAP:
+        worker_data = os.path.join(MMAP_ROOT, symbol)
+        write_mmap(worker_data, df)
+    chunks = [todo[i:i + chunk_size] for i in range(0, len(todo), chunk_size)]
+    written = 0
+    cache_stats = {}
+    with ProcessPoolExecutor(max_workers=MAX_WORKERS,
+                             initializer=_init_worker,
+                             initargs=(worker_data, symbol)) as executor:
+        futures = {executor.submit(score_chunk, (chunk, test_mode)): chunk for chunk in chunks}
+        with tqdm(total=len(todo), desc=f"Optimizing {symbol}") as bar:
+            for future in as_completed(futures):
+                chunk = futures[future]
+                try:
+                    rows, errors, (pid, stats) = future.result()
+                except Exception as e:
+                    log(f"Error on {symbol} chunk of {len(chunk)}: {e}", level='ERROR')
+                    bar.update(len(chunk))
+                    continue
+                for combo, err in errors:
+                    log(f"Error on {symbol} {combo}: {err}", level='ERROR')
+                append_results(rows, output_csv)
+                written += len(rows)
+                cache_stats[pid] = stats
+                bar.update(len(chunk))
+    print(f"{symbol}: {format_stats(merge_stats(cache_stats.values()))}")
+    return written
+
+
+def main(resume=False, chunk_size=CHUNK_SIZE, data_dir='data', output_csv=OUTPUT_CSV):
+    """
+    Optimize every CSV in data_dir into output_csv. A run starts from an
+    empty file unless `resume` is set; even then, rows are only reused if
+    the grid, test_mode, kernel and every input CSV's size/mtime match the
+    fingerprint saved next to the file (strategy code changes are not
+    detected, which is why resuming is opt-in).
+    """
+    os.makedirs(os.path.dirname(output_csv) or '.', exist_ok=True)
+    paths = sorted(os.path.join(data_dir, f) for f in os.listdir(data_dir)
+                   if f.lower().endswith('.csv'))
+    fingerprint = run_fingerprint(paths)
+    if resume and os.path.isfile(output_csv) and not same_run(output_csv, fingerprint):
+        print(f"[⚠️] {output_csv} was computed on other data or settings; starting fresh.")
+        resume = False
+    if not resume and os.path.isfile(output_csv):
+        os.remove(output_csv)
+    with open(_meta_path(output_csv), 'w') as f:
+        json.dump(fingerprint, f)
+    completed = load_completed(output_csv) if resume else set()
+    for path in paths:
         try:
-            df_res = optimize_single_symbol(path, test_mode=False)
-            all_results.append(df_res)
+            optimize_single_symbol(path, test_mode=False, chunk_size=chunk_size,
+                                   output_csv=output_csv, completed=completed)
         except Exception as e:
-            log(f"Error optimizing {fname}: {e}", level='ERROR')
-    if not all_results:
+            log(f"Error optimizing {os.path.basename(path)}: {e}", level='ERROR')
+    if not os.path.isfile(output_csv):
         print("No optimization results generated.")
         return
-    full_df = pd.concat(all_results, ignore_index=True)
+    full_df = pd.read_csv(output_csv, on_bad_lines='skip')
 
-    # Filter out combinations with zero trades
-    filtered_df = full_df[full_df['trades'] > 0]
-    if filtered_df.empty:
+    # Zero-trade combos stay in the file so a resumed run skips them
+    valid = int((full_df['trades'] > 0).sum())
+    if valid == 0:
         print("All parameter combos resulted in zero trades. Try loosening your filters or using test_mode.")
     else:
-        filtered_df.to_csv(OUTPUT_CSV, index=False)
-        print(f"Optimization complete: {len(filtered_df)} valid rows saved to {OUTPUT_CSV}")
+        print(f"Optimization complete: {valid} valid rows ({len(full_df)} total) in {output_csv}")
 
 if __name__ == '__main__':
-    main()
+    p = argparse.ArgumentParser(description="Grid-search strategy parameters for every CSV in data/")
+    mode = p.add_mutually_exclusive_group()
+    mode.add_argument("--resume", action="store_true",
+                      help=f"Keep rows in {OUTPUT_CSV} from an interrupted run on the same data")
+    mode.add_argument("--fresh", action="store_true",
+                      help=f"Discard {OUTPUT_CSV} and start over (the default)")
+    p.add_argument("--chunk_size", type=int, default=CHUNK_SIZE,
+                   help="Parameter combos per worker task")
+    args = p.parse_args()
+    main(resume=args.resume, chunk_size=args.chunk_size)
@@ -11,6 +11,8 @@ import MetaTrader5 as mt5
 import pandas as pd
 
 from strategies.strategy_sma_stoch_rr_v2 import run_strategy
+from candle_cache import CandleCache
+from metrics import grid_metrics, padded, rank_grid
 
 # Instrument-specific pip factors for index symbols only
 PIP_FACTORS = {
@@ -22,10 +24,15 @@ PIP_FACTORS = {
 SYMBOLS = ["NAS100.a"]
 TIMEFRAME = mt5.TIMEFRAME_M5
 BARS = 10000
+# Local bar cache: repeat runs only fetch bars newer than the cached tail
+candles = CandleCache(mt5)
 
 # Sweep ranges (pips)
 TP_SPACE = range(20, 61, 10)  # 20, 30, 40, 50, 60
 SL_SPACE = range(10, 31, 5)   # 10, 15, 20, 25, 30
+INITIAL_EQUITY = 1000.0
+# Summary rows are written best first by these columns
+RANK_BY = ("expectancy", "profit_factor")
 
 # Directory for sweep results
 RESULTS_DIR = os.path.join("optimize_results", "trade_logs")
@@ -43,13 +50,26 @@ def initialize_mt5():
     print("[✅] MT5 initialized")
 
 
+def score_grid(symbol, combos, pnls):
+    """
+    Score every (tp, sl) combo at once: trade PnLs are padded into one 2-D
+    array, so each metric is a single vectorized call and the ranking one argsort.
+    """
+    pnl, _ = padded(pnls)
+    m = grid_metrics(pnl, initial_equity=INITIAL_EQUITY)
+    order = rank_grid(m, by=RANK_BY)
+    tps, sls = (list(col) for col in zip(*combos))
+    table = pd.DataFrame({"symbol": symbol, "tp": tps, "sl": sls, **m})
+    return table.iloc[order].reset_index(drop=True)
+
+
 def main():
     initialize_mt5()
     summary = []
 
     for symbol in SYMBOLS:
         # Load data once per symbol
-        rates = mt5.copy_rates_from_pos(symbol, TIMEFRAME, 0, BARS)
+        rates = candles.copy_rates_from_pos(symbol, TIMEFRAME, 0, BARS)
         if rates is None or len(rates) == 0:
             print(f"[⚠️] No data for {symbol}, skipping.")
             continue
@@ -65,6 +85,7 @@ def main():
         }, inplace=True)
 
         pip_factor = PIP_FACTORS.get(symbol, 0.1)
+        combos, pnls = [], []
 
         for tp, sl in itertools.product(TP_SPACE, SL_SPACE):
             try:
@@ -82,39 +103,20 @@ def main():
                     min_candle_size_pips=0.5,
                     min_leg_move=0.3,
                     max_leg_gap=10,
-                    initial_equity=1000.0
+                    initial_equity=INITIAL_EQUITY
                 )
-
-                trades = res["trade_log"]
-                wins = res["wins"]
-                losses = res["losses"]
-                total = wins + losses
-                win_rate = wins / total if total else 0
-
-                avg_win = trades.loc[trades["profit"] > 0, "profit"].mean() if wins else 0
-                avg_loss = trades.loc[trades["profit"] <= 0, "profit"].mean() if losses else 0
-
-                gross_wins = trades.loc[trades["profit"] > 0, "profit"].sum()
-                gross_losses = trades.loc[trades["profit"] <= 0, "profit"].sum()
-                profit_factor = gross_wins / abs(gross_losses) if gross_losses != 0 else float("inf")
-
-                expectancy = win_rate * avg_win + (1 - win_rate) * avg_loss
-
-                summary.append({
-                    "symbol": symbol,
-                    "tp": tp,
-                    "sl": sl,
-                    "win_rate": win_rate,
-                    "profit_factor": profit_factor,
-                    "expectancy": expectancy
-                })
+                combos.append((tp, sl))
+                pnls.append(res["trade_log"]["profit"].to_numpy(dtype=float))
 
             except Exception:
                 tb = traceback.format_exc()
                 print(f"[⚠️] Error on {symbol} TP={tp}, SL={sl}:\n{tb}")
 
+        if combos:
+            summary.append(score_grid(symbol, combos, pnls))
+
     # Save summary to optimize_results/trade_logs folder
-    summary_df = pd.DataFrame(summary)
+    summary_df = pd.concat(summary, ignore_index=True) if summary else pd.DataFrame()
     outfile = os.path.join(RESULTS_DIR, "tp_sl_sweep_summary.csv")
     summary_df.to_csv(outfile, index=False)
     print(f"✅ Sweep complete. Results saved to {outfile}")
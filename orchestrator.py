@@ -3,9 +3,8 @@
 import argparse
 import json
 import os
-import smtplib
-from email.message import EmailMessage
 
+from alert_dispatcher import AlertDispatcher, EmailChannel, SMTPPool
 from optimize.optimize_batch_fixed import run_optimizer
 from dashboard_generator import build_dashboard
 
@@ -55,29 +54,25 @@ def send_email(
     attachments
 ):
     """
-    Send an email with the given attachments.
+    Send an email with the given attachments (retried with backoff through
+    the alert dispatcher; waits for delivery before returning). Raises
+    RuntimeError if the report could not be delivered.
     """
-    msg = EmailMessage()
-    msg["From"]    = username
-    msg["To"]      = ", ".join(to_addrs)
-    msg["Subject"] = subject
-    msg.set_content(body)
-
-    for path in attachments:
-        with open(path, 'rb') as f:
-            data = f.read()
-        msg.add_attachment(
-            data,
-            maintype="application",
-            subtype="octet-stream",
-            filename=os.path.basename(path)
-        )
-
-    with smtplib.SMTP(smtp_server, port) as smtp:
-        smtp.starttls()
-        smtp.login(username, password)
-        smtp.send_message(msg)
-
+    pool = SMTPPool(smtp_server, port, username, password)
+    channel = EmailChannel(pool, username, to_addrs)
+    dispatcher = AlertDispatcher({"email": channel}, workers=1, coalesce_secs=0, per_minute=0)
+    # Every attempt may time out on the send and on the one reconnect the
+    # pool makes, and the backoff sleeps come on top of that.
+    attempts = dispatcher.max_retries + 1
+    budget = attempts * 2 * pool.timeout + sum(dispatcher.backoff * 2 ** i for i in range(attempts - 1))
+    dispatcher.submit("email", subject, body, attachments=attachments)
+    done = dispatcher.flush(budget)
+    dispatcher.close(timeout=1)
+
+    if not done:
+        raise RuntimeError(f"Report email not confirmed after {budget:.0f}s")
+    if dispatcher.stats["failed"] or dispatcher.errors or not dispatcher.stats["sent"]:
+        raise RuntimeError(f"Report email failed: {dispatcher.errors}")
     print(f"📧 Report emailed to {', '.join(to_addrs)}")
 
 
@@ -0,0 +1,313 @@
+# File: order_executor.py
+"""
+Non-blocking order execution for MT5.
+
+Strategy code hands order intents to OrderExecutor.submit(), which only
+enqueues them (bounded queue, never waits on the broker). A worker thread
+turns each intent into an mt5.order_send request, retries transient
+retcodes (requote, price changed, timeout, ...) with exponential backoff
+and records queue and send->fill latency histograms.
+
+    executor = OrderExecutor(mt5)
+    executor.submit({"symbol": "NAS100.a", "side": "long", "volume": 1.0,
+                     "sl": 15010.0, "tp": 15050.0, "signal_time": bar_ts})
+    ...
+    executor.close()
+    print(executor.report())
+
+Client order IDs are derived from (symbol, side, signal_time) and go in
+the order comment, so a signal submitted twice - by this executor, by a
+restarted process or after a lost reply - is sent once:
+  - the first order for a symbol reads the recent deal history once
+    (HISTORY_DAYS) and remembers every client ID in it;
+  - before each send the ID is checked against that set and the open
+    positions (one positions_get);
+  - a retry after an ambiguous outcome (no reply, timeout, connection
+    error) re-reads the deal history, as the order may have filled and
+    already been closed.
+
+An intent with "close_id" closes the open position whose comment is that
+client ID (the opening order's) instead of opening a new one; if the
+position is already gone (SL/TP hit at the broker) nothing is sent and the
+result status is "flat".
+
+`mt5` may be the MetaTrader5 module or any object with the same order API
+(symbol_info_tick, order_send, positions_get and the TRADE_* constants;
+history_deals_get is used when present).
+"""
+
+import hashlib
+import os
+import queue
+import threading
+import time
+from bisect import bisect_left
+
+MAX_QUEUE   = int(os.getenv("ORDER_QUEUE_SIZE", "100"))
+MAX_RETRIES = int(os.getenv("ORDER_MAX_RETRIES", "3"))
+BACKOFF_SECS = float(os.getenv("ORDER_BACKOFF_SECS", "0.2"))
+HISTORY_DAYS = float(os.getenv("ORDER_HISTORY_DAYS", "7"))   # deal history searched for a client ID
+DEVIATION   = 10
+MAGIC       = 234000
+
+# Outcomes after which the order may still have filled
+AMBIGUOUS_RETCODES = {"TRADE_RETCODE_TIMEOUT": 10012, "TRADE_RETCODE_CONNECTION": 10031}
+
+# Retcodes worth retrying with a fresh price (MT5 numeric values as fallback)
+TRANSIENT_RETCODES = {
+    "TRADE_RETCODE_REQUOTE": 10004,
+    "TRADE_RETCODE_TIMEOUT": 10012,
+    "TRADE_RETCODE_PRICE_CHANGED": 10020,
+    "TRADE_RETCODE_PRICE_OFF": 10021,
+    "TRADE_RETCODE_TOO_MANY_REQUESTS": 10024,
+    "TRADE_RETCODE_CONNECTION": 10031,
+}
+
+
+def client_order_id(symbol: str, side: str, signal_time) -> str:
+    """Deterministic ID that fits MT5's 31-char comment field."""
+    raw = f"{symbol}|{side}|{signal_time}".encode()
+    return "cid-" + hashlib.blake2b(raw, digest_size=12).hexdigest()[:24]
+
+
+def action_intent(symbol: str, action: dict, volume: float = 1.0) -> dict:
+    """Intent for a StreamingStrategy open/close action."""
+    if action["action"] == "open":
+        return {"symbol": symbol, "side": action["side"], "volume": volume,
+                "sl": action["sl"], "tp": action["tp"], "signal_time": action["entry_time"]}
+    # Backstop for a stop the engine saw but the broker has not (yet) filled
+    opened = client_order_id(symbol, action["side"], action["entry_time"])
+    return {"symbol": symbol, "side": "short" if action["side"] == "long" else "long",
+            "volume": volume, "close_id": opened, "signal_time": f"close|{action['entry_time']}"}
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram (milliseconds) with percentile estimates."""
+
+    BOUNDS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float("inf"))
+
+    def __init__(self):
+        self.counts = [0] * len(self.BOUNDS)
+        self.n = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms: float):
+        self.counts[bisect_left(self.BOUNDS, ms)] += 1
+        self.n += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def percentile(self, q: float) -> float:
+        """Upper bucket bound containing the q-th percentile."""
+        if not self.n:
+            return 0.0
+        target = q / 100 * self.n
+        seen = 0
+        for bound, count in zip(self.BOUNDS, self.counts):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            "n": self.n,
+            "mean": self.total / self.n if self.n else 0.0,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "max": self.max,
+        }
+
+    def format(self) -> str:
+        rows = []
+        lo = 0
+        for bound, count in zip(self.BOUNDS, self.counts):
+            if count:
+                rows.append(f"  {lo:>5}-{bound:<5} ms: {count}")
+            lo = bound
+        return "\n".join(rows)
+
+
+class OrderExecutor:
+    """Bounded queue + worker thread in front of mt5.order_send."""
+
+    def __init__(self, mt5, max_queue: int = MAX_QUEUE, max_retries: int = MAX_RETRIES,
+                 backoff: float = BACKOFF_SECS, on_result=None, sleep=time.sleep):
+        self.mt5 = mt5
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.on_result = on_result
+        self._sleep = sleep
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self.results = {}        # client_id -> result dict
+        self._seen = set()
+        self.dropped = 0
+        self.queue_latency = LatencyHistogram()
+        self.fill_latency = LatencyHistogram()
+        self.transient = {getattr(mt5, name, code) for name, code in TRANSIENT_RETCODES.items()}
+        self.ambiguous = {getattr(mt5, name, code) for name, code in AMBIGUOUS_RETCODES.items()}
+        # Worker-thread only: client_id -> (ticket, price) of known fills
+        self._filled = {}
+        self._seeded = set()
+        self._worker = threading.Thread(target=self._run, name="order-executor", daemon=True)
+        self._worker.start()
+
+    # -- producer side ------------------------------------------------------------
+
+    def submit(self, intent: dict) -> str:
+        """
+        Enqueue an order without blocking. Returns its client ID, or None if
+        the queue is full (the intent is dropped and counted).
+        """
+        cid = intent.get("client_id") or client_order_id(
+            intent["symbol"], intent["side"], intent.get("signal_time"))
+        with self._lock:
+            if cid in self._seen:
+                return cid
+            self._seen.add(cid)
+        try:
+            self._queue.put_nowait((cid, dict(intent), time.perf_counter()))
+        except queue.Full:
+            with self._lock:
+                self._seen.discard(cid)
+            self.dropped += 1
+            print(f"[⚠️] Order queue full, dropped {intent['side']} {intent['symbol']}")
+            return None
+        return cid
+
+    def close(self, timeout: float = None):
+        """Wait for queued orders to finish, then stop the worker."""
+        self._queue.put((None, None, None))
+        self._worker.join(timeout)
+
+    # -- worker side ----------------------------------------------------------------
+
+    def _request(self, cid, intent):
+        mt5 = self.mt5
+        buy = intent["side"] in ("long", "buy")
+        tick = mt5.symbol_info_tick(intent["symbol"])
+        if tick is None:
+            return None
+        request = {
+            "action": mt5.TRADE_ACTION_DEAL,
+            "symbol": intent["symbol"],
+            "volume": float(intent.get("volume", 1.0)),
+            "type": mt5.ORDER_TYPE_BUY if buy else mt5.ORDER_TYPE_SELL,
+            "price": tick.ask if buy else tick.bid,
+            "deviation": intent.get("deviation", DEVIATION),
+            "magic": intent.get("magic", MAGIC),
+            "comment": cid,
+            "type_time": mt5.ORDER_TIME_GTC,
+            "type_filling": mt5.ORDER_FILLING_RETURN,
+        }
+        for key in ("sl", "tp"):
+            if intent.get(key) is not None:
+                request[key] = float(intent[key])
+        if intent.get("position"):
+            request["position"] = int(intent["position"])
+        return request
+
+    def _open_position(self, cid, symbol):
+        positions = self.mt5.positions_get(symbol=symbol) or ()
+        return next((p for p in positions if getattr(p, "comment", "") == cid), None)
+
+    def _recent_deals(self, symbol):
+        history = getattr(self.mt5, "history_deals_get", None)
+        if history is None:
+            return ()
+        tick = self.mt5.symbol_info_tick(symbol)
+        now = int(getattr(tick, "time", 0) or time.time())   # broker clock
+        return history(now - int(HISTORY_DAYS * 86400), now + 86400, group=symbol) or ()
+
+    def _seed(self, symbol):
+        """Remember the client IDs in symbol's deal history (once per symbol)."""
+        if symbol in self._seeded:
+            return
+        self._seeded.add(symbol)
+        for deal in self._recent_deals(symbol):
+            comment = getattr(deal, "comment", "")
+            if comment.startswith("cid-"):
+                self._filled.setdefault(comment, (deal.order, deal.price))
+
+    def _existing_fill(self, cid, symbol, reread_history=False):
+        """(ticket, price) of an earlier fill carrying this client ID, or None."""
+        pos = self._open_position(cid, symbol)
+        if pos is not None:
+            return pos.ticket, pos.price_open
+        if reread_history:
+            # The position may already be closed (SL/TP, manual): its deals remain
+            deal = next((d for d in self._recent_deals(symbol)
+                         if getattr(d, "comment", "") == cid), None)
+            if deal is not None:
+                return deal.order, deal.price
+        return self._filled.get(cid)
+
+    def _execute(self, cid, intent):
+        mt5 = self.mt5
+        result = {"client_id": cid, "symbol": intent["symbol"], "side": intent["side"],
+                  "status": "failed", "retcode": None, "ticket": None, "price": None,
+                  "attempts": 0}
+        t_send = time.perf_counter()
+        self._seed(intent["symbol"])
+        if intent.get("close_id"):
+            pos = self._open_position(intent["close_id"], intent["symbol"])
+            if pos is None:
+                result.update(status="flat", latency_ms=0.0)
+                return result
+            intent = {**intent, "position": pos.ticket, "volume": pos.volume}
+        ambiguous = False
+        for attempt in range(self.max_retries + 1):
+            # Sent before by another run, or the last attempt may have filled
+            fill = self._existing_fill(cid, intent["symbol"], reread_history=ambiguous)
+            if fill is not None:
+                result.update(status="filled", ticket=fill[0], price=fill[1])
+                self._filled[cid] = fill
+                break
+            if attempt:
+                self._sleep(self.backoff * 2 ** (attempt - 1))
+            result["attempts"] = attempt + 1
+            request = self._request(cid, intent)
+            reply = mt5.order_send(request) if request is not None else None
+            if reply is None:
+                result["retcode"] = None
+                ambiguous = request is not None
+                continue
+            result["retcode"] = reply.retcode
+            ambiguous = reply.retcode in self.ambiguous
+            if reply.retcode == mt5.TRADE_RETCODE_DONE:
+                result.update(status="filled", ticket=reply.order, price=reply.price)
+                self._filled[cid] = (reply.order, reply.price)
+                break
+            if reply.retcode not in self.transient:
+                result["status"] = "rejected"
+                break
+        result["latency_ms"] = (time.perf_counter() - t_send) * 1000
+        if result["status"] == "filled" and result["attempts"]:
+            self.fill_latency.add(result["latency_ms"])
+        return result
+
+    def _run(self):
+        while True:
+            cid, intent, t_queued = self._queue.get()
+            if cid is None:
+                break
+            self.queue_latency.add((time.perf_counter() - t_queued) * 1000)
+            try:
+                result = self._execute(cid, intent)
+            except Exception as e:
+                result = {"client_id": cid, "symbol": intent["symbol"], "side": intent["side"],
+                          "status": "error", "error": str(e)}
+            self.results[cid] = result
+            if result["status"] not in ("filled", "flat"):
+                print(f"[❌] Order {cid} {result['status']}: retcode={result.get('retcode')}")
+            if self.on_result:
+                self.on_result(result)
+
+    def report(self) -> str:
+        filled = sum(1 for r in self.results.values() if r["status"] == "filled")
+        f, q = self.fill_latency.summary(), self.queue_latency.summary()
+        return (f"Orders: {filled}/{len(self.results)} filled, {self.dropped} dropped | "
+                f"send->fill p50 {f['p50']:.0f}ms p95 {f['p95']:.0f}ms max {f['max']:.0f}ms | "
+                f"queue p95 {q['p95']:.0f}ms\n{self.fill_latency.format()}")
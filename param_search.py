@@ -1,6 +1,7 @@
 import pandas as pd
 import os
 from strategies.strategy_trend_legs import run_strategy
+from bar_store import load_bars
 
 def param_search(file_path, output_csv="results/param_search_results.csv"):
     min_leg_moves = [0.05, 0.1, 0.15, 0.2]
@@ -9,9 +10,7 @@ def param_search(file_path, output_csv="results/param_search_results.csv"):
 
     results = []
 
-    df = pd.read_csv(file_path)
-    df["Time"] = pd.to_datetime(df["Time"])
-    df = df.set_index("Time")
+    df = load_bars(file_path).set_index("Time")
     df = df[["Open", "High", "Low", "Close", "Volume"]].dropna()
 
     for min_leg_move in min_leg_moves:
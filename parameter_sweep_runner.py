@@ -4,6 +4,7 @@ import pandas as pd
 from typing import List, Dict
 from utils.data_utils import get_data
 from strategies.strategy_sma_stoch_rr_v2 import run_strategy
+from metrics import max_drawdown, sharpe, trade_stats
 
 
 def calculate_metrics(trades_df: pd.DataFrame) -> Dict[str, float]:
@@ -13,25 +14,15 @@ def calculate_metrics(trades_df: pd.DataFrame) -> Dict[str, float]:
     """
     if 'P/L' in trades_df.columns:
         trades_df = trades_df.rename(columns={'P/L': 'pnl'})
-    pnl = trades_df['pnl']
-    profit = pnl.sum()
-    total = len(pnl)
-    wins = pnl[pnl > 0]
-    losses = pnl[pnl <= 0]
-    win_rate = len(wins) / total if total else 0.0
-    avg_win = wins.mean() if not wins.empty else 0.0
-    avg_loss = losses.mean() if not losses.empty else 0.0
-    cum = pnl.cumsum()
-    max_drawdown = (cum.cummax() - cum).max() if not cum.empty else 0.0
-    std = pnl.std(ddof=0)
-    sharpe = (pnl.mean() / std * (total ** 0.5)) if std and total else 0.0
+    pnl = trades_df['pnl'].to_numpy(dtype=float)
+    stats = trade_stats(pnl)
     return {
-        'profit': profit,
-        'win_rate': win_rate,
-        'avg_win': avg_win,
-        'avg_loss': avg_loss,
-        'max_drawdown': max_drawdown,
-        'sharpe': sharpe
+        'profit': stats['total'],
+        'win_rate': stats['win_rate'],
+        'avg_win': stats['avg_win'],
+        'avg_loss': stats['avg_loss'],
+        'max_drawdown': max_drawdown(pnl.cumsum()),
+        'sharpe': sharpe(pnl, ddof=0)
     }
 
 
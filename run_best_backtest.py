@@ -3,15 +3,14 @@ import pandas as pd
 from strategies.strategy_trend_legs import run_strategy
 from utils.plotting_utils import plot_strategy_chart
 from utils.equity_utils import plot_equity_curve
+from bar_store import load_bars
 
 def main():
     symbol = "NAS100"
     file_path = os.path.join("data", f"{symbol}_5m.csv")
 
     print(f"[INFO] Loading data from {file_path}...")
-    df = pd.read_csv(file_path)
-    df["Time"] = pd.to_datetime(df["Time"])
-    df = df.set_index("Time")
+    df = load_bars(file_path).set_index("Time")
 
     df = df.dropna(subset=["Close", "Open", "High", "Low", "Volume"])
 
@@ -0,0 +1,76 @@
+# File: session_pnl.py
+"""
+Running realised-PnL accumulator that resets at trading-session boundaries.
+
+    pnl = SessionPnL(reset_hour=22)            # sessions roll at 22:00 server time
+    pnl.add(trade["exit_time"], trade["pnl"])  # O(1) per closed trade
+    if pnl.today <= DAILY_MAX_LOSS: ...
+
+State round-trips through to_dict()/from_dict() so scheduled runs can keep
+the day's total without re-reading the trade log.
+"""
+
+import pandas as pd
+
+
+def session_of(ts, reset_hour: int = 0) -> str:
+    """Session date (ISO) of a timestamp; sessions start at reset_hour."""
+    return (pd.Timestamp(ts) - pd.Timedelta(hours=reset_hour)).date().isoformat()
+
+
+class SessionPnL:
+    """Realised PnL for the current session plus lifetime win/loss sums."""
+
+    def __init__(self, reset_hour: int = 0):
+        self.reset_hour = reset_hour
+        self.session = None
+        self.today = 0.0
+        self.wins = 0
+        self.losses = 0
+        self.gross_win = 0.0
+        self.gross_loss = 0.0
+
+    def roll(self, ts) -> bool:
+        """Move to ts's session, zeroing today's PnL if it changed."""
+        session = session_of(ts, self.reset_hour)
+        if session == self.session:
+            return False
+        self.session = session
+        self.today = 0.0
+        return True
+
+    def add(self, ts, pnl: float):
+        self.roll(ts)
+        self.today += pnl
+        if pnl > 0:
+            self.wins += 1
+            self.gross_win += pnl
+        else:
+            self.losses += 1
+            self.gross_loss += pnl
+
+    def summary(self) -> dict:
+        """Same figures batch_mt5 used to derive from the full trade log."""
+        total = self.wins + self.losses
+        win_rate = self.wins / total if total else 0
+        avg_win = self.gross_win / self.wins if self.wins else 0
+        avg_loss = self.gross_loss / self.losses if self.losses else 0
+        return {
+            "trades": total,
+            "wins": self.wins,
+            "losses": self.losses,
+            "win_rate": win_rate,
+            "avg_win": avg_win,
+            "avg_loss": avg_loss,
+            "profit_factor": self.gross_win / -self.gross_loss if self.gross_loss else float("inf"),
+            "expectancy": win_rate * avg_win + (1 - win_rate) * avg_loss,
+        }
+
+    def to_dict(self) -> dict:
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SessionPnL":
+        obj = cls(data.get("reset_hour", 0))
+        obj.__dict__.update(data)
+        return obj
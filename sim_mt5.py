@@ -0,0 +1,499 @@
+# File: sim_mt5.py
+"""
+Offline stand-in for the Windows-only MetaTrader5 package.
+
+Serves rates from the local BarStore, fills orders with configurable
+latency/slippage/requotes, tracks positions and records deals, so the live
+stack (batch_mt5, mt5_place_order, live_data, BarFeed, OrderExecutor) can
+be run and benchmarked on Linux/CI.
+
+Use it as the MetaTrader5 module:
+
+    import sim_mt5
+    sim_mt5.install(store_root="data/store", latency_ms=20, slippage_points=2)
+    import MetaTrader5 as mt5          # -> sim_mt5
+
+or run a script unchanged:
+
+    python sim_mt5.py --latency_ms 20 mt5_place_order.py --executor
+    python sim_mt5.py --bench_orders 1000     # order throughput/latency
+
+Symbols resolve against the store with or without the broker suffix
+('NAS100.a' -> 'NAS100'). By default every stored bar is visible; call
+set_time()/advance_bars() to replay history bar by bar, which also
+triggers SL/TP on open positions.
+"""
+
+import argparse
+import fnmatch
+import runpy
+import sys
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from bar_store import STORE_ROOT, BarStore
+
+# -- constants (values match the real package) -----------------------------------
+
+TIMEFRAME_M1, TIMEFRAME_M2, TIMEFRAME_M3, TIMEFRAME_M4, TIMEFRAME_M5 = 1, 2, 3, 4, 5
+TIMEFRAME_M6, TIMEFRAME_M10, TIMEFRAME_M12, TIMEFRAME_M15 = 6, 10, 12, 15
+TIMEFRAME_M20, TIMEFRAME_M30 = 20, 30
+TIMEFRAME_H1, TIMEFRAME_H2, TIMEFRAME_H3, TIMEFRAME_H4 = 16385, 16386, 16387, 16388
+TIMEFRAME_H6, TIMEFRAME_H8, TIMEFRAME_H12 = 16390, 16392, 16396
+TIMEFRAME_D1, TIMEFRAME_W1, TIMEFRAME_MN1 = 16408, 32769, 49153
+
+TRADE_ACTION_DEAL, TRADE_ACTION_SLTP = 1, 6
+ORDER_TYPE_BUY, ORDER_TYPE_SELL = 0, 1
+ORDER_TIME_GTC = 0
+ORDER_FILLING_FOK, ORDER_FILLING_IOC, ORDER_FILLING_RETURN = 0, 1, 2
+POSITION_TYPE_BUY, POSITION_TYPE_SELL = 0, 1
+DEAL_TYPE_BUY, DEAL_TYPE_SELL = 0, 1
+DEAL_ENTRY_IN, DEAL_ENTRY_OUT = 0, 1
+DEAL_REASON_CLIENT, DEAL_REASON_SL, DEAL_REASON_TP = 0, 4, 5
+
+TRADE_RETCODE_REQUOTE = 10004
+TRADE_RETCODE_DONE = 10009
+TRADE_RETCODE_TIMEOUT = 10012
+TRADE_RETCODE_INVALID = 10013
+TRADE_RETCODE_INVALID_VOLUME = 10014
+TRADE_RETCODE_INVALID_STOPS = 10016
+TRADE_RETCODE_MARKET_CLOSED = 10018
+TRADE_RETCODE_PRICE_CHANGED = 10020
+TRADE_RETCODE_PRICE_OFF = 10021
+TRADE_RETCODE_TOO_MANY_REQUESTS = 10024
+TRADE_RETCODE_CONNECTION = 10031
+
+_TF_NAMES = {v: k[len("TIMEFRAME_"):] for k, v in dict(globals()).items() if k.startswith("TIMEFRAME_")}
+
+RATES_DTYPE = np.dtype([
+    ("time", "<i8"), ("open", "<f8"), ("high", "<f8"), ("low", "<f8"), ("close", "<f8"),
+    ("tick_volume", "<u8"), ("spread", "<i4"), ("real_volume", "<u8"),
+])
+
+# -- result records (field names follow the real package) ------------------------
+
+SymbolInfo = namedtuple("SymbolInfo", "name visible select trade_allowed point digits spread trade_contract_size")
+Tick = namedtuple("Tick", "time bid ask last volume time_msc")
+AccountInfo = namedtuple("AccountInfo", "login balance equity profit margin margin_free currency")
+TerminalInfo = namedtuple("TerminalInfo", "connected trade_allowed name path")
+OrderSendResult = namedtuple(
+    "OrderSendResult",
+    "retcode deal order volume price bid ask comment request_id retcode_external request")
+TradePosition = namedtuple(
+    "TradePosition",
+    "ticket time time_msc type magic identifier volume price_open sl tp price_current "
+    "profit symbol comment")
+TradeDeal = namedtuple(
+    "TradeDeal",
+    "ticket order time time_msc type entry magic position_id reason volume price "
+    "commission swap profit fee symbol comment external_id")
+
+
+def _utc_seconds(value) -> int:
+    if isinstance(value, (int, float, np.integer)):
+        return int(value)
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert("UTC").tz_localize(None)
+    return int((ts - pd.Timestamp(0)) // pd.Timedelta("1s"))
+
+
+class SimTerminal:
+    """State behind the module-level API: bars, clock, positions, deals."""
+
+    def __init__(self, store_root=STORE_ROOT, latency_ms=0.0, latency_jitter_ms=0.0,
+                 slippage_points=0.0, spread_points=1.0, point=0.1, requote_rate=0.0,
+                 balance=10_000.0, contract_size=1.0, seed=0):
+        self.store = BarStore(root=store_root)
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.slippage_points = slippage_points
+        self.spread_points = spread_points
+        self.point = point
+        self.requote_rate = requote_rate
+        self.balance = balance
+        self.contract_size = contract_size
+        self.rng = np.random.default_rng(seed)
+        self.sim_time = None          # epoch seconds; None = everything visible
+        self.positions = {}           # ticket -> TradePosition
+        self.deals = []
+        self._rates = {}              # (store symbol, tf) -> RATES_DTYPE array
+        self._next_ticket = 1
+        self._lock = threading.Lock()
+        self.connected = False
+
+    # -- market data ---------------------------------------------------------------
+
+    def resolve(self, symbol: str):
+        """Store symbol for a broker symbol, or None."""
+        known = set(self.store.symbols())
+        for cand in (symbol, symbol.split(".")[0]):
+            if cand in known:
+                return cand
+        return None
+
+    def rates(self, symbol: str, timeframe: int):
+        name = self.resolve(symbol)
+        if name is None:
+            return None
+        key = (name, timeframe)
+        if key not in self._rates:
+            bars = self.store.read(name, _TF_NAMES.get(timeframe, str(timeframe)))
+            arr = np.zeros(len(bars), dtype=RATES_DTYPE)
+            if len(bars):
+                arr["time"] = (bars["Time"] - pd.Timestamp(0)) // pd.Timedelta("1s")
+                for src, dst in (("Open", "open"), ("High", "high"), ("Low", "low"), ("Close", "close")):
+                    arr[dst] = bars[src].to_numpy()
+                arr["tick_volume"] = bars["Volume"].to_numpy().astype(np.uint64)
+                arr["spread"] = int(self.spread_points)
+            self._rates[key] = arr
+        arr = self._rates[key]
+        if self.sim_time is not None:
+            arr = arr[:np.searchsorted(arr["time"], self.sim_time, side="right")]
+        return arr
+
+    def now(self) -> int:
+        if self.sim_time is not None:
+            return self.sim_time
+        return int(time.time())
+
+    def tick(self, symbol: str):
+        arr = self.rates(symbol, TIMEFRAME_M1)
+        if arr is None or not len(arr):
+            arr = self.rates(symbol, TIMEFRAME_M5)
+        if arr is None or not len(arr):
+            return None
+        bid = float(arr["close"][-1])
+        now = self.now()
+        return Tick(now, bid, bid + self.spread_points * self.point, bid, 0, now * 1000)
+
+    # -- trading -----------------------------------------------------------------------
+
+    def _ticket(self) -> int:
+        t = self._next_ticket
+        self._next_ticket += 1
+        return t
+
+    def _record_deal(self, order, pos, deal_type, entry, price, volume, profit, reason, comment,
+                     when=None):
+        now = self.now() if when is None else when
+        deal = TradeDeal(self._ticket(), order, now, now * 1000, deal_type, entry, pos.magic,
+                         pos.identifier, reason, volume, price, 0.0, 0.0, profit, 0.0,
+                         pos.symbol, comment, "")
+        self.deals.append(deal)
+        return deal
+
+    def _close(self, pos, price, reason, order=0, comment="", when=None):
+        direction = 1 if pos.type == POSITION_TYPE_BUY else -1
+        profit = (price - pos.price_open) * direction * pos.volume * self.contract_size
+        self.balance += profit
+        del self.positions[pos.ticket]
+        deal_type = DEAL_TYPE_SELL if direction > 0 else DEAL_TYPE_BUY
+        return self._record_deal(order, pos, deal_type, DEAL_ENTRY_OUT, price, pos.volume,
+                                 profit, reason, comment or pos.comment, when)
+
+    def order_send(self, request: dict):
+        delay = self.latency_ms + (self.rng.uniform(-1, 1) * self.latency_jitter_ms
+                                   if self.latency_jitter_ms else 0.0)
+        if delay > 0:
+            time.sleep(delay / 1000)
+        with self._lock:
+            return self._order_send(request)
+
+    def _result(self, code, request, deal=0, order=0, volume=0.0, price=0.0, tick=None, comment=""):
+        bid, ask = (tick.bid, tick.ask) if tick else (0.0, 0.0)
+        return OrderSendResult(code, deal, order, volume, price, bid, ask, comment, 0, 0, request)
+
+    def _order_send(self, request: dict):
+        symbol = request.get("symbol", "")
+        tick = self.tick(symbol)
+        if request.get("action") != TRADE_ACTION_DEAL:
+            return self._result(TRADE_RETCODE_INVALID, request, comment="Unsupported action")
+        if tick is None:
+            return self._result(TRADE_RETCODE_MARKET_CLOSED, request, comment="No prices")
+        volume = float(request.get("volume", 0.0))
+        if volume <= 0:
+            return self._result(TRADE_RETCODE_INVALID_VOLUME, request, tick=tick)
+        if self.requote_rate and self.rng.random() < self.requote_rate:
+            return self._result(TRADE_RETCODE_REQUOTE, request, tick=tick, comment="Requote")
+
+        buy = request.get("type") == ORDER_TYPE_BUY
+        # Slippage is always adverse, uniform in [0, slippage_points]
+        slip = self.rng.uniform(0, self.slippage_points) * self.point if self.slippage_points else 0.0
+        price = tick.ask + slip if buy else tick.bid - slip
+        order = self._ticket()
+
+        if request.get("position"):
+            pos = self.positions.get(request["position"])
+            if pos is None:
+                return self._result(TRADE_RETCODE_INVALID, request, tick=tick, comment="No position")
+            deal = self._close(pos, price, DEAL_REASON_CLIENT, order, request.get("comment", ""))
+            return self._result(TRADE_RETCODE_DONE, request, deal.ticket, order, volume, price, tick)
+
+        sl, tp = float(request.get("sl", 0.0) or 0.0), float(request.get("tp", 0.0) or 0.0)
+        if (sl and (sl >= price if buy else sl <= price)) or (tp and (tp <= price if buy else tp >= price)):
+            return self._result(TRADE_RETCODE_INVALID_STOPS, request, tick=tick)
+        now = self.now()
+        pos = TradePosition(order, now, now * 1000, POSITION_TYPE_BUY if buy else POSITION_TYPE_SELL,
+                            request.get("magic", 0), order, volume, price, sl, tp, price, 0.0,
+                            symbol, request.get("comment", ""))
+        self.positions[order] = pos
+        deal = self._record_deal(order, pos, DEAL_TYPE_BUY if buy else DEAL_TYPE_SELL, DEAL_ENTRY_IN,
+                                 price, volume, 0.0, DEAL_REASON_CLIENT, pos.comment)
+        return self._result(TRADE_RETCODE_DONE, request, deal.ticket, order, volume, price, tick)
+
+    # -- replay clock ------------------------------------------------------------------
+
+    def set_time(self, when):
+        """Show bars up to `when` (None = all) and apply SL/TP on every bar passed over."""
+        with self._lock:
+            since = self.sim_time
+            self.sim_time = None if when is None else _utc_seconds(when)
+            self._check_stops(since)
+
+    def _check_stops(self, since=None):
+        """Close positions whose SL/TP was hit by a bar after `since` (and after the entry)."""
+        for pos in list(self.positions.values()):
+            arr = self.rates(pos.symbol, TIMEFRAME_M5)
+            if arr is None or not len(arr):
+                continue
+            start = pos.time if since is None else max(pos.time, since)
+            bars = arr[np.searchsorted(arr["time"], start, side="right"):]
+            if not len(bars):
+                continue
+            buy = pos.type == POSITION_TYPE_BUY
+            sl_hit = (bars["low"] <= pos.sl if buy else bars["high"] >= pos.sl) if pos.sl else np.zeros(len(bars), bool)
+            tp_hit = (bars["high"] >= pos.tp if buy else bars["low"] <= pos.tp) if pos.tp else np.zeros(len(bars), bool)
+            hit = np.flatnonzero(sl_hit | tp_hit)
+            if not len(hit):
+                continue
+            i = hit[0]
+            # Stop first when both sit inside the same bar, matching the backtest engines
+            if sl_hit[i]:
+                self._close(pos, pos.sl, DEAL_REASON_SL, when=int(bars["time"][i]))
+            else:
+                self._close(pos, pos.tp, DEAL_REASON_TP, when=int(bars["time"][i]))
+
+    def advance_bars(self, symbol: str, n: int = 1, timeframe: int = TIMEFRAME_M5):
+        """Step the clock forward n bars of symbol/timeframe, one bar at a time."""
+        name = self.resolve(symbol)
+        full = self._rates.get((name, timeframe))
+        if full is None:
+            saved, self.sim_time = self.sim_time, None
+            full = self.rates(symbol, timeframe)
+            self.sim_time = saved
+        pos = 0 if self.sim_time is None else int(np.searchsorted(full["time"], self.sim_time, side="right"))
+        for t in full["time"][pos:pos + n]:
+            self.set_time(int(t))
+
+
+# -- module-level API (mirrors MetaTrader5) --------------------------------------
+
+_terminal = SimTerminal()
+
+
+def configure(**kwargs) -> SimTerminal:
+    """Replace the simulated terminal (see SimTerminal for options)."""
+    global _terminal
+    _terminal = SimTerminal(**kwargs)
+    return _terminal
+
+
+def terminal() -> SimTerminal:
+    return _terminal
+
+
+def install(**kwargs):
+    """Register this module as MetaTrader5 so `import MetaTrader5` picks it up."""
+    if kwargs:
+        configure(**kwargs)
+    module = sys.modules[__name__]
+    sys.modules["MetaTrader5"] = module
+    return module
+
+
+def initialize(*args, **kwargs) -> bool:
+    _terminal.connected = True
+    return True
+
+
+def shutdown():
+    _terminal.connected = False
+
+
+def last_error():
+    return (1, "Success")
+
+
+def version():
+    return (500, 0, "sim")
+
+
+def terminal_info():
+    return TerminalInfo(_terminal.connected, True, "sim_mt5", _terminal.store.root)
+
+
+def account_info():
+    floating = 0.0
+    for p in _terminal.positions.values():
+        tick = _terminal.tick(p.symbol)
+        if tick:
+            direction = 1 if p.type == POSITION_TYPE_BUY else -1
+            price = tick.bid if direction > 0 else tick.ask
+            floating += (price - p.price_open) * direction * p.volume * _terminal.contract_size
+    t = _terminal
+    return AccountInfo(1, t.balance, t.balance + floating, floating, 0.0, t.balance + floating, "USD")
+
+
+def _symbol_info(name):
+    return SymbolInfo(name, True, True, True, _terminal.point, 2, int(_terminal.spread_points),
+                      _terminal.contract_size)
+
+
+def symbols_get(group=None):
+    names = _terminal.store.symbols()
+    if group:
+        names = [n for n in names if _match_group(n, group)]
+    return tuple(_symbol_info(n) for n in names)
+
+
+def symbol_info(symbol):
+    return _symbol_info(symbol) if _terminal.resolve(symbol) else None
+
+
+def symbol_select(symbol, enable=True) -> bool:
+    return _terminal.resolve(symbol) is not None
+
+
+def symbol_info_tick(symbol):
+    return _terminal.tick(symbol)
+
+
+def copy_rates_from_pos(symbol, timeframe, start_pos, count):
+    arr = _terminal.rates(symbol, timeframe)
+    if arr is None:
+        return None
+    n = len(arr)
+    out = arr[max(0, n - start_pos - count):max(0, n - start_pos)].copy()
+    return out if len(out) else None
+
+
+def copy_rates_from(symbol, timeframe, date_from, count):
+    arr = _terminal.rates(symbol, timeframe)
+    if arr is None:
+        return None
+    hi = np.searchsorted(arr["time"], _utc_seconds(date_from), side="right")
+    out = arr[max(0, hi - count):hi].copy()
+    return out if len(out) else None
+
+
+def copy_rates_range(symbol, timeframe, date_from, date_to):
+    arr = _terminal.rates(symbol, timeframe)
+    if arr is None:
+        return None
+    t = arr["time"]
+    lo = np.searchsorted(t, _utc_seconds(date_from), side="left")
+    hi = np.searchsorted(t, _utc_seconds(date_to), side="right")
+    return arr[lo:hi].copy()
+
+
+def order_send(request):
+    return _terminal.order_send(request)
+
+
+def _match_group(symbol, group) -> bool:
+    """MT5 group filter: comma-separated wildcards, '!' excludes."""
+    matched = False
+    for pattern in str(group).split(","):
+        pattern = pattern.strip()
+        if pattern.startswith("!"):
+            if fnmatch.fnmatchcase(symbol, pattern[1:]):
+                return False
+        elif fnmatch.fnmatchcase(symbol, pattern):
+            matched = True
+    return matched
+
+
+def positions_get(symbol=None, group=None, ticket=None):
+    positions = list(_terminal.positions.values())
+    if ticket is not None:
+        positions = [p for p in positions if p.ticket == ticket]
+    if symbol is not None:
+        positions = [p for p in positions if p.symbol == symbol]
+    if group is not None:
+        positions = [p for p in positions if _match_group(p.symbol, group)]
+    return tuple(positions)
+
+
+def positions_total() -> int:
+    return len(_terminal.positions)
+
+
+def history_deals_get(date_from=None, date_to=None, group=None, ticket=None, position=None):
+    deals = _terminal.deals
+    if ticket is not None:
+        return tuple(d for d in deals if d.order == ticket)
+    if position is not None:
+        return tuple(d for d in deals if d.position_id == position)
+    lo, hi = _utc_seconds(date_from), _utc_seconds(date_to)
+    out = [d for d in deals if lo <= d.time <= hi]
+    if group is not None:
+        out = [d for d in out if _match_group(d.symbol, group)]
+    return tuple(out)
+
+
+def history_deals_total(date_from, date_to) -> int:
+    return len(history_deals_get(date_from, date_to))
+
+
+# -- benchmark / runner ----------------------------------------------------------------
+
+def bench_orders(n: int, symbol: str = None):
+    """Push n open/close round trips through OrderExecutor and report throughput."""
+    from order_executor import OrderExecutor
+
+    install()
+    symbol = symbol or (_terminal.store.symbols() or [None])[0]
+    if symbol is None:
+        print(f"[❌] No symbols in {_terminal.store.root}; import some bars first")
+        return None
+    executor = OrderExecutor(sys.modules[__name__], max_queue=n + 1)
+    t0 = time.perf_counter()
+    for i in range(n):
+        executor.submit({"symbol": symbol, "side": "long" if i % 2 == 0 else "short",
+                         "volume": 1.0, "signal_time": i})
+    executor.close()
+    secs = time.perf_counter() - t0
+    print(f"[📊] {n} orders in {secs:.2f}s ({n / secs:.0f}/s)")
+    print(executor.report())
+    return executor
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Run a script (or a benchmark) against the simulated MT5")
+    p.add_argument("--store", default=STORE_ROOT, help="BarStore root with the bars to serve")
+    p.add_argument("--latency_ms", type=float, default=0.0)
+    p.add_argument("--jitter_ms", type=float, default=0.0)
+    p.add_argument("--slippage_points", type=float, default=0.0)
+    p.add_argument("--requote_rate", type=float, default=0.0)
+    p.add_argument("--bench_orders", type=int, default=0,
+                   help="Send N orders through OrderExecutor and report latency")
+    p.add_argument("script", nargs="?", help="Script to run with MetaTrader5 -> sim_mt5")
+    p.add_argument("args", nargs=argparse.REMAINDER)
+    args = p.parse_args(argv)
+
+    install(store_root=args.store, latency_ms=args.latency_ms, latency_jitter_ms=args.jitter_ms,
+            slippage_points=args.slippage_points, requote_rate=args.requote_rate)
+    if args.bench_orders:
+        bench_orders(args.bench_orders)
+    if args.script:
+        sys.argv = [args.script, *args.args]
+        runpy.run_path(args.script, run_name="__main__")
+
+
+if __name__ == "__main__":
+    main()
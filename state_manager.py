@@ -1,22 +1,43 @@
 # File: state_manager.py
 
-import json
-import os
+from state_store import StateStore
 
 STATE_FILE = 'bot_state.json'
+DEFAULTS = {
+    "last_equity": None,
+    "last_timestamp": None,
+    "optimized_params": {}
+}
+
+_store = None
+
+
+def get_store() -> StateStore:
+    """Process-wide journaled store for STATE_FILE (opened lazily)."""
+    global _store
+    if _store is None:
+        _store = StateStore(STATE_FILE, defaults=DEFAULTS)
+    return _store
+
 
 def load_state() -> dict:
     """Load the persistent state (or return defaults if missing)."""
-    if not os.path.isfile(STATE_FILE):
-        return {
-            "last_equity": None,
-            "last_timestamp": None,
-            "optimized_params": {}
-        }
-    with open(STATE_FILE, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    return dict(get_store().state)
+
 
 def save_state(state: dict):
-    """Write the state back to disk."""
-    with open(STATE_FILE, 'w', encoding='utf-8') as f:
-        json.dump(state, f, indent=2, default=str)
+    """
+    Replace the whole state, as the old json.dump did: keys missing from
+    `state` are deleted. Written to the journal per the store's flush policy.
+    """
+    get_store().replace(state)
+
+
+def update_state(**changes):
+    """Set only the given keys, leaving the rest of the state as it is."""
+    get_store().update(**changes)
+
+
+def flush_state():
+    """Force pending changes to disk (e.g. before placing an order)."""
+    get_store().flush()
@@ -0,0 +1,185 @@
+# File: state_store.py
+"""
+Crash-safe, batched persistence for bot_state.json-style state.
+
+Rewriting the whole JSON file on every bar is slow (a 5000-bar replay
+meant 5000 rewrites) and a crash mid-write leaves it truncated. StateStore
+keeps the same snapshot file but records changes as an append-only
+journal next to it:
+
+    bot_state.json            last compacted snapshot (plain JSON)
+    bot_state.json.journal    one JSON object per line: top-level keys to set
+                              (keys listed under "$unset" are removed)
+
+    store = StateStore("bot_state.json", defaults={"last_ts": None})
+    store.update(last_ts=ts, engine=engine.snapshot)   # callables run at flush
+    store.replace(new_state)                           # drop keys not in new_state
+    ...
+    store.close()                                      # flush + compact
+
+Updates are buffered and appended (fsync'd) every `flush_every` updates or
+`flush_secs` seconds, whichever comes first. After `compact_every` journal
+entries the snapshot is rewritten via a temp file + os.replace and the
+journal is truncated. Loading replays the journal over the snapshot and
+ignores a torn final line, so a crash loses at most the unflushed batch
+and resumes from a consistent state. Stores not closed explicitly are
+flushed and compacted at interpreter exit.
+"""
+
+import atexit
+import json
+import os
+import time
+
+FLUSH_EVERY   = int(os.getenv("STATE_FLUSH_EVERY", "100"))
+FLUSH_SECS    = float(os.getenv("STATE_FLUSH_SECS", "5"))
+COMPACT_EVERY = int(os.getenv("STATE_COMPACT_EVERY", "500"))
+
+UNSET_KEY = "$unset"
+_DELETED  = object()
+
+
+def _fsync_dir(path: str):
+    if os.name == "nt":
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def atomic_write_json(path: str, data: dict, indent=2):
+    """Write JSON to a temp file, fsync, then rename over `path`."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=indent, default=str)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    _fsync_dir(path)
+
+
+class StateStore:
+    """JSON snapshot + append-only journal with a configurable flush policy."""
+
+    def __init__(self, path: str, defaults: dict = None, flush_every: int = FLUSH_EVERY,
+                 flush_secs: float = FLUSH_SECS, compact_every: int = COMPACT_EVERY):
+        self.path = path
+        self.journal_path = f"{path}.journal"
+        self.flush_every = max(1, flush_every)
+        self.flush_secs = flush_secs
+        self.compact_every = max(1, compact_every)
+        self.state = dict(defaults or {})
+        self._pending = {}
+        self._pending_updates = 0
+        self._journal_entries = 0
+        self._last_flush = time.monotonic()
+        self.flushes = 0
+        self.compactions = 0
+        self._load()
+        atexit.register(self.close)
+
+    # -- loading ----------------------------------------------------------------
+
+    def _load(self):
+        if os.path.isfile(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self.state.update(json.load(f))
+            except (OSError, ValueError) as e:
+                # Pre-journal versions could leave a half-written file behind
+                print(f"[⚠️] Unreadable state snapshot {self.path} ({e}); using journal/defaults")
+        if os.path.isfile(self.journal_path):
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        patch = json.loads(line)
+                    except ValueError:
+                        break  # torn tail from a crash mid-append
+                    for key in patch.pop(UNSET_KEY, ()):
+                        self.state.pop(key, None)
+                    self.state.update(patch)
+                    self._journal_entries += 1
+
+    # -- writing ----------------------------------------------------------------
+
+    def update(self, **changes):
+        """
+        Set top-level keys. Values may be zero-argument callables, evaluated
+        only when the batch is flushed. Flushes if the policy says so.
+        """
+        for key, value in changes.items():
+            self._pending[key] = value
+            if not callable(value):
+                self.state[key] = value
+        self._pending_updates += 1
+        if self.flush_due():
+            self.flush()
+
+    def replace(self, state: dict):
+        """
+        Make `state` the whole state, like rewriting the file: keys missing
+        from it are deleted (journaled under "$unset").
+        """
+        for key in set(self.state) | set(self._pending):
+            if key not in state:
+                self.state.pop(key, None)
+                self._pending[key] = _DELETED
+        self.update(**state)
+
+    def flush_due(self) -> bool:
+        return bool(self._pending) and (
+            self._pending_updates >= self.flush_every
+            or time.monotonic() - self._last_flush >= self.flush_secs
+        )
+
+    def flush(self):
+        """Append pending changes to the journal (fsync'd); compact when it grows."""
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return
+        patch = {k: (v() if callable(v) else v) for k, v in self._pending.items()
+                 if v is not _DELETED}
+        self.state.update(patch)
+        unset = sorted(k for k, v in self._pending.items() if v is _DELETED)
+        if unset:
+            patch[UNSET_KEY] = unset
+        line = json.dumps(patch, separators=(",", ":"), default=str)
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._pending.clear()
+        self._pending_updates = 0
+        self._journal_entries += 1
+        self.flushes += 1
+        if self._journal_entries >= self.compact_every:
+            self.compact()
+
+    def compact(self):
+        """Fold the journal into an atomically replaced snapshot."""
+        if self._pending:
+            self.flush()
+            if self._journal_entries == 0:
+                return  # flush() already compacted
+        atomic_write_json(self.path, self.state)
+        # A crash before this truncate only means re-applying the same patches
+        with open(self.journal_path, "w", encoding="utf-8") as f:
+            f.flush()
+            os.fsync(f.fileno())
+        self._journal_entries = 0
+        self.compactions += 1
+
+    def close(self):
+        """Flush and compact; safe to call more than once."""
+        if self._pending or self._journal_entries:
+            self.compact()
+        # Only unclosed stores need the exit hook (and stay referenced by it)
+        atexit.unregister(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,422 @@
+# File: streaming_strategy.py
+"""
+Incremental SMA50 / stochastic / ATR engine for live runners.
+
+By default the live runners call run_strategy() on df.iloc[:i+1] for every
+new bar, which costs O(N^2) over a session and recomputes every indicator
+from scratch.  With --streaming they use StreamingStrategy instead, which
+keeps the indicator state between bars so each bar costs O(1):
+
+    engine = StreamingStrategy(take_profit_pips=30, stop_loss_pips=20)
+    for _, bar in df.iterrows():
+        for action in engine.on_bar(bar):
+            print(action)
+
+The full state (rolling windows, stochastic deques, Wilder ATR, open
+position and equity) round-trips through snapshot() / from_snapshot(), so a
+runner can persist it in bot_state.json and resume without replaying history.
+
+The rules below are reconstructed from how the scripts call
+strategy_sma_stoch_rr_v2 (the strategies package is not part of this tree);
+test_streaming_strategy.py checks them against its run_strategy whenever it
+is importable.  They are shared with vectorized_backtest, and indicator
+values agree with the batch kernel to floating-point rounding.
+
+Rules:
+  - Long:  Close above SMA50 by at most sma50_distance_pips, bullish body of
+           at least min_candle_size_pips, %K crossing above %D below 50.
+  - Short: mirror image (Close below SMA50, bearish body, %K crossing below
+           %D above 50).  test_mode skips the stochastic cross filter.
+  - Entry at the signal bar's close.  Take-profit is take_profit_pips away;
+    the stop is atr_stop_multiplier * ATR when use_atr_stop is set, otherwise
+    max(stop_loss_pips, atr_multiplier * ATR).
+  - Exits are checked from the next bar on; the stop wins when a single bar
+    touches both levels.  One position at a time.
+"""
+
+from collections import deque
+
+import pandas as pd
+
+SMA_PERIOD = 50
+STOCH_K_PERIOD = 14
+STOCH_D_PERIOD = 3
+
+DEFAULT_PARAMS = {
+    "take_profit_pips":     30,
+    "stop_loss_pips":       20,
+    "sma50_distance_pips":  30,
+    "min_candle_size_pips": 0.5,
+    "atr_period":           10,
+    "atr_multiplier":       1.0,
+    "pip_factor":           0.1,
+    "use_atr_stop":         False,
+    "atr_stop_multiplier":  1.0,
+    "lot_size":             1.0,
+    "test_mode":            False,
+}
+DEFAULT_EQUITY = 10_000.0
+
+
+def resolve_params(**overrides) -> dict:
+    """
+    Merge caller kwargs over DEFAULT_PARAMS.
+
+    Unknown keys (e.g. the leg filters min_leg_move / max_leg_gap that the
+    optimizers pass around) are dropped so existing call sites keep working.
+    """
+    params = dict(DEFAULT_PARAMS)
+    for key, value in overrides.items():
+        if key in params:
+            params[key] = value
+    params["atr_period"] = int(params["atr_period"])
+    return params
+
+
+def stop_distance(params: dict, atr: float) -> float:
+    """Price distance from entry to the stop-loss."""
+    if params["use_atr_stop"]:
+        return atr * params["atr_stop_multiplier"]
+    return max(params["stop_loss_pips"] * params["pip_factor"], atr * params["atr_multiplier"])
+
+
+def exit_for_bar(direction: int, sl: float, tp: float, high: float, low: float):
+    """
+    Return (exit_price, reason) if this bar closes the position, else None.
+    The stop is checked first so a bar that spans both levels is a loss.
+    """
+    if direction > 0:
+        if low <= sl:
+            return sl, "sl"
+        if high >= tp:
+            return tp, "tp"
+    else:
+        if high >= sl:
+            return sl, "sl"
+        if low <= tp:
+            return tp, "tp"
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Rolling indicator state
+# ---------------------------------------------------------------------------
+
+class RollingSMA:
+    """Simple moving average over the last `period` values (O(1) running sum)."""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.window = deque(maxlen=period)
+        self.total = 0.0
+
+    def update(self, value: float):
+        if len(self.window) == self.period:
+            self.total -= self.window[0]
+        self.window.append(value)
+        self.total += value
+        if len(self.window) < self.period:
+            return None
+        return self.total / self.period
+
+    def to_dict(self) -> dict:
+        return {"period": self.period, "window": list(self.window), "total": self.total}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "RollingSMA":
+        obj = cls(data["period"])
+        obj.window.extend(data["window"])
+        # Older snapshots carry only the window
+        obj.total = data.get("total", sum(obj.window))
+        return obj
+
+
+class RollingStochastic:
+    """
+    Stochastic %K/%D using monotonic deques for the rolling high/low, so each
+    update is amortised O(1) regardless of the lookback.
+    """
+
+    def __init__(self, k_period: int = STOCH_K_PERIOD, d_period: int = STOCH_D_PERIOD):
+        self.k_period = k_period
+        self.d_period = d_period
+        self.count = 0
+        self.highs = deque()   # (index, high), decreasing highs
+        self.lows = deque()    # (index, low), increasing lows
+        self.k_window = deque(maxlen=d_period)
+
+    def update(self, high: float, low: float, close: float):
+        idx = self.count
+        self.count += 1
+        while self.highs and self.highs[-1][1] <= high:
+            self.highs.pop()
+        self.highs.append((idx, high))
+        while self.lows and self.lows[-1][1] >= low:
+            self.lows.pop()
+        self.lows.append((idx, low))
+        cutoff = idx - self.k_period
+        while self.highs[0][0] <= cutoff:
+            self.highs.popleft()
+        while self.lows[0][0] <= cutoff:
+            self.lows.popleft()
+
+        if self.count < self.k_period:
+            return None, None
+        hh = self.highs[0][1]
+        ll = self.lows[0][1]
+        k = 100.0 * (close - ll) / (hh - ll) if hh != ll else 50.0
+        self.k_window.append(k)
+        if len(self.k_window) < self.d_period:
+            return k, None
+        return k, sum(self.k_window) / self.d_period
+
+    def to_dict(self) -> dict:
+        return {
+            "k_period": self.k_period,
+            "d_period": self.d_period,
+            "count": self.count,
+            "highs": [list(x) for x in self.highs],
+            "lows": [list(x) for x in self.lows],
+            "k_window": list(self.k_window),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "RollingStochastic":
+        obj = cls(data["k_period"], data["d_period"])
+        obj.count = data["count"]
+        obj.highs.extend(tuple(x) for x in data["highs"])
+        obj.lows.extend(tuple(x) for x in data["lows"])
+        obj.k_window.extend(data["k_window"])
+        return obj
+
+
+class WilderATR:
+    """Average True Range with Wilder smoothing, seeded by the first `period` TRs."""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.prev_close = None
+        self.seed_sum = 0.0
+        self.seed_count = 0
+        self.value = None
+
+    def update(self, high: float, low: float, close: float):
+        if self.prev_close is None:
+            tr = high - low
+        else:
+            tr = max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.prev_close = close
+
+        if self.value is None:
+            self.seed_sum += tr
+            self.seed_count += 1
+            if self.seed_count == self.period:
+                self.value = self.seed_sum / self.period
+            return self.value
+        self.value = (self.value * (self.period - 1) + tr) / self.period
+        return self.value
+
+    def to_dict(self) -> dict:
+        return {
+            "period": self.period,
+            "prev_close": self.prev_close,
+            "seed_sum": self.seed_sum,
+            "seed_count": self.seed_count,
+            "value": self.value,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "WilderATR":
+        obj = cls(data["period"])
+        obj.prev_close = data["prev_close"]
+        obj.seed_sum = data["seed_sum"]
+        obj.seed_count = data["seed_count"]
+        obj.value = data["value"]
+        return obj
+
+
+# ---------------------------------------------------------------------------
+# Strategy engine
+# ---------------------------------------------------------------------------
+
+def _bar_fields(bar):
+    """Extract (time, open, high, low, close) from a Series, dict or namedtuple row."""
+    if isinstance(bar, pd.Series):
+        ts = bar.get("Time", bar.get("time", bar.name))
+        get = bar.get
+    elif isinstance(bar, dict):
+        ts = bar.get("Time", bar.get("time"))
+        get = bar.get
+    else:
+        ts = getattr(bar, "Time", getattr(bar, "time", getattr(bar, "Index", None)))
+        get = lambda k, d=None: getattr(bar, k, d)
+    o = get("Open", get("open"))
+    h = get("High", get("high"))
+    l = get("Low", get("low"))
+    c = get("Close", get("close"))
+    return ts, float(o), float(h), float(l), float(c)
+
+
+def _iso(ts):
+    if ts is None:
+        return None
+    return pd.Timestamp(ts).isoformat()
+
+
+class StreamingStrategy:
+    """
+    Bar-by-bar version of the SMA50 / stochastic / ATR strategy.
+
+    on_bar() returns a list of action dicts ({'action': 'open'|'close', ...});
+    closed trades use the same keys as the batch trade list, including 'pnl'.
+    """
+
+    def __init__(self, initial_equity: float = DEFAULT_EQUITY, **params):
+        self.params = resolve_params(**params)
+        self.initial_equity = float(initial_equity)
+        self.equity = float(initial_equity)
+        self.sma = RollingSMA(SMA_PERIOD)
+        self.stoch = RollingStochastic(STOCH_K_PERIOD, STOCH_D_PERIOD)
+        self.atr = WilderATR(self.params["atr_period"])
+        self.prev_k = None
+        self.prev_d = None
+        self.position = None
+        self.bars_seen = 0
+        self.last_ts = None
+        self.wins = 0
+        self.losses = 0
+
+    # -- indicator plumbing -------------------------------------------------
+
+    def _update_indicators(self, h, l, c):
+        sma = self.sma.update(c)
+        k, d = self.stoch.update(h, l, c)
+        atr = self.atr.update(h, l, c)
+        return sma, k, d, atr
+
+    def warm_up(self, bar):
+        """Feed a history bar through the indicators without trading on it."""
+        ts, _, h, l, c = _bar_fields(bar)
+        _, k, d, _ = self._update_indicators(h, l, c)
+        self.prev_k, self.prev_d = k, d
+        self.bars_seen += 1
+        self.last_ts = _iso(ts)
+
+    def _entry_direction(self, o, c, sma, k, d) -> int:
+        p = self.params
+        dist = p["sma50_distance_pips"] * p["pip_factor"]
+        min_body = p["min_candle_size_pips"] * p["pip_factor"]
+        check_stoch = not p["test_mode"]
+        if c > sma and (c - sma) <= dist and (c - o) >= min_body:
+            if not check_stoch or (self.prev_k <= self.prev_d and k > d and d < 50.0):
+                return 1
+        if c < sma and (sma - c) <= dist and (o - c) >= min_body:
+            if not check_stoch or (self.prev_k >= self.prev_d and k < d and d > 50.0):
+                return -1
+        return 0
+
+    # -- main entry point ---------------------------------------------------
+
+    def on_bar(self, bar) -> list:
+        """Process one closed bar and return the actions it triggered."""
+        ts, o, h, l, c = _bar_fields(bar)
+        iso_ts = _iso(ts)
+        actions = []
+
+        # 1) Manage the open position against this bar's range
+        if self.position is not None:
+            pos = self.position
+            hit = exit_for_bar(pos["direction"], pos["sl"], pos["tp"], h, l)
+            if hit is not None:
+                exit_price, reason = hit
+                pnl = (exit_price - pos["entry_price"]) * pos["direction"] * self.params["lot_size"]
+                self.equity = self.equity + pnl
+                if pnl > 0:
+                    self.wins += 1
+                else:
+                    self.losses += 1
+                trade = {
+                    **pos,
+                    "exit_time": iso_ts,
+                    "exit_price": exit_price,
+                    "exit_reason": reason,
+                    "pnl": pnl,
+                    "equity": self.equity,
+                }
+                actions.append({"action": "close", **trade})
+                self.position = None
+
+        # 2) Roll the indicators forward
+        sma, k, d, atr = self._update_indicators(h, l, c)
+
+        # 3) Look for a new entry once every indicator is warm
+        ready = (sma is not None and d is not None and atr is not None
+                 and self.prev_d is not None)
+        if self.position is None and ready:
+            direction = self._entry_direction(o, c, sma, k, d)
+            if direction:
+                sl_dist = stop_distance(self.params, atr)
+                tp_dist = self.params["take_profit_pips"] * self.params["pip_factor"]
+                self.position = {
+                    "direction": direction,
+                    "side": "long" if direction > 0 else "short",
+                    "entry_time": iso_ts,
+                    "entry_price": c,
+                    "sl": c - direction * sl_dist,
+                    "tp": c + direction * tp_dist,
+                }
+                actions.append({"action": "open", **self.position})
+
+        self.prev_k, self.prev_d = k, d
+        self.bars_seen += 1
+        self.last_ts = iso_ts
+        return actions
+
+    def run(self, df: pd.DataFrame):
+        """
+        Feed every row of df through on_bar().
+        Returns (trades, equity_curve) with one equity value per bar.
+        """
+        trades, equity_curve = [], []
+        for row in df.itertuples():
+            for action in self.on_bar(row):
+                if action["action"] == "close":
+                    trades.append({k: v for k, v in action.items() if k != "action"})
+            equity_curve.append(self.equity)
+        return trades, equity_curve
+
+    # -- persistence --------------------------------------------------------
+
+    def snapshot(self) -> dict:
+        """JSON-serialisable state for resuming later."""
+        return {
+            "params": self.params,
+            "initial_equity": self.initial_equity,
+            "equity": self.equity,
+            "sma": self.sma.to_dict(),
+            "stoch": self.stoch.to_dict(),
+            "atr": self.atr.to_dict(),
+            "prev_k": self.prev_k,
+            "prev_d": self.prev_d,
+            "position": self.position,
+            "bars_seen": self.bars_seen,
+            "last_ts": self.last_ts,
+            "wins": self.wins,
+            "losses": self.losses,
+        }
+
+    @classmethod
+    def from_snapshot(cls, data: dict) -> "StreamingStrategy":
+        obj = cls(initial_equity=data["initial_equity"], **data["params"])
+        obj.equity = data["equity"]
+        obj.sma = RollingSMA.from_dict(data["sma"])
+        obj.stoch = RollingStochastic.from_dict(data["stoch"])
+        obj.atr = WilderATR.from_dict(data["atr"])
+        obj.prev_k = data["prev_k"]
+        obj.prev_d = data["prev_d"]
+        obj.position = data["position"]
+        obj.bars_seen = data["bars_seen"]
+        obj.last_ts = data["last_ts"]
+        obj.wins = data.get("wins", 0)
+        obj.losses = data.get("losses", 0)
+        return obj
@@ -0,0 +1,123 @@
+# test_alert_dispatcher.py
+
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from alert_dispatcher import AlertDispatcher, CallableChannel, EmailChannel, SMTPPool, WebhookChannel
+
+
+@pytest.fixture
+def smtp_server():
+    controller_mod = pytest.importorskip("aiosmtpd.controller")
+
+    class Handler:
+        def __init__(self):
+            self.messages = []
+            self.peers = set()
+
+        async def handle_DATA(self, server, session, envelope):
+            self.messages.append(envelope.content.decode("utf-8", "replace"))
+            self.peers.add(session.peer)
+            return "250 OK"
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    handler = Handler()
+    controller = controller_mod.Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    try:
+        yield handler, port
+    finally:
+        controller.stop()
+
+
+@pytest.fixture
+def webhook():
+    received, status = [], [500]   # first request fails
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            code = status.pop(0) if status else 200
+            if code == 200:
+                received.append(json.loads(self.rfile.read(int(self.headers["Content-Length"]))))
+            self.send_response(code)
+            self.end_headers()
+            self.wfile.write(b"ok")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}/hook", received
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_email_batches_share_one_smtp_connection(smtp_server, tmp_path):
+    handler, port = smtp_server
+    pool = SMTPPool("127.0.0.1", port, starttls=False)
+    d = AlertDispatcher({"email": EmailChannel(pool, "bot@example.com", "me@example.com")},
+                        coalesce_secs=0.2, per_minute=0)
+    for i in range(5):
+        assert d.submit("email", f"Drawdown Alert: NAS #{i % 2}", f"dd {i}", key=f"NAS|{i % 2}")
+    assert d.flush(10)
+    report = tmp_path / "summary.json"
+    report.write_text("{}")
+    d.submit("email", "Report", "see attached", attachments=[report])
+    d.close(10)
+
+    assert len(handler.messages) == 2 and pool.connects == 1 and len(handler.peers) == 1
+    first = handler.messages[0]
+    assert "Subject: 2 alerts: Drawdown Alert: NAS #0 (x3)" in first and "dd 4" in first and "dd 0" not in first
+    assert 'filename="summary.json"' in handler.messages[1]
+    assert d.stats["sent"] == 6 and d.stats["messages"] == 2 and d.stats["coalesced"] == 3
+
+
+def test_webhook_retries_after_server_error(webhook):
+    url, received = webhook
+    sleeps = []
+    d = AlertDispatcher({"slack": WebhookChannel(url)}, coalesce_secs=0, backoff=0.5,
+                        per_minute=0, sleep=sleeps.append)
+    d.submit("slack", "Drawdown Alert: BTC #1", "Max drawdown reached -6.00%")
+    d.close(10)
+    assert received == [{"text": "Drawdown Alert: BTC #1\nMax drawdown reached -6.00%"}]
+    assert sleeps == [0.5] and d.stats["retries"] == 1 and d.stats["failed"] == 0
+
+
+def test_failures_rate_limit_and_full_queue():
+    calls, sleeps = [], []
+
+    def flaky(subject, body):
+        calls.append(time.monotonic())
+        if subject == "bad":
+            raise ConnectionError("down")
+
+    d = AlertDispatcher({"desk": CallableChannel(flaky)}, workers=1, coalesce_secs=0,
+                        per_minute=60, max_retries=2, backoff=1, sleep=sleeps.append)
+    d.submit("desk", "bad")
+    d.submit("desk", "good")
+    assert d.flush(10)
+    assert d.stats["failed"] == 1 and d.stats["sent"] == 1 and "down" in d.errors[0][1]
+    assert d.stats["retries"] == 2 and 1 in sleeps and 2 in sleeps   # exponential backoff
+    assert len(calls) == 4 and any(0 < s < 1 for s in sleeps)        # throttled to 1/s
+    assert d.submit("missing", "x") is False
+    d.close(10)
+    assert d.submit("desk", "late") is False
+
+    blocker = threading.Event()
+    slow = AlertDispatcher({"desk": CallableChannel(lambda s, b: blocker.wait(5))},
+                           workers=1, coalesce_secs=0, per_minute=0, max_queue=1)
+    results = [slow.submit("desk", f"a{i}", key=i) for i in range(50)]
+    assert not all(results) and slow.stats["dropped"] == results.count(False)
+    blocker.set()
+    slow.close(10)
+    assert slow.stats["sent"] + slow.stats["dropped"] == 50
@@ -0,0 +1,74 @@
+# test_alert_journal.py
+
+import datetime
+import json
+import threading
+
+from alert_journal import AlertJournal
+
+
+def record(symbol, cfg, dd, ts):
+    return {"timestamp": ts.isoformat(), "symbol": symbol, "config": cfg, "drawdown": dd}
+
+
+def test_append_and_query_helpers(tmp_path):
+    j = AlertJournal(str(tmp_path / "alerts.db"))
+    t0 = datetime.datetime(2024, 6, 1, 12, 0)
+    for i in range(6):
+        j.append(record("BTC" if i % 2 else "NAS", i % 3, -5.0 - i, t0 + datetime.timedelta(hours=i)))
+
+    recent = j.recent(limit=2)
+    assert [r["drawdown"] for r in recent] == [-10.0, -9.0] and recent[0]["config"] == 2
+    assert [r["drawdown"] for r in j.query(symbol="BTC", config=1)] == [-6.0]
+    assert len(j.query(since="2024-06-01 14:00", until="2024-06-01 16:00")) == 2
+    assert j.last_alert("NAS")["drawdown"] == -9.0
+    summary = {(s["symbol"], s["config"]): s for s in j.summary()}
+    assert summary[("BTC", "2")]["worst"] == -10.0 and summary[("NAS", "0")]["alerts"] == 1
+    assert list(j.frame(symbol="NAS")["timestamp"].dt.hour) == [16, 14, 12]
+
+    plan = j.conn.execute("EXPLAIN QUERY PLAN SELECT data FROM alerts WHERE symbol=? AND config=? "
+                          "AND timestamp>=?", ("BTC", "1", "2024")).fetchall()
+    assert "alerts_symbol_config_ts" in str(plan)
+
+
+def test_legacy_json_is_imported_once(tmp_path):
+    legacy = tmp_path / "alert_history.json"
+    t0 = datetime.datetime(2024, 6, 1)
+    legacy.write_text(json.dumps([record("NAS", 1, -6.0, t0), record("NAS", 1, -7.5, t0)]))
+    j = AlertJournal(str(tmp_path / "alerts.db"), legacy_json=str(legacy))
+    assert j.count() == 2 and not legacy.exists()
+
+    # Another process still holding the old file does not import it twice
+    (tmp_path / "alert_history.json").write_text((tmp_path / "alert_history.json.migrated").read_text())
+    j2 = AlertJournal(str(tmp_path / "alerts.db"), legacy_json=str(legacy))
+    assert j2.count() == 2
+
+
+def test_concurrent_writers_do_not_lose_alerts(tmp_path):
+    path = str(tmp_path / "alerts.db")
+    journals = [AlertJournal(path), AlertJournal(path)]
+    now = datetime.datetime.now()
+
+    def writer(n):
+        j = journals[n % 2]
+        for i in range(100):
+            j.append(record(f"S{n}", i, -5.0, now))
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert journals[0].count() == 400 and len(journals[1].query(symbol="S3")) == 100
+
+
+def test_retention_prunes_and_compacts(tmp_path):
+    j = AlertJournal(str(tmp_path / "alerts.db"), retention_days=30, check_every=5, compact_min_deleted=3)
+    now = datetime.datetime.now()
+    for i in range(4):
+        j.append(record("OLD", 1, -6.0, now - datetime.timedelta(days=60 + i)))
+    assert j.count() == 4
+    j.append(record("NEW", 1, -6.0, now))       # fifth append triggers retention
+    assert [r["symbol"] for r in j.query()] == ["NEW"]
+    assert j._meta("deleted_since_compact") == "0"   # compacted after 4 deletions
+    assert j.prune(older_than_days=0) == 1 and j.count() == 0
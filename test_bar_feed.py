@@ -0,0 +1,101 @@
+# test_bar_feed.py
+
+import asyncio
+import time
+
+import numpy as np
+import pandas as pd
+
+from bar_feed import BarFeed, run_feeds
+
+
+class FakeSource:
+    """Time-indexed M5 history that grows on demand; records requested sizes."""
+
+    def __init__(self, n=50):
+        self.times = pd.date_range("2024-01-02 09:00", periods=n, freq="5min")
+        self.requests = []
+
+    def add_bar(self):
+        self.times = self.times.append(pd.DatetimeIndex([self.times[-1] + pd.Timedelta("5min")]))
+
+    def __call__(self, symbol, timeframe, bars):
+        self.requests.append(bars)
+        times = self.times[-bars:]
+        close = np.arange(len(self.times), dtype=float)[-bars:]
+        return pd.DataFrame({"Open": close, "High": close + 1, "Low": close - 1, "Close": close},
+                            index=times)
+
+
+def make_feed(tmp_path, source, mode="live", **kw):
+    # Align the bar clock so the newest source bar is "now"
+    offset = (source.times[-1] - pd.Timestamp.now(tz="UTC").tz_localize(None)).total_seconds()
+    return BarFeed("NAS100.a", mode=mode, full_bars=5000, initial_window=20, delay=0,
+                   state_file=str(tmp_path / "state.json"), fetch=source,
+                   clock_offset=offset, **kw)
+
+
+def test_live_poll_requests_only_the_tail(tmp_path):
+    source = FakeSource()
+    feed = make_feed(tmp_path, source)
+    source.add_bar()
+    source.add_bar()
+    feed.clock_offset += 600  # ten minutes later on the bar clock
+    first, second = feed.get_next_bar(), feed.get_next_bar()
+    assert [first.name, second.name] == list(source.times[-2:])
+    # Warm-up plus one small tail request; the second bar came from the queue
+    assert source.requests[0] == 20
+    assert len(source.requests) == 2 and source.requests[1] <= 4
+
+
+def test_tail_without_overlap_widens(tmp_path):
+    source = FakeSource()
+    feed = make_feed(tmp_path, source)
+    for _ in range(5):
+        source.add_bar()
+    feed.clock_offset -= 3600  # clock says no bars are due yet
+    assert feed.get_next_bar().name == source.times[-5]
+    assert source.requests[-1] == 5000
+
+
+def test_sleep_is_aligned_and_capped(tmp_path):
+    source = FakeSource()
+    feed = make_feed(tmp_path, source)
+    assert 0 < feed.seconds_until_next_bar() <= 301
+    feed.clock_offset -= 10_000
+    assert feed.seconds_until_next_bar() <= 301
+
+
+def test_replay_feeds_share_one_loop(tmp_path):
+    feeds = [BarFeed(sym, mode="replay", full_bars=50, initial_window=40,
+                     state_file=str(tmp_path / f"{sym}.json"), fetch=FakeSource())
+             for sym in ("NAS100.a", "US30.a")]
+    seen = []
+    asyncio.run(run_feeds(feeds, lambda feed, bar: seen.append(feed.symbol)))
+    assert sorted(seen) == ["NAS100.a"] * 10 + ["US30.a"] * 10
+    # Interleaved rather than one symbol draining first
+    assert seen[:2] == ["NAS100.a", "US30.a"]
+
+
+def test_slow_poll_does_not_stall_other_feeds(tmp_path):
+    sources = {"slow": FakeSource(), "fast": FakeSource()}
+    feeds = {}
+    for name, source in sources.items():
+        (tmp_path / name).mkdir()
+        feeds[name] = make_feed(tmp_path / name, source)
+        source.add_bar()
+        feeds[name].clock_offset += 300
+    slow_fetch = feeds["slow"].fetch
+    feeds["slow"].fetch = lambda **kw: time.sleep(0.5) or slow_fetch(**kw)
+
+    async def first_bar_times():
+        t0 = time.monotonic()
+
+        async def first(feed):
+            await feed.__anext__()
+            return time.monotonic() - t0
+
+        return await asyncio.gather(first(feeds["slow"]), first(feeds["fast"]))
+
+    slow_secs, fast_secs = asyncio.run(first_bar_times())
+    assert fast_secs < 0.25 <= slow_secs
@@ -0,0 +1,71 @@
+# test_bar_store.py
+
+import os
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from bar_store import SCHEMA, BarStore, load_bars, normalize_bars, parse_symbol_timeframe
+
+
+def mt5_like_frame(start="2023-12-31 22:00", n=60):
+    times = pd.date_range(start, periods=n, freq="5min")
+    return pd.DataFrame({
+        "time": (times - pd.Timestamp(0)) // pd.Timedelta("1s"),
+        "open": 1.0, "high": 2.0, "low": 0.5, "close": range(n), "tick_volume": 10,
+    })
+
+
+def test_normalize_mt5_columns():
+    df = normalize_bars(mt5_like_frame())
+    assert list(df.columns) == SCHEMA
+    assert df["Time"].iloc[0] == pd.Timestamp("2023-12-31 22:00")
+    assert df["Volume"].iloc[0] == 10.0
+
+
+def test_parse_symbol_timeframe():
+    assert parse_symbol_timeframe("data/NAS100_5m.csv") == ("NAS100", "M5")
+    assert parse_symbol_timeframe("EURUSD.a_m5.csv") == ("EURUSD.a", "M5")
+    assert parse_symbol_timeframe("BTCUSD.csv", "H1") == ("BTCUSD", "H1")
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "feather"])
+def test_write_merge_and_range_read(tmp_path, fmt):
+    store = BarStore(root=str(tmp_path), fmt=fmt)
+    store.write("NAS100", "M5", mt5_like_frame())
+    # Overlapping update replaces existing rows and extends the tail
+    store.write("NAS100", "M5", mt5_like_frame(start="2024-01-01 02:00", n=20))
+
+    full = store.read("NAS100", "M5")
+    assert full["Time"].is_unique and full["Time"].is_monotonic_increasing
+    assert len(full) == 60 + 20 - 12
+    assert sorted(os.listdir(tmp_path / "NAS100" / "M5")) == [f"2023.{fmt}", f"2024.{fmt}"]
+
+    window = store.read("NAS100", "M5", start="2024-01-01 00:00", end="2024-01-01 01:00")
+    assert len(window) == 12
+    assert store.last_time("NAS100", "M5") == full["Time"].iloc[-1]
+
+
+def test_load_bars_reuses_cache_until_csv_changes(tmp_path):
+    csv = tmp_path / "X_m5.csv"
+    mt5_like_frame().to_csv(csv, index=False)
+    first = load_bars(str(csv), root=str(tmp_path / "store"))
+    assert load_bars(str(csv), root=str(tmp_path / "store")).equals(first)
+
+    mt5_like_frame(n=10).to_csv(csv, index=False)
+    assert len(load_bars(str(csv), root=str(tmp_path / "store"))) == 10
+
+
+def test_mmap_roundtrip_is_read_only(tmp_path):
+    import numpy as np
+    from bar_store import open_mmap, write_mmap
+
+    write_mmap(str(tmp_path), mt5_like_frame())
+    bars = open_mmap(str(tmp_path))
+    expected = normalize_bars(mt5_like_frame())
+    assert isinstance(bars["Close"], np.memmap)
+    assert not bars["Close"].flags.writeable
+    assert np.array_equal(bars["Time"], expected["Time"].to_numpy())
+    assert np.array_equal(bars["Close"], expected["Close"].to_numpy())
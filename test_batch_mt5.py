@@ -0,0 +1,100 @@
+# test_batch_mt5.py
+
+import importlib
+import json
+import sys
+
+import pytest
+
+pytest.importorskip("pyarrow")
+pytest.importorskip("slack_sdk")
+
+import sim_mt5
+from bar_store import BarStore
+from order_executor import action_intent, client_order_id
+from session_pnl import session_of
+from test_streaming_strategy import make_bars
+
+
+@pytest.fixture
+def batch(tmp_path, monkeypatch):
+    root = str(tmp_path / "store")
+    BarStore(root=root).write("NAS100", "M5", make_bars(1500, seed=3))
+    sim_mt5.configure(store_root=root, point=0.1, spread_points=2)
+    monkeypatch.setitem(sys.modules, "MetaTrader5", sim_mt5)
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "best_params.json").write_text(json.dumps({
+        "symbol": "NAS100.a", "take_profit_pips": 10, "atr_stop_multiplier": 1.5,
+        "pip_factors": {"NAS100.a": 1.0}, "bars": 300, "daily_max_loss": -1e9}))
+    monkeypatch.delitem(sys.modules, "batch_mt5", raising=False)
+    return importlib.import_module("batch_mt5")
+
+
+def test_incremental_run_places_and_closes_orders(batch):
+    times = make_bars(1500, seed=3)["Time"]
+    t = sim_mt5.terminal()
+    t.set_time(times[300])
+    batch.run_incremental()                   # warm-up run
+    for _ in range(1000):                     # one scheduled run per new bar
+        t.advance_bars("NAS100.a")
+        batch.run_incremental()
+
+    engine = batch.StreamingStrategy.from_snapshot(json.load(open(batch.STATE_FILE))["engine"])
+    trades = list(batch.pd.read_csv(batch.LIVE_LOG_FILE).itertuples())
+    opened = [client_order_id("NAS100.a", tr.side, tr.entry_time) for tr in trades]
+    if engine.position:
+        opened.append(client_order_id("NAS100.a", engine.position["side"], engine.position["entry_time"]))
+    assert len(trades) >= 3
+
+    deals = sim_mt5.history_deals_get(0, 2**40)
+    entries = [d.comment for d in deals if d.entry == sim_mt5.DEAL_ENTRY_IN]
+    assert entries == opened                  # every engine entry opened exactly one position
+    live = [p.comment for p in sim_mt5.positions_get()]
+    assert live == opened[len(trades):]       # and everything the engine closed is flat
+
+    # Losing the state file and replaying the same bars sends nothing new
+    store = batch.StateStore(batch.STATE_FILE)
+    store.replace({})
+    store.close()
+    t.set_time(times[300])
+    batch.run_incremental()
+    t.set_time(times[1300])
+    batch.run_incremental()
+    assert len(sim_mt5.history_deals_get(0, 2**40)) == len(deals)
+
+    # A close the broker has not filled yet is sent as a closing order
+    action = {"action": "open", "side": "long", "entry_time": "late", "sl": None, "tp": None}
+    executor = batch.OrderExecutor(sim_mt5)
+    executor.submit(action_intent("NAS100.a", action))
+    executor.submit(action_intent("NAS100.a", {**action, "action": "close"}))
+    executor.close()
+    assert [r["status"] for r in executor.results.values()] == ["filled", "filled"]
+    assert [p.comment for p in sim_mt5.positions_get()] == live
+
+
+def test_breached_session_sends_no_orders(batch, monkeypatch, capsys):
+    times = make_bars(1500, seed=3)["Time"]
+    alerts = []
+    monkeypatch.setattr(batch, "DAILY_MAX_LOSS", -50.0)
+    monkeypatch.setattr(batch, "slack_alert", alerts.append)
+    monkeypatch.setattr(batch, "email_alert", lambda subject, msg: None)
+    t = sim_mt5.terminal()
+    t.set_time(times[300])
+    batch.run_incremental()
+    store = batch.StateStore(batch.STATE_FILE)
+    store.update(pnl={**batch.SessionPnL().to_dict(), "session": session_of(times[301]), "today": -80.0})
+    store.close()
+
+    t.advance_bars("NAS100.a", 200)             # same session
+    with pytest.raises(SystemExit):
+        batch.run_incremental()
+    assert "(halted, not sent)" in capsys.readouterr().out
+    assert sim_mt5.history_deals_get(0, 2**40) == () and len(alerts) == 1
+    state = json.load(open(batch.STATE_FILE))
+    assert state["last_ts"] == times[499].isoformat() and state["pnl"]["today"] <= -80.0
+
+
+def test_first_run_without_closed_bars(batch):
+    sim_mt5.terminal().set_time(make_bars(1500, seed=3)["Time"][0])
+    batch.run_incremental()                   # only the forming bar: nothing to warm up on
+    assert batch.StateStore(batch.STATE_FILE).state.get("engine") is None
@@ -0,0 +1,139 @@
+# test_candle_cache.py
+
+import numpy as np
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from candle_cache import CandleCache, RATES_DTYPE
+
+
+class FakeMT5:
+    """Minimal terminal: a growing bar history with call accounting."""
+
+    TIMEFRAME_M5 = 5
+    TIMEFRAME_H1 = 16385
+
+    def __init__(self, n=1000):
+        self.rates = np.empty(0, dtype=RATES_DTYPE)
+        self.calls = []
+        self.bars_served = 0
+        self.add_bars(n)
+
+    def add_bars(self, n):
+        start = int(self.rates["time"][-1]) + 300 if len(self.rates) else 1_700_000_000
+        new = np.zeros(n, dtype=RATES_DTYPE)
+        new["time"] = start + 300 * np.arange(n)
+        close = 15000 + np.cumsum(np.random.default_rng(len(self.rates)).normal(0, 5, n))
+        new["open"], new["close"] = close - 1, close
+        new["high"], new["low"] = close + 3, close - 3
+        new["tick_volume"] = 100
+        self.rates = np.concatenate([self.rates, new])
+
+    def copy_rates_from_pos(self, symbol, timeframe, start_pos, count):
+        self.calls.append(("from_pos", start_pos, count))
+        rates = self.rates
+        n = len(rates)
+        out = rates[max(0, n - start_pos - count):max(0, n - start_pos)].copy()
+        self.bars_served += len(out)
+        return out if len(out) else None
+
+    def copy_rates_range(self, symbol, timeframe, date_from, date_to):
+        self.calls.append(("range", date_from, date_to))
+        rates = self.rates
+        t = rates["time"]
+        out = rates[(t >= date_from.timestamp()) & (t <= date_to.timestamp())].copy()
+        self.bars_served += len(out)
+        return out
+
+
+@pytest.fixture
+def root(tmp_path):
+    return str(tmp_path / "store")
+
+
+def test_first_fetch_matches_terminal_and_persists(root):
+    mt5 = FakeMT5(1000)
+    rates = CandleCache(mt5, root=root).copy_rates_from_pos("NAS100.a", mt5.TIMEFRAME_M5, 0, 800)
+    assert np.array_equal(rates, mt5.copy_rates_from_pos("NAS100.a", mt5.TIMEFRAME_M5, 0, 800))
+
+    # A fresh process only asks for the tail
+    mt5.calls.clear()
+    mt5.bars_served = 0
+    again = CandleCache(mt5, root=root).copy_rates_from_pos("NAS100.a", mt5.TIMEFRAME_M5, 0, 800)
+    assert np.array_equal(again, rates)
+    assert [c[0] for c in mt5.calls] == ["range"]
+    assert mt5.bars_served == 1
+
+
+def test_new_bars_fetch_only_the_tail(root):
+    mt5 = FakeMT5(1000)
+    cache = CandleCache(mt5, root=root, refresh_secs=0)
+    cache.copy_rates_from_pos("NAS100.a", mt5.TIMEFRAME_M5, 0, 500)
+    mt5.add_bars(7)
+    mt5.bars_served = 0
+    rates = cache.copy_rates_from_pos("NAS100.a", mt5.TIMEFRAME_M5, 0, 500)
+    assert mt5.bars_served == 8  # last cached bar is re-read, plus 7 new
+    assert np.array_equal(rates, mt5.copy_rates_from_pos("NAS100.a", mt5.TIMEFRAME_M5, 0, 500))
+
+
+def test_tail_refreshes_are_written_in_batches(root):
+    mt5 = FakeMT5(1000)
+    cache = CandleCache(mt5, root=root, refresh_secs=0, flush_bars=10, flush_secs=3600)
+    cache.copy_rates_from_pos("NAS100.a", mt5.TIMEFRAME_M5, 0, 500)
+    writes = []
+    write = cache.store.write
+    cache.store.write = lambda *a: writes.append(len(a[2])) or write(*a)
+
+    for _ in range(4):
+        mt5.add_bars(1)
+        cache.copy_rates_from_pos("NAS100.a", mt5.TIMEFRAME_M5, 0, 500)
+    assert writes == []          # 5 unsaved bars, below flush_bars
+    for _ in range(5):
+        mt5.add_bars(1)
+        cache.copy_rates_from_pos("NAS100.a", mt5.TIMEFRAME_M5, 0, 500)
+    assert writes == [10]        # flushed once, deltas only
+    mt5.add_bars(2)
+    cache.copy_rates_from_pos("NAS100.a", mt5.TIMEFRAME_M5, 0, 500)
+    cache.close()
+    assert writes == [10, 3]
+
+    fresh = CandleCache(mt5, root=root)
+    mt5.bars_served = 0
+    rates = fresh.copy_rates_from_pos("NAS100.a", mt5.TIMEFRAME_M5, 0, 500)
+    assert mt5.bars_served == 1 and np.array_equal(rates, mt5.rates[-500:])
+
+
+def test_overlapping_windows_served_from_cache(root):
+    mt5 = FakeMT5(3000)
+    cache = CandleCache(mt5, root=root, refresh_secs=60)
+    for start in range(0, 2000, 250):
+        got = cache.copy_rates_from_pos("NAS100.a", mt5.TIMEFRAME_M5, start, 500)
+        assert np.array_equal(got, mt5.rates[len(mt5.rates) - start - 500:len(mt5.rates) - start])
+    # Windows walk back through history: each backfill only fetches the missing span
+    fetched = [c for c in mt5.calls if c[0] == "from_pos" and c[1] > 0]
+    assert sum(c[2] for c in fetched) == 2250 - 500 + len(fetched)
+
+
+def test_history_exhausted_returns_short(root):
+    mt5 = FakeMT5(300)
+    cache = CandleCache(mt5, root=root)
+    assert len(cache.copy_rates_from_pos("NAS100.a", mt5.TIMEFRAME_M5, 0, 500)) == 300
+    assert cache.copy_rates_from_pos("NAS100.a", mt5.TIMEFRAME_M5, 400, 100) is None
+    assert len([c for c in mt5.calls if c[0] == "from_pos"]) == 1
+
+
+def test_timeframes_are_kept_apart(root):
+    mt5 = FakeMT5(200)
+    cache = CandleCache(mt5, root=root)
+    cache.copy_rates_from_pos("NAS100.a", mt5.TIMEFRAME_M5, 0, 100)
+    assert cache.store.timeframes("NAS100.a") == ["M5"]
+    cache.copy_rates_from_pos("NAS100.a", mt5.TIMEFRAME_H1, 0, 50)
+    assert sorted(cache.store.timeframes("NAS100.a")) == ["H1", "M5"]
+
+
+def test_disabled_passes_through(root):
+    mt5 = FakeMT5(100)
+    cache = CandleCache(mt5, root=root, enabled=False)
+    cache.copy_rates_from_pos("NAS100.a", mt5.TIMEFRAME_M5, 0, 50)
+    assert mt5.calls == [("from_pos", 0, 50)]
@@ -0,0 +1,87 @@
+# test_ig_bulk_download.py
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("pyarrow")
+
+from bar_store import BarStore
+from ig_bulk_download import DownloadJob, bulk_download
+from test_ig_data_fetcher import MockIG, bars, client_for  # noqa: F401  (fixture)
+
+JOBS = [
+    DownloadJob("IX.D.NASDAQ.CASH.IP", "MINUTE_5", "2024-01-02 09:00", "2024-01-10 09:00", "NAS100"),
+    DownloadJob("IX.D.DOW.DAILY.IP", "MINUTE_5", "2024-01-03 00:00", "2024-01-08 00:00", "US30"),
+    DownloadJob("IX.D.NASDAQ.CASH.IP", "HOUR", "2024-01-02 00:00", "2024-01-09 00:00", "NAS100"),
+]
+
+
+def test_jobs_land_in_store_and_rerun_is_a_noop(bars, tmp_path):
+    mock = MockIG(bars)
+    client = client_for(mock)
+    store = BarStore(str(tmp_path))
+    report = bulk_download(client, JOBS, store=store, concurrency=3, chunk_bars=300, progress_secs=0.05)
+
+    assert not report["failed"] and not report["pending"]
+    nas = store.read("NAS100", "M5")
+    assert len(nas) == 2304 and nas["Time"].is_monotonic_increasing
+    assert len(store.read("US30", "M5")) == 1440
+    # MockIG ignores epic/resolution, so the H1 job stores its 5-minute rows
+    assert report["total_bars"] == 2304 + 1440 + len(store.read("NAS100", "H1"))
+    assert report["bars_per_sec"] > 0
+
+    calls = len(mock.price_calls)
+    again = bulk_download(client, JOBS, store=store, concurrency=3, chunk_bars=300)
+    assert again["total_bars"] == 0 and len(mock.price_calls) == calls
+    mock.server.shutdown()
+
+
+def test_partial_failure_resumes_from_last_chunk(bars, tmp_path, monkeypatch):
+    mock = MockIG(bars)
+    client = client_for(mock)
+    store = BarStore(str(tmp_path))
+    job = JOBS[0]
+    real = client._fetch_pages
+    calls = []
+
+    def flaky(epic, params, side):
+        calls.append(params["from"])
+        if len(calls) == 4:
+            raise ConnectionError("connection reset")
+        return real(epic, params, side)
+
+    monkeypatch.setattr(client, "_fetch_pages", flaky)
+    first = bulk_download(client, [job], store=store, chunk_bars=300)
+    assert list(first["failed"]) and len(store.read("NAS100", "M5")) == 900
+
+    second = bulk_download(client, [job], store=store, chunk_bars=300)
+    assert not second["failed"] and second["total_bars"] == 2304 - 900
+    # The three stored chunks were not requested again
+    assert calls[4] == calls[3] == (pd.Timestamp(job.start) + pd.Timedelta("5min") * 900).strftime("%Y-%m-%dT%H:%M:%S")
+    assert len(store.read("NAS100", "M5")) == 2304
+    mock.server.shutdown()
+
+
+def test_open_ended_top_up_never_stores_the_forming_bar(bars, tmp_path):
+    mock = MockIG(bars)
+    client = client_for(mock)
+    store = BarStore(str(tmp_path))
+    job = DownloadJob("IX.D.NASDAQ.CASH.IP", "MINUTE_5", "2024-01-02 09:00", None, "NAS100")
+    forming = pd.Timestamp("2024-01-02 12:00")
+    final = next(b for b in bars if b["snapshotTimeUTC"] == forming.isoformat())
+    mock.bars = [b for b in bars if pd.Timestamp(b["snapshotTimeUTC"]) < forming]
+    mock.bars.append({**final, "closePrice": {"bid": 1.0, "ask": 2.0, "lastTraded": None}})
+
+    # now = 12:02:30, in the middle of the 12:00 bar
+    bulk_download(client, [job], store=store, chunk_bars=300,
+                  clock=lambda: pd.Timestamp("2024-01-02 12:02:30"))
+    assert store.read("NAS100", "M5")["Time"].iloc[-1] == forming - pd.Timedelta("5min")
+
+    mock.bars = bars                                     # the 12:00 bar has closed
+    bulk_download(client, [job], store=store, chunk_bars=300,
+                  clock=lambda: pd.Timestamp("2024-01-02 12:07:00"))
+    nas = store.read("NAS100", "M5").set_index("Time")
+    assert nas.index[-1] == forming and nas.loc[forming, "Close"] == final["closePrice"]["bid"]
+    assert len(nas) == 37
+    mock.server.shutdown()
@@ -0,0 +1,140 @@
+# test_ig_data_fetcher.py
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("requests")
+
+from ig_data_fetcher import IGAllowanceExceeded, IGClient, RateLimiter, parse_prices
+
+
+def ig_bar(ts, price, volume=10):
+    """One entry shaped like IG's v3 /prices response."""
+    side = lambda p: {"bid": p, "ask": p + 1.0, "lastTraded": None}
+    return {
+        "snapshotTime": ts.strftime("%Y/%m/%d %H:%M:%S"),
+        "snapshotTimeUTC": ts.strftime("%Y-%m-%dT%H:%M:%S"),
+        "openPrice": side(price), "highPrice": side(price + 2), "lowPrice": side(price - 2),
+        "closePrice": side(price + 0.5), "lastTradedVolume": volume,
+    }
+
+
+class MockIG:
+    """Replays IG responses: sessions, paged prices, token expiry, allowance."""
+
+    def __init__(self, bars, allowance=10_000, expire_after=None):
+        self.bars = bars
+        self.allowance = allowance
+        self.expire_after = expire_after
+        self.token = 0
+        self.price_calls = []
+        self.sessions = 0
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body, headers=()):
+                raw = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                for k, v in headers:
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers["Content-Length"]))
+                mock.sessions += 1
+                mock.token += 1
+                self._send(200, {"currentAccountId": "ABC"},
+                           [("CST", f"cst-{mock.token}"), ("X-SECURITY-TOKEN", f"xst-{mock.token}")])
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                q = {k: v[0] for k, v in parse_qs(url.query).items()}
+                if self.headers.get("CST") != f"cst-{mock.token}":
+                    return self._send(401, {"errorCode": "error.security.client-token-invalid"})
+                mock.price_calls.append(q)
+                if mock.expire_after and len(mock.price_calls) % mock.expire_after == 0:
+                    mock.token += 1  # server-side expiry of the current session
+                lo, hi = pd.Timestamp(q["from"]), pd.Timestamp(q["to"])
+                rows = [b for b in mock.bars if lo <= pd.Timestamp(b["snapshotTimeUTC"]) <= hi]
+                size, page = int(q["pageSize"]), int(q["pageNumber"])
+                total = max(1, -(-len(rows) // size))
+                rows = rows[(page - 1) * size:page * size]
+                mock.allowance -= len(rows)
+                self._send(200, {"prices": rows, "instrumentType": "INDICES", "metadata": {
+                    "allowance": {"remainingAllowance": mock.allowance, "totalAllowance": 10_000,
+                                  "allowanceExpiry": 500_000},
+                    "size": len(rows),
+                    "pageData": {"pageSize": size, "pageNumber": page, "totalPages": total}}})
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+
+@pytest.fixture
+def bars():
+    times = pd.date_range("2024-01-02 09:00", periods=3000, freq="5min")
+    return [ig_bar(t, 15000 + i) for i, t in enumerate(times)]
+
+
+def client_for(mock):
+    return IGClient("key", "user", "pw", base_url=mock.url, requests_per_minute=1000)
+
+
+def test_fetch_range_pages_and_chunks(bars, monkeypatch):
+    monkeypatch.setattr("ig_data_fetcher.PAGE_SIZE", 400)
+    mock = MockIG(bars)
+    df = client_for(mock).fetch_range("IX.D.NASDAQ.CASH.IP", "MINUTE_5",
+                                      "2024-01-02 09:00", "2024-01-12 11:00", chunk_bars=1000)
+    assert len(df) == 2904 and df.index.is_monotonic_increasing
+    assert df["Open"].iloc[0] == 15000 and df["Close"].iloc[-1] == 15000 + 2903 + 0.5
+    # 3 date chunks, each spanning 3 pages of 400
+    assert len(mock.price_calls) == 9 and {c["pageNumber"] for c in mock.price_calls} == {"1", "2", "3"}
+    mock.server.shutdown()
+
+
+def test_expired_token_reauthenticates(bars):
+    mock = MockIG(bars, expire_after=2)
+    client = client_for(mock)
+    df = client.fetch_range("EPIC", "MINUTE_5", "2024-01-02 09:00", "2024-01-04 09:00", chunk_bars=100)
+    assert len(df) == 576 and client.reauths >= 2 and mock.sessions == client.reauths + 1
+    mock.server.shutdown()
+
+
+def test_allowance_is_respected(bars):
+    mock = MockIG(bars, allowance=250)
+    client = client_for(mock)
+    with pytest.raises(IGAllowanceExceeded):
+        client.fetch_range("EPIC", "MINUTE_5", "2024-01-02 09:00", "2024-01-05 09:00", chunk_bars=200)
+    assert client.allowance["remainingAllowance"] == 50 and len(mock.price_calls) == 1
+    mock.server.shutdown()
+
+
+def test_parse_prices_sides_and_legacy_timestamps(bars):
+    legacy = [{k: v for k, v in b.items() if k != "snapshotTimeUTC"} for b in bars[:3]]
+    df = parse_prices(legacy, side="mid")
+    assert df.index[0] == pd.Timestamp("2024-01-02 09:00") and df["Open"].iloc[0] == 15000.5
+    assert parse_prices([]).empty
+
+
+def test_rate_limiter_waits_for_the_window():
+    now = [0.0]
+    slept = []
+    limiter = RateLimiter(3, clock=lambda: now[0], sleep=lambda s: (slept.append(s), now.__setitem__(0, now[0] + s)))
+    for _ in range(4):
+        limiter.wait()
+        now[0] += 1
+    assert slept == [57.0]
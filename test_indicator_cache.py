@@ -0,0 +1,31 @@
+# test_indicator_cache.py
+
+from itertools import product
+
+import numpy as np
+
+from indicator_cache import IndicatorCache
+from test_streaming_strategy import make_bars
+from vectorized_backtest import compute_indicators
+
+
+def test_grid_computes_each_indicator_once():
+    df = make_bars(2000)
+    cache = IndicatorCache()
+    for _tp, atr_period in product([10, 20, 30, 40], [10, 14]):
+        compute_indicators(df, atr_period, cache=cache)
+    # sma + stochastic + two ATR periods
+    assert cache.misses == 4
+    assert cache.hits == 8 * 3 - 4
+
+
+def test_lru_eviction_respects_budget():
+    cache = IndicatorCache(max_bytes=3 * 800)
+    for i in range(5):
+        cache.get_or_compute("fp", "x", (i,), lambda: np.zeros(100))
+    assert cache.stats()["entries"] == 3
+    assert cache.evictions == 2
+    cache.get_or_compute("fp", "x", (4,), lambda: np.ones(100))
+    assert cache.hits == 1
+    value = cache.get_or_compute("fp", "x", (4,), lambda: None)
+    assert not value.flags.writeable
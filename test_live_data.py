@@ -0,0 +1,82 @@
+# test_live_data.py
+
+import importlib
+import sys
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+import sim_mt5
+from bar_store import BarStore
+from test_streaming_strategy import make_bars
+
+
+@pytest.fixture
+def live_data(tmp_path, monkeypatch):
+    root = str(tmp_path / "store")
+    BarStore(root=root).write("NAS100", "M5", make_bars(200, seed=4))
+    sim_mt5.configure(store_root=root)
+    monkeypatch.setitem(sys.modules, "MetaTrader5", sim_mt5)
+    return importlib.reload(importlib.import_module("live_data"))
+
+
+def round_trip(symbol="NAS100.a", magic=1):
+    t = sim_mt5.symbol_info_tick(symbol)
+    opened = sim_mt5.order_send({"action": 1, "symbol": symbol, "volume": 1.0, "type": 0,
+                                 "price": t.ask, "magic": magic})
+    sim_mt5.order_send({"action": 1, "symbol": symbol, "volume": 1.0, "type": 1,
+                        "price": t.bid, "position": opened.order})
+
+
+def test_tracker_fetches_only_new_deals(live_data, monkeypatch):
+    tracker = live_data.DealsTracker("NAS100*")
+    round_trip(magic=1)
+    assert tracker.poll() == 2
+
+    calls = []
+    real = sim_mt5.history_deals_get
+    monkeypatch.setattr(sim_mt5, "history_deals_get",
+                        lambda *a, **k: calls.append(a) or real(*a, **k))
+    assert tracker.poll() == 0
+    round_trip(magic=2)
+    assert tracker.poll() == 2
+    assert len(calls) == 2 and calls[-1][0] > tracker.day
+
+    s = tracker.summary()
+    assert (s["deals"], s["closed"], s["losses"]) == (4, 2, 2)
+    assert s["pnl"] == pytest.approx(sum(d.profit for d in real(0, 2**40)))
+    assert set(s["per_magic"]) == {1, 2} and s["per_magic"][1]["closed"] == 1
+
+
+def test_get_live_trades_keeps_its_frame_and_connection(live_data):
+    assert list(live_data.get_live_trades("NAS100.a").columns) == ["P/L"]
+    round_trip()
+    df = live_data.get_live_trades("NAS100.a")
+    assert len(df) == 2 and df.index.name == "time"
+    assert sim_mt5.terminal().connected
+    assert live_data.get_live_summary("NAS100.a")["closed"] == 1
+
+
+def test_closing_one_tracker_does_not_strand_the_others(live_data, monkeypatch, capsys):
+    real = sim_mt5.history_deals_get
+    # Like the real terminal: no history while the connection is down
+    monkeypatch.setattr(sim_mt5, "history_deals_get",
+                        lambda *a, **k: real(*a, **k) if sim_mt5.terminal().connected else None)
+    a, b = live_data.DealsTracker("NAS100*"), live_data.DealsTracker("NAS*")
+    round_trip()
+    assert a.poll() == 2 and b.poll() == 2
+
+    a.close()
+    assert not b.connected
+    round_trip()
+    assert b.poll() == 2 and b.connected
+    assert "reconnecting" not in capsys.readouterr().out
+
+    sim_mt5.shutdown()                                  # dropped behind our back
+    round_trip()
+    assert a.poll() == 4 and "reconnecting" in capsys.readouterr().out
+
+    monkeypatch.setattr(sim_mt5, "history_deals_get", lambda *a, **k: None)
+    assert b.poll() == 0 and "will retry next poll" in capsys.readouterr().out
+    assert not a.connected
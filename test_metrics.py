@@ -0,0 +1,118 @@
+# test_metrics.py
+
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import metrics
+from metrics import (as_matrix, backtest_summary, equity_sharpe, max_drawdown, sharpe,
+                     summarize_equity, trade_stats)
+
+PNL = [10.0, -5.0, 0.0, 20.0, -15.0]
+EQUITY = [100.0, 110.0, 99.0, 121.0, 108.9]
+
+
+def test_trade_stats_golden():
+    s = trade_stats(PNL)
+    assert (s["trades"], s["wins"], s["losses"]) == (5, 2, 3)
+    assert s["total"] == 10.0 and s["win_rate"] == 0.4 and s["avg_return"] == 2.0
+    assert s["avg_win"] == 15.0 and s["avg_loss"] == pytest.approx(-20 / 3)
+    assert s["profit_factor"] == 1.5 and s["expectancy"] == pytest.approx(2.0)
+    empty = trade_stats([])
+    assert empty["trades"] == 0 and empty["win_rate"] == 0.0 and empty["profit_factor"] == math.inf
+
+
+def test_equity_metrics_golden():
+    assert equity_sharpe(EQUITY) == pytest.approx(0.3848412856977259, rel=1e-12)
+    assert max_drawdown(EQUITY) == pytest.approx(12.1)
+    assert max_drawdown(EQUITY, relative=True) == pytest.approx(0.1)
+    s = summarize_equity(EQUITY)
+    assert s["total_return"] == pytest.approx(0.089) and s["final_equity"] == 108.9
+    assert equity_sharpe([100.0]) == 0.0 and equity_sharpe([100.0, 100.0, 100.0]) == 0.0
+
+
+def test_script_conventions_golden():
+    # parameter_sweep_runner: per-trade pnl, population std, sqrt(n)
+    assert sharpe(PNL, ddof=0) == pytest.approx(0.3701166050988026, rel=1e-12)
+    # evaluate_only: pnl / initial equity, sample std + 1e-9, sqrt(252)
+    assert sharpe(np.array(PNL) / 1000, periods=252, eps=1e-9) == pytest.approx(2.350167409681442, rel=1e-9)
+    assert backtest_summary([{"pnl": p} for p in PNL] + [{}], EQUITY) == {
+        "trades": 6, "win_rate": 33.33, "avg_return": 1.6667, "sharpe": 0.38}
+
+
+def test_matches_the_old_inline_code():
+    rng = np.random.default_rng(1)
+    eq = 1000 + np.cumsum(rng.normal(0, 5, 300))
+    r = np.diff(eq) / eq[:-1]
+    assert equity_sharpe(eq) == pytest.approx(r.mean() / r.std(ddof=1) * np.sqrt(len(r)), rel=1e-12)
+    cum = pd.Series(rng.normal(0, 1, 50)).cumsum()
+    assert max_drawdown(cum.to_numpy()) == pytest.approx((cum.cummax() - cum).max())
+
+
+def test_matrix_rows_equal_single_curves():
+    rng = np.random.default_rng(2)
+    curves = [1000 + np.cumsum(rng.normal(0, 5, n)) for n in (1, 2, 40, 300, 301)]
+    curves.append(np.full(30, 1000.0))
+    eq = as_matrix(curves)
+    assert eq.shape == (6, 301) and np.isnan(eq[0, 1:]).all()
+    np.testing.assert_allclose(equity_sharpe(eq), [equity_sharpe(c) for c in curves], rtol=1e-9)
+    np.testing.assert_allclose(max_drawdown(eq, relative=True),
+                               [max_drawdown(c, relative=True) for c in curves])
+    pnl = as_matrix([PNL, [], [-1.0, 2.0]])
+    stats = trade_stats(pnl)
+    np.testing.assert_array_equal(stats["trades"], [5, 0, 2])
+    np.testing.assert_allclose(stats["profit_factor"], [1.5, math.inf, 2.0])
+    summary = summarize_equity(eq)
+    assert summary["final_equity"][3] == curves[3][-1]
+
+
+def test_benchmark_runs(capsys):
+    t_loop, t_vec = metrics.benchmark(curves=200, length=100)
+    assert t_loop > 0 and t_vec > 0 and "2-D" in capsys.readouterr().out
+
+
+def test_grid_metrics_match_per_combo_and_rank():
+    rng = np.random.default_rng(3)
+    pnls = [rng.normal(0.5, 10, n) for n in (0, 1, 5, 80, 120)]
+    pnls.append(np.full(4, 2.0))  # never loses: infinite profit factor, no drawdown
+    pnl, lengths = metrics.padded(pnls)
+    assert lengths.tolist() == [0, 1, 5, 80, 120, 4] and pnl.shape == (6, 120)
+
+    m = metrics.grid_metrics(pnl, initial_equity=1000.0)
+    for i, p in enumerate(pnls):
+        eq = np.concatenate([[1000.0], 1000.0 + np.cumsum(p)])
+        r = metrics.returns_from_equity(eq)
+        assert m["trades"][i] == len(p)
+        assert m["expectancy"][i] == pytest.approx(trade_stats(p)["expectancy"])
+        assert m["sharpe"][i] == pytest.approx(sharpe(r))
+        assert m["sortino"][i] == pytest.approx(metrics.sortino(r))
+        assert m["max_drawdown_pct"][i] == pytest.approx(max_drawdown(eq, relative=True))
+        assert m["calmar"][i] == pytest.approx(metrics.calmar(eq))
+    assert m["profit_factor"][5] == math.inf and m["calmar"][5] == 0.0 and m["sortino"][5] == 0.0
+
+    order = metrics.rank_grid(m, by=("expectancy", "profit_factor"))
+    ranked = m["expectancy"][order]
+    assert (np.diff(ranked) <= 0).all() and sorted(order) == list(range(6))
+    assert metrics.rank_grid({"x": [2.0, np.nan, 1.0]}, by=("x",)).tolist() == [0, 2, 1]
+
+
+def test_sortino_and_calmar_golden():
+    r = metrics.returns_from_equity(EQUITY)
+    # downside: two -0.1 returns over four samples
+    assert metrics.sortino(r) == pytest.approx(r.mean() / np.sqrt(0.02 / 4) * 2)
+    assert metrics.calmar(EQUITY) == pytest.approx(0.089 / 0.1)
+
+
+def test_backtest_rows_match_backtest_summary():
+    rng = np.random.default_rng(4)
+    runs = [[{"pnl": v} for v in rng.normal(0, 5, n)] for n in (0, 3, 30)]
+    curves = [1000 + np.cumsum(rng.normal(0, 5, n)) for n in (1, 50, 200)]
+    rows = metrics.backtest_rows(as_matrix([metrics.pnl_array(t) for t in runs]), as_matrix(curves))
+    assert rows == [backtest_summary(t, c) for t, c in zip(runs, curves)]
+
+
+def test_grid_benchmark_runs(capsys):
+    metrics.benchmark_grid(combos=25, trades=50)
+    assert "grid" in capsys.readouterr().out
@@ -0,0 +1,134 @@
+# test_monitor_drawdown.py
+
+import ctypes
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from alert_dispatcher import AlertDispatcher, CallableChannel
+import monitor_drawdown
+from monitor_drawdown import DrawdownMonitor, EquityTail, compute_max_drawdown, send_desktop_alert
+
+
+def write_rows(path, balances, header=True, mode="a"):
+    with open(path, mode) as f:
+        if header:
+            f.write("time,balance\n")
+        for i, b in enumerate(balances):
+            f.write(f"2024-01-01 00:{i % 60:02d},{b}\n")
+
+
+def test_tail_matches_full_recompute_across_appends(tmp_path):
+    path = tmp_path / "X_equity_1.csv"
+    rng = np.random.default_rng(0)
+    balances = 1000 + np.cumsum(rng.normal(0, 5, 3000))
+    tail = EquityTail(str(path))
+    assert tail.poll() == 0
+
+    write_rows(path, balances[:1000], mode="w")
+    assert tail.poll() == 1000
+    for lo in range(1000, 3000, 500):
+        write_rows(path, balances[lo:lo + 500], header=False)
+        assert tail.poll() == 500
+        full = compute_max_drawdown(pd.read_csv(path), "balance")
+        assert tail.max_dd == pytest.approx(full) and tail.rows == lo + 500
+    assert tail.poll() == 0 and tail.resets == 0
+
+
+def test_partial_line_waits_and_rewrite_restarts(tmp_path):
+    path = tmp_path / "X_equity_1.csv"
+    write_rows(path, [100, 120, 90], mode="w")
+    tail = EquityTail(str(path))
+    tail.poll()
+    assert tail.max_dd == pytest.approx(-25.0)
+
+    with open(path, "a") as f:
+        f.write("2024-01-01 01:00,6")          # writer is mid-row
+    assert tail.poll() == 0
+    with open(path, "a") as f:
+        f.write("0\n")
+    assert tail.poll() == 1 and tail.max_dd == pytest.approx(-50.0)
+
+    # Same size or larger but different history: detected by the tail check
+    write_rows(path, [100, 101, 102, 103, 104], mode="w")
+    tail.poll()
+    assert tail.resets == 1 and tail.max_dd == 0.0 and tail.rows == 5
+
+
+def test_monitor_alerts_once_with_stat_fallback(tmp_path):
+    alerts = []
+    monitor = DrawdownMonitor(["SYM"], [1, 2], threshold=5.0, results_dir=str(tmp_path),
+                              on_alert=lambda *a: alerts.append(a), use_watchdog=False)
+    assert monitor.poll() == []
+    write_rows(tmp_path / "SYM_equity_1.csv", [100, 98], mode="w")
+    write_rows(tmp_path / "SYM_equity_2.csv", [100, 110], mode="w")
+    monitor.poll()
+    assert alerts == []
+    write_rows(tmp_path / "SYM_equity_1.csv", [90, 80], header=False)
+    assert monitor.poll() == [("SYM", 1, pytest.approx(-20.0))]
+    write_rows(tmp_path / "SYM_equity_1.csv", [70], header=False)
+    monitor.poll()
+    assert len(alerts) == 1
+
+
+def test_alert_quotes_the_monitors_own_threshold(tmp_path, monkeypatch):
+    sent = []
+    d = AlertDispatcher({"slack": CallableChannel(lambda s, b: sent.append(b))},
+                        workers=1, coalesce_secs=0, per_minute=0)
+    monkeypatch.setattr(monitor_drawdown, "get_dispatcher", lambda: d)
+    monkeypatch.setattr(monitor_drawdown, "log_alert", lambda record: None)
+    monitor = DrawdownMonitor(["SYM"], [1], threshold=2.5, results_dir=str(tmp_path),
+                              use_watchdog=False)
+    write_rows(tmp_path / "SYM_equity_1.csv", [100, 97], mode="w")
+    monitor.poll()
+    try:
+        assert d.flush(5)
+        assert sent == ["Max drawdown reached -3.00% (threshold 2.5%)"]
+    finally:
+        d.close(5)
+
+
+def test_watchdog_marks_new_files_dirty(tmp_path):
+    pytest.importorskip("watchdog")
+    alerts = []
+    monitor = DrawdownMonitor(["SYM"], [1], threshold=5.0, results_dir=str(tmp_path),
+                              on_alert=lambda *a: alerts.append(a))
+    try:
+        assert monitor.observer is not None
+        monitor.poll()
+        write_rows(tmp_path / "SYM_equity_1.csv", [100, 50], mode="w")
+        assert monitor.wakeup.wait(5)
+        monitor.poll()
+        assert alerts and alerts[0][:2] == ("SYM", 1)
+        # Unrelated files never reach the tails
+        (tmp_path / "other.csv").write_text("x\n")
+        monitor.mark_dirty(str(tmp_path / "other.csv"))
+        assert monitor._dirty <= set(monitor.targets)
+    finally:
+        monitor.close()
+
+
+def test_open_desktop_popups_do_not_hold_dispatcher_workers(monkeypatch):
+    dismissed = threading.Event()
+
+    def message_box(hwnd, text, caption, flags):    # modal: returns once dismissed
+        dismissed.wait(10)
+
+    monkeypatch.setattr(ctypes, "windll", SimpleNamespace(user32=SimpleNamespace(MessageBoxW=message_box)),
+                        raising=False)
+    slack = []
+    d = AlertDispatcher({"desktop": CallableChannel(send_desktop_alert),
+                         "slack": CallableChannel(lambda s, b: slack.append(s))},
+                        workers=1, coalesce_secs=0, per_minute=0)
+    for i in range(3):
+        d.submit("desktop", f"Drawdown Alert: SYM #{i}", "dd", key=i)
+    d.submit("slack", "Drawdown Alert: SYM #0", "dd")
+    try:
+        assert d.flush(5)
+        assert slack == ["Drawdown Alert: SYM #0"] and d.stats["sent"] == 4
+    finally:
+        dismissed.set()
+        d.close(5)
@@ -0,0 +1,104 @@
+# test_optimize_params.py
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+pytest.importorskip("utils.logger")
+pytest.importorskip("strategies")
+
+import optimize_params as op
+from test_streaming_strategy import make_bars
+
+N_COMBOS = int(np.prod([len(v) for v in op.param_grid.values()]))
+
+
+def fake_strategy(df, test_mode=False, **combo):
+    pnl = combo["take_profit_pips"] - combo["stop_loss_pips"] + combo["atr_multiplier"]
+    trades = [{"pnl": pnl}, {"pnl": -1.0}]
+    return df, trades, np.array([1000.0, 1000.0 + pnl, 999.0 + pnl]), None, None
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(op, "run_strategy", fake_strategy)
+    monkeypatch.setattr(op, "MAX_WORKERS", 2)
+    (tmp_path / "data").mkdir()
+    make_bars(300).to_csv(tmp_path / "data" / "NAS100.csv", index=False)
+    return tmp_path, str(tmp_path / "results" / "opt.csv")
+
+
+def keys(path):
+    df = pd.read_csv(path)
+    return [op._combo_key(r["symbol"], r) for _, r in df.iterrows()]
+
+
+def test_unterminated_last_row_is_ignored_then_cut(tmp_path):
+    path = tmp_path / "opt.csv"
+    rows = [{"symbol": "NAS100", **dict(zip(op.param_grid, vals)), "trades": 2, "win_rate": 50.0,
+             "avg_return": 0.1, "sharpe": 1.0} for vals in [(10, 10, 20, 0.5, 10, 1.0),
+                                                            (20, 10, 20, 0.5, 10, 1.0)]]
+    op.append_results(rows[:1], str(path))
+    with open(path, "a") as f:
+        f.write("NAS100,30,10,20,0.5,10,1.0,2,50.0,0.1,1")   # crash mid-row: the sharpe parses
+    assert op._complete_length(str(path)) < path.stat().st_size
+    assert op.load_completed(str(path)) == {op._combo_key("NAS100", rows[0])}
+
+    op.append_results(rows[1:], str(path))
+    text = path.read_text()
+    assert text.endswith("\n") and text.count("\n") == 3 and ",30,10," not in text
+    assert op.load_completed(str(path)) == {op._combo_key("NAS100", r) for r in rows}
+
+
+def test_resume_finishes_a_partial_run(workspace):
+    tmp_path, out = workspace
+    op.main(chunk_size=7, output_csv=out)            # 7 does not divide the grid: partial last chunk
+    full = keys(out)
+    assert len(full) == len(set(full)) == N_COMBOS
+
+    lines = open(out).read().splitlines(keepends=True)
+    with open(out, "w") as f:                        # killed after 100 rows and half of the next
+        f.writelines(lines[:101])
+        f.write(lines[101][:15])
+    op.main(resume=True, chunk_size=7, output_csv=out)
+    resumed = keys(out)
+    assert len(resumed) == N_COMBOS and set(resumed) == set(full)
+    assert resumed[:100] == full[:100]                # kept, not recomputed
+
+
+def test_plain_rerun_and_changed_data_start_fresh(workspace, capsys):
+    tmp_path, out = workspace
+    op.main(chunk_size=16, output_csv=out)
+    op.main(resume=True, chunk_size=16, output_csv=out)
+    assert "already in" in capsys.readouterr().out     # nothing to redo on identical inputs
+
+    op.main(chunk_size=16, output_csv=out)              # the default recomputes everything
+    assert "already in" not in capsys.readouterr().out and len(keys(out)) == N_COMBOS
+
+    make_bars(400).to_csv(tmp_path / "data" / "NAS100.csv", index=False)
+    op.main(resume=True, chunk_size=16, output_csv=out)
+    printed = capsys.readouterr().out
+    assert "starting fresh" in printed and "already in" not in printed
+    assert len(keys(out)) == N_COMBOS
+
+
+def test_each_csv_is_loaded_once_per_symbol(workspace, monkeypatch, capsys):
+    tmp_path, out = workspace
+    make_bars(250, seed=3).to_csv(tmp_path / "data" / "US30.csv", index=False)
+    log = tmp_path / "loads.txt"
+    real = op.load_bars
+
+    def counting_load(path, *a, **kw):
+        with open(log, "a") as f:                     # a file, so loads in workers count too
+            f.write(os.path.basename(path) + "\n")
+        return real(path, *a, **kw)
+
+    monkeypatch.setattr(op, "load_bars", counting_load)
+    op.main(chunk_size=5, output_csv=out)
+    assert sorted(log.read_text().split()) == ["NAS100.csv", "US30.csv"]
+    assert len(keys(out)) == 2 * N_COMBOS
+    assert f"for {N_COMBOS} combos; per-combo loading would have cost" in capsys.readouterr().out
@@ -0,0 +1,139 @@
+# test_order_executor.py
+
+import threading
+import time
+from types import SimpleNamespace
+
+from order_executor import LatencyHistogram, OrderExecutor, client_order_id
+
+
+class SimBroker:
+    """Order API subset with scripted retcodes and optional lost replies."""
+
+    TRADE_ACTION_DEAL = 1
+    ORDER_TYPE_BUY, ORDER_TYPE_SELL = 0, 1
+    ORDER_TIME_GTC = 0
+    ORDER_FILLING_RETURN = 2
+    TRADE_RETCODE_DONE = 10009
+    TRADE_RETCODE_REQUOTE = 10004
+    TRADE_RETCODE_INVALID_STOPS = 10016
+
+    def __init__(self, script=(), lose_replies=0, delay=0.0):
+        self.script = list(script)
+        self.lose_replies = lose_replies
+        self.delay = delay
+        self.sent = []
+        self.positions = []
+        self.deals = []
+        self.history_calls = 0
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def symbol_info_tick(self, symbol):
+        return SimpleNamespace(bid=100.0, ask=100.5)
+
+    def positions_get(self, symbol=None):
+        return tuple(p for p in self.positions if p.symbol == symbol)
+
+    def history_deals_get(self, date_from, date_to, group=None):
+        self.history_calls += 1
+        return tuple(d for d in self.deals if d.symbol == group)
+
+    def order_send(self, request):
+        self.gate.wait()
+        time.sleep(self.delay)
+        self.sent.append(request)
+        code = self.script.pop(0) if self.script else self.TRADE_RETCODE_DONE
+        if code == self.TRADE_RETCODE_DONE:
+            ticket = len(self.sent)
+            self.positions.append(SimpleNamespace(symbol=request["symbol"], ticket=ticket,
+                                                  price_open=request["price"],
+                                                  comment=request["comment"]))
+            self.deals.append(SimpleNamespace(symbol=request["symbol"], order=ticket,
+                                              price=request["price"], comment=request["comment"]))
+            if self.lose_replies:
+                self.lose_replies -= 1
+                return None
+            return SimpleNamespace(retcode=code, order=ticket, price=request["price"])
+        return SimpleNamespace(retcode=code, order=0, price=0.0)
+
+
+def intent(**kw):
+    return {"symbol": "NAS100.a", "side": "long", "volume": 1.0, "sl": 99.0, "tp": 102.0,
+            "signal_time": "2024-01-02T10:00:00", **kw}
+
+
+def test_requote_is_retried_then_filled():
+    broker = SimBroker(script=[10004, 10004])
+    ex = OrderExecutor(broker, backoff=0, sleep=lambda s: None)
+    cid = ex.submit(intent())
+    ex.close()
+    r = ex.results[cid]
+    assert (r["status"], r["attempts"], r["price"]) == ("filled", 3, 100.5)
+    assert broker.sent[0]["comment"] == cid and broker.sent[0]["type"] == broker.ORDER_TYPE_BUY
+    assert ex.fill_latency.n == 1
+
+
+def test_permanent_rejection_is_not_retried():
+    broker = SimBroker(script=[10016])
+    ex = OrderExecutor(broker, backoff=0)
+    cid = ex.submit(intent(side="short"))
+    ex.close()
+    assert ex.results[cid]["status"] == "rejected" and len(broker.sent) == 1
+
+
+def test_duplicate_signal_and_lost_reply_send_once():
+    broker = SimBroker(lose_replies=1)
+    ex = OrderExecutor(broker, backoff=0, sleep=lambda s: None)
+    cid = ex.submit(intent())
+    assert ex.submit(intent()) == cid
+    ex.close()
+    assert len(broker.sent) == 1
+    assert ex.results[cid]["status"] == "filled" and ex.results[cid]["ticket"] == 1
+
+
+def test_deal_history_is_read_once_per_symbol_and_after_lost_replies():
+    broker = SimBroker()
+    ex = OrderExecutor(broker, backoff=0, sleep=lambda s: None)
+    for i in range(10):
+        ex.submit(intent(signal_time=i))
+    ex.close()
+    assert len(broker.sent) == 10 and broker.history_calls == 1
+
+    # Filled by an earlier run and since closed: only the deal history knows
+    broker.positions.clear()
+    restarted = OrderExecutor(broker, backoff=0, sleep=lambda s: None)
+    cid = restarted.submit(intent(signal_time=3))
+    restarted.close()
+    assert len(broker.sent) == 10 and restarted.results[cid]["status"] == "filled"
+
+    # A lost reply for a position closed straight away is found by re-reading the history
+    broker.lose_replies = 1
+    broker.positions_get = lambda symbol=None: ()
+    lost = OrderExecutor(broker, backoff=0, sleep=lambda s: None)
+    cid = lost.submit(intent(signal_time="new"))
+    lost.close()
+    assert len(broker.sent) == 11 and lost.results[cid]["ticket"] == 11
+    assert broker.history_calls == 4
+
+
+def test_submit_never_blocks_on_the_broker():
+    broker = SimBroker()
+    broker.gate.clear()  # broker hangs
+    ex = OrderExecutor(broker, max_queue=2)
+    t0 = time.perf_counter()
+    ids = [ex.submit(intent(signal_time=i)) for i in range(5)]
+    assert time.perf_counter() - t0 < 0.05
+    assert ids.count(None) >= 2 and ex.dropped == ids.count(None)
+    broker.gate.set()
+    ex.close()
+    assert len(ex.results) == 5 - ex.dropped
+
+
+def test_histogram_percentiles():
+    h = LatencyHistogram()
+    for ms in [3] * 90 + [150] * 10:
+        h.add(ms)
+    assert h.percentile(50) == 5 and h.percentile(95) == 150
+    assert client_order_id("A", "long", 1) != client_order_id("A", "short", 1)
+    assert len(client_order_id("NAS100.a", "long", "2024-01-02T10:00:00")) <= 31
@@ -0,0 +1,24 @@
+# test_session_pnl.py
+
+from session_pnl import SessionPnL, session_of
+
+
+def test_session_boundary_respects_reset_hour():
+    assert session_of("2024-03-05 21:59", reset_hour=22) == "2024-03-04"
+    assert session_of("2024-03-05 22:00", reset_hour=22) == "2024-03-05"
+
+
+def test_daily_total_resets_and_round_trips():
+    pnl = SessionPnL(reset_hour=0)
+    pnl.add("2024-03-04 10:00", -30.0)
+    pnl.add("2024-03-04 15:00", 10.0)
+    assert pnl.today == -20.0
+
+    pnl = SessionPnL.from_dict(pnl.to_dict())
+    assert pnl.roll("2024-03-04 23:55") is False and pnl.today == -20.0
+    assert pnl.roll("2024-03-05 00:00") is True and pnl.today == 0.0
+    pnl.add("2024-03-05 09:00", -5.0)
+
+    s = pnl.summary()
+    assert (s["trades"], s["wins"], s["losses"]) == (3, 1, 2)
+    assert s["avg_loss"] == -17.5 and s["profit_factor"] == 10.0 / 35.0
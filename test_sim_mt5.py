@@ -0,0 +1,125 @@
+# test_sim_mt5.py
+
+import importlib
+import sys
+
+import numpy as np
+import pytest
+
+pytest.importorskip("pyarrow")
+
+import sim_mt5
+from bar_store import BarStore
+from candle_cache import CandleCache
+from order_executor import OrderExecutor
+from test_streaming_strategy import make_bars
+
+
+@pytest.fixture
+def mt5(tmp_path, monkeypatch):
+    root = str(tmp_path / "store")
+    BarStore(root=root).write("NAS100", "M5", make_bars(600, seed=2))
+    sim_mt5.configure(store_root=root, point=0.1, spread_points=2)
+    monkeypatch.setitem(sys.modules, "MetaTrader5", sim_mt5)
+    return sim_mt5
+
+
+def buy(mt5, **kw):
+    tick = mt5.symbol_info_tick("NAS100.a")
+    return mt5.order_send({"action": mt5.TRADE_ACTION_DEAL, "symbol": "NAS100.a", "volume": 1.0,
+                           "type": mt5.ORDER_TYPE_BUY, "price": tick.ask, **kw})
+
+
+def test_rates_come_from_the_store(mt5):
+    bars = make_bars(600, seed=2)
+    rates = mt5.copy_rates_from_pos("NAS100.a", mt5.TIMEFRAME_M5, 10, 100)
+    assert np.allclose(rates["close"], bars["Close"].to_numpy()[490:590])
+    rng = mt5.copy_rates_range("NAS100.a", mt5.TIMEFRAME_M5, bars["Time"][5], bars["Time"][9])
+    assert len(rng) == 5
+    assert mt5.copy_rates_from_pos("EURUSD.a", mt5.TIMEFRAME_M5, 0, 10) is None
+    # Works behind the candle cache as well
+    cached = CandleCache(mt5, root=str(mt5.terminal().store.root) + "_cache")
+    assert np.array_equal(cached.copy_rates_from_pos("NAS100.a", mt5.TIMEFRAME_M5, 10, 100)["close"],
+                          rates["close"])
+
+
+def test_order_fill_slippage_and_requotes(mt5):
+    t = mt5.terminal()
+    t.slippage_points = 5
+    res = buy(mt5)
+    ask = mt5.symbol_info_tick("NAS100.a").ask
+    assert res.retcode == mt5.TRADE_RETCODE_DONE and ask <= res.price <= ask + 0.5
+    assert buy(mt5, sl=ask + 10).retcode == mt5.TRADE_RETCODE_INVALID_STOPS
+    t.requote_rate = 1.0
+    assert buy(mt5).retcode == mt5.TRADE_RETCODE_REQUOTE
+    assert mt5.positions_total() == 1
+
+
+def test_replay_triggers_take_profit_and_records_deals(mt5):
+    t = mt5.terminal()
+    t.set_time(make_bars(600, seed=2)["Time"][300])
+    entry = buy(mt5, tp=mt5.symbol_info_tick("NAS100.a").ask + 0.5).price
+    for _ in range(200):
+        if not mt5.positions_total():
+            break
+        t.advance_bars("NAS100.a")
+    assert mt5.positions_total() == 0
+    out = [d for d in mt5.history_deals_get(0, 2**40, group="NAS*") if d.entry == mt5.DEAL_ENTRY_OUT]
+    assert out[0].reason == mt5.DEAL_REASON_TP and out[0].profit == pytest.approx(out[0].price - entry)
+    assert mt5.history_deals_get(0, 2**40, group="*,!NAS*") == ()
+
+
+def test_clock_jump_applies_stops_hit_on_skipped_bars(mt5):
+    bars = make_bars(600, seed=2)
+    t = mt5.terminal()
+    t.set_time(bars["Time"][300])
+    entry = buy(mt5, tp=mt5.symbol_info_tick("NAS100.a").ask + 0.5).price
+    later = bars.iloc[301:]
+    first = later.index[(later["High"] >= entry + 0.5).to_numpy()][0]
+    # Jump well past the bar that hit the target; the last visible bar alone may not
+    t.set_time(bars["Time"][first + 50])
+    assert mt5.positions_total() == 0
+    out = [d for d in mt5.history_deals_get(0, 2**40) if d.entry == mt5.DEAL_ENTRY_OUT]
+    assert out[0].reason == mt5.DEAL_REASON_TP and out[0].price == pytest.approx(entry + 0.5)
+    assert out[0].time == int(bars["Time"][first].timestamp())
+
+
+def test_live_stack_runs_against_the_simulator(mt5):
+    res = buy(mt5)
+    tick = mt5.symbol_info_tick("NAS100.a")
+    mt5.order_send({"action": mt5.TRADE_ACTION_DEAL, "symbol": "NAS100.a", "volume": 1.0,
+                    "type": mt5.ORDER_TYPE_SELL, "price": tick.bid, "position": res.order})
+    live_data = importlib.reload(importlib.import_module("live_data"))
+    trades = live_data.get_live_trades("NAS100.a")
+    assert list(trades["P/L"]) == [0.0, pytest.approx(-0.2)]
+
+    ex = OrderExecutor(mt5)
+    ids = [ex.submit({"symbol": "NAS100.a", "side": "short", "volume": 1.0, "signal_time": i})
+           for i in range(20)]
+    ex.close()
+    assert all(ex.results[i]["status"] == "filled" for i in ids)
+    assert mt5.positions_total() == 20
+
+
+def test_restarted_executor_does_not_resend_a_signal(mt5):
+    intent = {"symbol": "NAS100.a", "side": "long", "volume": 1.0, "signal_time": "2024-01-02T10:00"}
+    first = OrderExecutor(mt5)
+    cid = first.submit(intent)
+    first.close()
+    ticket = first.results[cid]["ticket"]
+
+    # A second process sees the open position carrying the client ID
+    second = OrderExecutor(mt5)
+    assert second.submit(intent) == cid
+    second.close()
+    assert mt5.positions_total() == 1 and second.results[cid]["ticket"] == ticket
+
+    # ... and the deal history once that position has been closed
+    tick = mt5.symbol_info_tick("NAS100.a")
+    mt5.order_send({"action": mt5.TRADE_ACTION_DEAL, "symbol": "NAS100.a", "volume": 1.0,
+                    "type": mt5.ORDER_TYPE_SELL, "price": tick.bid, "position": ticket})
+    third = OrderExecutor(mt5)
+    third.submit(intent)
+    third.close()
+    assert mt5.positions_total() == 0 and third.results[cid]["status"] == "filled"
+    assert len(mt5.history_deals_get(0, 2**40)) == 2
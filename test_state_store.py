@@ -0,0 +1,75 @@
+# test_state_store.py
+
+import gc
+import json
+import weakref
+
+from state_store import StateStore
+
+
+def test_batched_updates_resume_from_last_flush(tmp_path):
+    path = str(tmp_path / "state.json")
+    store = StateStore(path, defaults={"last_ts": None}, flush_every=10, flush_secs=1e9,
+                       compact_every=1000)
+    for i in range(25):
+        store.update(last_ts=i, balance=100.0 + i)
+    assert store.flushes == 2
+
+    # Simulated crash: the unflushed tail (bars 20..24) is lost, the rest resumes
+    resumed = StateStore(path, flush_every=10, flush_secs=1e9)
+    assert resumed.state == {"last_ts": 19, "balance": 119.0}
+
+
+def test_compaction_and_close_write_plain_snapshot(tmp_path):
+    path = str(tmp_path / "state.json")
+    with StateStore(path, flush_every=1, compact_every=3) as store:
+        for i in range(7):
+            store.update(last_ts=i)
+        assert store.compactions == 2
+    with open(path) as f:
+        assert json.load(f) == {"last_ts": 6}
+    assert (tmp_path / "state.json.journal").read_text() == ""
+
+
+def test_torn_journal_line_is_ignored(tmp_path):
+    path = str(tmp_path / "state.json")
+    store = StateStore(path, flush_every=1, compact_every=1000)
+    store.update(last_ts=1)
+    store.update(last_ts=2)
+    with open(store.journal_path, "a") as f:
+        f.write('{"last_ts": 3, "bal')
+    assert StateStore(path).state["last_ts"] == 2
+
+
+def test_callables_evaluated_once_per_flush(tmp_path):
+    calls = []
+
+    def snapshot():
+        calls.append(1)
+        return {"n": len(calls)}
+
+    store = StateStore(str(tmp_path / "state.json"), flush_every=50, flush_secs=1e9)
+    for i in range(100):
+        store.update(last_ts=i, engine=snapshot)
+    assert len(calls) == 2 and store.state["engine"] == {"n": 2}
+
+
+def test_replace_deletes_missing_keys_across_restarts(tmp_path):
+    path = str(tmp_path / "state.json")
+    store = StateStore(path, defaults={"last_ts": None}, flush_every=1, compact_every=1000)
+    store.update(last_ts=1, stale=True, optimized_params={"tp": 30})
+    store.replace({"last_ts": 2, "optimized_params": {}})
+    assert store.state == {"last_ts": 2, "optimized_params": {}}
+    assert StateStore(path).state == {"last_ts": 2, "optimized_params": {}}
+    store.close()
+    assert StateStore(path).state == {"last_ts": 2, "optimized_params": {}}
+
+
+def test_closed_store_is_not_kept_alive(tmp_path):
+    store = StateStore(str(tmp_path / "state.json"))
+    store.update(last_ts=1)
+    ref = weakref.ref(store)
+    store.close()
+    del store
+    gc.collect()
+    assert ref() is None
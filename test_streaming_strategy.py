@@ -0,0 +1,82 @@
+# test_streaming_strategy.py
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from metrics import pnl_array
+from streaming_strategy import RollingSMA, RollingStochastic, StreamingStrategy, WilderATR
+
+
+def make_bars(n=3000, seed=7):
+    rng = np.random.default_rng(seed)
+    close = 15000 + np.cumsum(rng.normal(0, 2.0, n))
+    open_ = np.r_[close[0], close[:-1]] + rng.normal(0, 0.5, n)
+    high = np.maximum(open_, close) + rng.random(n) * 3
+    low = np.minimum(open_, close) - rng.random(n) * 3
+    return pd.DataFrame({
+        "Time": pd.date_range("2024-01-01", periods=n, freq="5min"),
+        "Open": open_, "High": high, "Low": low, "Close": close,
+    })
+
+
+def test_indicators_match_pandas():
+    df = make_bars(500)
+    sma, stoch, atr = RollingSMA(50), RollingStochastic(14, 3), WilderATR(10)
+    smas, ks, ds, atrs = [], [], [], []
+    for row in df.itertuples():
+        s = sma.update(row.Close)
+        smas.append(np.nan if s is None else s)
+        k, d = stoch.update(row.High, row.Low, row.Close)
+        ks.append(np.nan if k is None else k)
+        ds.append(np.nan if d is None else d)
+        a = atr.update(row.High, row.Low, row.Close)
+        atrs.append(np.nan if a is None else a)
+
+    np.testing.assert_allclose(smas, df["Close"].rolling(50).mean(), rtol=1e-12)
+    ll = df["Low"].rolling(14).min()
+    hh = df["High"].rolling(14).max()
+    k_ref = 100 * (df["Close"] - ll) / (hh - ll)
+    np.testing.assert_allclose(ks, k_ref, rtol=1e-9)
+    np.testing.assert_allclose(ds, k_ref.rolling(3).mean(), rtol=1e-9)
+
+    prev = df["Close"].shift(1)
+    tr = pd.concat([df["High"] - df["Low"], (df["High"] - prev).abs(), (df["Low"] - prev).abs()], axis=1).max(axis=1)
+    atr_ref = np.full(len(df), np.nan)
+    atr_ref[9] = tr.iloc[:10].mean()
+    for i in range(10, len(df)):
+        atr_ref[i] = (atr_ref[i - 1] * 9 + tr.iloc[i]) / 10
+    np.testing.assert_allclose(atrs, atr_ref, rtol=1e-9)
+
+
+def test_snapshot_resume_matches_uninterrupted_run():
+    df = make_bars()
+    params = dict(take_profit_pips=40, stop_loss_pips=20, test_mode=True)
+
+    full = StreamingStrategy(**params)
+    trades_full, equity_full = full.run(df)
+    assert trades_full, "fixture should produce trades"
+
+    first = StreamingStrategy(**params)
+    trades_a, equity_a = first.run(df.iloc[:1700])
+    restored = StreamingStrategy.from_snapshot(json.loads(json.dumps(first.snapshot())))
+    trades_b, equity_b = restored.run(df.iloc[1700:])
+
+    assert trades_a + trades_b == trades_full
+    assert equity_a + equity_b == equity_full
+
+
+@pytest.mark.parametrize("params", [dict(test_mode=True), dict(take_profit_pips=20, stop_loss_pips=30)])
+def test_parity_with_batch_run_strategy(params):
+    pytest.importorskip("strategies")
+    from strategies.strategy_sma_stoch_rr_v2 import run_strategy
+
+    df = make_bars(5000, seed=11)
+    _, ref_trades, _, _, _ = run_strategy(df.copy(), **params)
+    if isinstance(ref_trades, pd.DataFrame):
+        ref_trades = ref_trades.to_dict("records")
+    trades, _ = StreamingStrategy(**params).run(df)
+    assert len(trades) == len(ref_trades)
+    np.testing.assert_allclose(pnl_array(trades), pnl_array(ref_trades), rtol=1e-9, atol=1e-9)
@@ -0,0 +1,131 @@
+# test_vectorized_backtest.py
+
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicators import true_range, wilder_atr
+from metrics import pnl_array
+from streaming_strategy import StreamingStrategy
+from test_streaming_strategy import make_bars
+from vectorized_backtest import run_strategy_vectorized, select_run_strategy
+
+PARAM_SETS = [
+    dict(),
+    dict(test_mode=True),
+    dict(test_mode=True, take_profit_pips=10, stop_loss_pips=30, atr_period=14, atr_multiplier=1.5),
+    dict(test_mode=True, use_atr_stop=True, atr_stop_multiplier=0.5, sma50_distance_pips=40),
+    dict(take_profit_pips=20, sma50_distance_pips=200, min_candle_size_pips=1.0, pip_factor=1.0),
+]
+
+DATA_CSVS = sorted(
+    p for p in glob.glob(os.path.join("data", "**", "*.csv"), recursive=True)
+    if not any(tag in p.lower() for tag in ("_results.csv", "mock_", "_raw.csv"))
+)
+
+
+def load_csv(path):
+    df = pd.read_csv(path)
+    df.rename(columns={c: c.capitalize() for c in df.columns
+                       if c.lower() in ("time", "open", "high", "low", "close", "volume")},
+              inplace=True)
+    if "Time" not in df.columns or not {"Open", "High", "Low", "Close"} <= set(df.columns):
+        pytest.skip(f"{path} is not an OHLC file")
+    df["Time"] = pd.to_datetime(df["Time"], errors="coerce")
+    return df.dropna(subset=["Time", "Open", "High", "Low", "Close"]).reset_index(drop=True)
+
+
+def assert_same_trade(a, b):
+    if a is None or b is None:
+        assert a is b
+        return
+    assert a.keys() == b.keys()
+    for key, value in a.items():
+        if isinstance(value, float):
+            assert value == pytest.approx(b[key], rel=1e-12), key
+        else:
+            assert value == b[key], key
+
+
+def assert_parity(df, params):
+    _, trades, equity_curve, _, extra = run_strategy_vectorized(df, **params)
+    engine = StreamingStrategy(**params)
+    ref_trades, ref_equity = engine.run(df)
+
+    assert len(trades) == len(ref_trades)
+    for a, b in zip(trades, ref_trades):
+        assert_same_trade(a, b)
+    np.testing.assert_allclose(equity_curve, ref_equity, rtol=1e-12)
+    assert (extra["wins"], extra["losses"]) == (engine.wins, engine.losses)
+    assert_same_trade(extra["open_position"], engine.position)
+    return trades
+
+
+def assert_batch_parity(df, params):
+    pytest.importorskip("strategies")
+    run_strategy = select_run_strategy(vectorized=False)
+    _, ref_trades, _, _, _ = run_strategy(df.copy(), **params)
+    if isinstance(ref_trades, pd.DataFrame):
+        ref_trades = ref_trades.to_dict("records")
+    _, trades, _, _, _ = run_strategy_vectorized(df, **params)
+    assert len(trades) == len(ref_trades)
+    np.testing.assert_allclose(pnl_array(trades), pnl_array(ref_trades), rtol=1e-9, atol=1e-9)
+
+
+@pytest.mark.parametrize("params", PARAM_SETS)
+def test_parity_synthetic(params):
+    assert_parity(make_bars(5000, seed=11), params)
+
+
+@pytest.mark.parametrize("params", PARAM_SETS[:3])
+def test_parity_with_batch_run_strategy(params):
+    assert_batch_parity(make_bars(5000, seed=11), params)
+
+
+def test_parity_produces_trades():
+    assert len(assert_parity(make_bars(5000, seed=3), dict(test_mode=True))) > 100
+
+
+@pytest.mark.skipif(not DATA_CSVS, reason="no CSVs under data/")
+@pytest.mark.parametrize("path", DATA_CSVS)
+@pytest.mark.parametrize("params", PARAM_SETS[:3])
+def test_parity_data_csvs(path, params):
+    df = load_csv(path)
+    assert_parity(df, params)
+    assert_batch_parity(df, params)
+
+
+@pytest.mark.parametrize("period", [1, 2, 10, 14, 100])
+def test_wilder_atr_matches_recurrence(period):
+    rng = np.random.default_rng(period)
+    close = 100 + np.cumsum(rng.normal(0, 1, 1000))
+    high, low = close + rng.random(1000), close - rng.random(1000)
+    tr = true_range(high, low, close)
+    ref = np.full(1000, np.nan)
+    ref[period - 1] = tr[:period].mean()
+    for i in range(period, 1000):
+        ref[i] = (ref[i - 1] * (period - 1) + tr[i]) / period
+    np.testing.assert_allclose(wilder_atr(high, low, close, period), ref, rtol=1e-12)
+    assert np.isnan(wilder_atr(high[:5], low[:5], close[:5], 10)).all()
+
+
+def test_options_are_keyword_only():
+    df = make_bars(200)
+    with pytest.raises(TypeError):
+        run_strategy_vectorized(df, 100_000.0)
+    assert select_run_strategy(vectorized=True) is run_strategy_vectorized
+
+
+def test_window_view_matches_frame_slice():
+    from window_planner import to_bar_arrays, window_view
+
+    df = make_bars(4000, seed=5)
+    view = window_view(to_bar_arrays(df), 1000, 3000)
+    _, trades, equity, _, _ = run_strategy_vectorized(view, test_mode=True)
+    _, ref_trades, ref_equity, _, _ = run_strategy_vectorized(
+        df.iloc[1000:3000].reset_index(drop=True), test_mode=True)
+    assert trades == ref_trades and equity == ref_equity
+    assert not view["Close"].flags.writeable
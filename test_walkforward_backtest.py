@@ -0,0 +1,76 @@
+# test_walkforward_backtest.py
+
+from datetime import timedelta
+
+import numpy as np
+import pytest
+
+pytest.importorskip("utils.logger")
+pytest.importorskip("strategies")
+
+import walkforward_backtest as wf
+from test_streaming_strategy import make_bars
+from window_planner import plan_windows
+
+GRID = {"take_profit_pips": [10, 20, 30], "stop_loss_pips": [10, 20]}
+
+
+def fake_strategy(df, test_mode=False, **p):
+    # Deterministic per (window, combo): which combo wins changes across windows
+    close = df["Close"].to_numpy()
+    drift = np.sin(close[0] / 7.0 + p["take_profit_pips"]) * p["stop_loss_pips"]
+    equity = 1000 + np.cumsum(np.r_[0.0, np.diff(close)] * 0.01 + drift / len(close))
+    trades = [{"pnl": float(equity[-1] - 1000)}]
+    return df, trades, equity, None, None
+
+
+def failing_train_chunk(args):
+    symbol, w, _, _, chunk = args
+    if w == 1 and chunk[0][0] == 0:
+        raise RuntimeError("worker died")
+    return real_train_chunk(args)
+
+
+def failing_test_window(args):
+    if args[1] == 3:
+        raise RuntimeError("test blew up")
+    return real_test_window(args)
+
+
+real_train_chunk, real_test_window = wf.score_train_chunk, wf.run_test_window
+
+
+def test_scheduler_records_every_window_in_order(monkeypatch):
+    monkeypatch.setattr(wf, "run_strategy", fake_strategy)
+    monkeypatch.setattr(wf, "param_grid", GRID)
+    monkeypatch.setattr(wf, "USE_VECTORIZED", False)
+    monkeypatch.setattr(wf, "USE_MMAP", False)
+    monkeypatch.setattr(wf, "TRAIN_LENGTH", timedelta(days=1))
+    monkeypatch.setattr(wf, "TEST_LENGTH", timedelta(hours=12))
+    monkeypatch.setattr(wf, "score_train_chunk", failing_train_chunk)
+    monkeypatch.setattr(wf, "run_test_window", failing_test_window)
+    items = [("A", make_bars(1500, seed=1)), ("B", make_bars(1000, seed=2))]
+
+    records, _ = wf.run_wf_parallel(items, max_workers=2, chunk_size=4)
+
+    plans = {sym: plan_windows(df["Time"], wf.TRAIN_LENGTH, wf.TEST_LENGTH) for sym, df in items}
+    assert [(r["symbol"], r["train_start"]) for r in records] == \
+        [(sym, p.train_start) for sym, df in items for p in plans[sym]]
+    by_window = {(r["symbol"], n): r for sym in plans
+                 for n, r in enumerate(x for x in records if x["symbol"] == sym)}
+    for sym in ("A", "B"):
+        assert by_window[(sym, 1)]["error"] == "train: worker died"
+        assert by_window[(sym, 3)]["error"] == "test: test blew up"
+
+    # Every other window tested the combo a sequential search picks (first best in grid order)
+    combos = [dict(zip(GRID, c)) for c in wf.product(*GRID.values())]
+    df = items[0][1]
+    for n, p in enumerate(plans["A"]):
+        if n in (1, 3):
+            continue
+        train = df.iloc[p.i0:p.i1]
+        sharpes = [wf.equity_sharpe(fake_strategy(train, **c)[2]) for c in combos]
+        best = combos[int(np.argmax(sharpes))]
+        row = by_window[("A", n)]
+        assert {k: row[k] for k in GRID} == best and "error" not in row
+        assert row["test_trades"] == 1
@@ -0,0 +1,59 @@
+# test_walkforward_sweep.py
+
+import importlib
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+pytest.importorskip("strategies.strategy_sma_stoch_rr_v2")
+
+import sim_mt5
+from bar_store import BarStore
+from candle_cache import CandleCache
+from test_streaming_strategy import make_bars
+
+
+def fake_config(df, tp, atr_mult):
+    # Deterministic per (slice, combo), and the best combo changes from window to window
+    close = df["Close"].to_numpy()
+    profit = np.sin(close[::25] / 3.0 + tp + atr_mult) * tp
+    return {"wins": int((profit > 0).sum()), "losses": int((profit <= 0).sum()),
+            "trade_log": pd.DataFrame({"profit": profit})}
+
+
+@pytest.fixture
+def sweep(tmp_path, monkeypatch):
+    root = str(tmp_path / "store")
+    BarStore(root=root).write("NAS100", "M5", make_bars(1000, seed=3))
+    sim_mt5.configure(store_root=root)
+    monkeypatch.setitem(sys.modules, "MetaTrader5", sim_mt5)
+    monkeypatch.chdir(tmp_path)
+    wfs = importlib.import_module("walkforward_sweep")
+    monkeypatch.setattr(wfs, "run_config", fake_config)
+    monkeypatch.setattr(wfs, "BARS_PER_WINDOW", 200)
+    monkeypatch.setattr(wfs, "OUT_OF_SAMPLE", 50)
+    monkeypatch.setattr(wfs, "WINDOW_STEP", 60)
+    monkeypatch.setattr(wfs, "RESULTS_DIR", str(tmp_path))
+    yield wfs
+    sys.modules.pop("walkforward_sweep", None)
+
+
+def run(wfs, tmp_path, monkeypatch, rolling):
+    # Fresh cache per mode so neither is served the other's bars
+    cache = CandleCache(sim_mt5, root=str(tmp_path / ("rolling" if rolling else "refetch")))
+    monkeypatch.setattr(wfs, "candles", cache)
+    wfs.main(rolling=rolling)
+    return pd.read_csv(tmp_path / "walkforward_results.csv")
+
+
+def test_rolling_mode_writes_the_same_rows_as_refetching(sweep, tmp_path, monkeypatch):
+    refetch = run(sweep, tmp_path, monkeypatch, rolling=False)
+    rolling = run(sweep, tmp_path, monkeypatch, rolling=True)
+    pd.testing.assert_frame_equal(rolling, refetch)
+    assert len(refetch) == (1000 - 250) // 60 + 1
+    # Position 0 is the newest bar, so every OOS slice is older than its in-sample slice
+    assert (pd.to_datetime(refetch["oos_start"]) < pd.to_datetime(refetch["window_start"])).all()
+    assert refetch["tp"].nunique() > 1
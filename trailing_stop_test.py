@@ -1,14 +1,34 @@
 import pandas as pd
 import numpy as np
 import os
+from indicator_cache import get_cache
+from bar_store import load_bars
+
+def _rolling_atr(high, low, close, period):
+    """(TR, ATR) arrays, ATR as a simple rolling mean of TR with min_periods=1."""
+    prev_close = pd.Series(close).shift(1)
+    tr = pd.concat([
+        pd.Series(high - low),
+        (pd.Series(high) - prev_close).abs(),
+        (pd.Series(low) - prev_close).abs(),
+    ], axis=1).max(axis=1)
+    atr = tr.rolling(window=period, min_periods=1).mean()
+    return tr.to_numpy(), atr.to_numpy()
 
 def calculate_atr(df, period=14):
     df = df.copy()
-    df['H-L'] = df['High'] - df['Low']
-    df['H-PC'] = abs(df['High'] - df['Close'].shift(1))
-    df['L-PC'] = abs(df['Low'] - df['Close'].shift(1))
-    df['TR'] = df[['H-L', 'H-PC', 'L-PC']].max(axis=1)
-    df['ATR'] = df['TR'].rolling(window=period, min_periods=1).mean()
+    high = df['High'].to_numpy(dtype=np.float64)
+    low = df['Low'].to_numpy(dtype=np.float64)
+    close = df['Close'].to_numpy(dtype=np.float64)
+    cache = get_cache()
+    fp = cache.fingerprint(high, low, close)
+    tr, atr = cache.get_or_compute(fp, 'rolling_atr', (period,),
+                                   lambda: _rolling_atr(high, low, close, period))
+    df['H-L'] = high - low
+    df['H-PC'] = np.abs(high - df['Close'].shift(1).to_numpy())
+    df['L-PC'] = np.abs(low - df['Close'].shift(1).to_numpy())
+    df['TR'] = tr
+    df['ATR'] = atr
     return df
 
 def simulate_trades_with_trailing_stop(df, atr_multiplier=3, initial_equity=10000, debug=True):
@@ -82,8 +102,7 @@ def simulate_trades_with_trailing_stop(df, atr_multiplier=3, initial_equity=1000
 
 def main():
     file_path = os.path.join("data", "NAS100_5m.csv")
-    df = pd.read_csv(file_path, parse_dates=['Time'])
-    df.set_index('Time', inplace=True)
+    df = load_bars(file_path).set_index('Time')
 
     df = calculate_atr(df, period=14)
 
@@ -5,9 +5,9 @@ Runs the top-N parameter sets (from results/top_10_params.csv) on fresh out-of-s
 """
 import os
 import pandas as pd
-import numpy as np
 from strategies.strategy_sma_stoch_rr_v2 import run_strategy
 from utils.logger import log
+from metrics import backtest_summary
 
 # Paths
 TOP_PARAMS_CSV = os.path.join('results', 'top_10_params.csv')
@@ -47,23 +47,7 @@ for fname in os.listdir(OOS_FOLDER):
             log(f"OOS error on {symbol} with params {params}: {e}", level='ERROR')
             continue
 
-        total = len(trades)
-        wins = sum(1 for t in trades if t.get('pnl', 0) > 0)
-        win_rate = wins / total * 100 if total > 0 else 0.0
-        avg_ret = sum(t.get('pnl', 0) for t in trades) / total if total > 0 else 0.0
-        returns = np.diff(equity_curve) / equity_curve[:-1]
-        sharpe = (
-            returns.mean() / returns.std(ddof=1) * np.sqrt(len(returns))
-        ) if len(returns) > 1 and returns.std(ddof=1) != 0 else 0.0
-
-        records.append({
-            'symbol': symbol,
-            **params,
-            'trades': total,
-            'win_rate': round(win_rate, 2),
-            'avg_return': round(avg_ret, 4),
-            'sharpe': round(sharpe, 2)
-        })
+        records.append({'symbol': symbol, **params, **backtest_summary(trades, equity_curve)})
 
 # Save the report
 os.makedirs('results', exist_ok=True)
@@ -0,0 +1,233 @@
+# File: vectorized_backtest.py
+"""
+Vectorized drop-in for run_strategy() from strategy_sma_stoch_rr_v2.
+
+All indicators are computed up front as NumPy arrays, entry signals become
+boolean masks, and TP/SL exits are resolved by a small state machine that
+jumps from one signal to the next instead of walking every bar in pandas.
+
+    df_out, trades, equity_curve, debug_log, extra = run_strategy_vectorized(
+        df, take_profit_pips=30, stop_loss_pips=20, atr_period=10)
+
+Trades, equity and wins/losses match StreamingStrategy to floating-point
+rounding (see test_vectorized_backtest.py); the rules are documented in
+streaming_strategy.py.
+
+Scripts pick their engine with select_run_strategy(): the NumPy kernel
+when USE_VECTORIZED=true, otherwise strategy_sma_stoch_rr_v2.run_strategy.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from indicator_cache import get_cache
+from indicators import sma, stochastic, wilder_atr
+from streaming_strategy import (
+    DEFAULT_EQUITY,
+    SMA_PERIOD,
+    STOCH_D_PERIOD,
+    STOCH_K_PERIOD,
+    resolve_params,
+)
+
+# First scan length when searching for an exit; doubles until a hit is found.
+EXIT_SCAN_CHUNK = 256
+# USE_VECTORIZED=true swaps in the NumPy kernel (same return tuple)
+USE_VECTORIZED = os.getenv("USE_VECTORIZED", "False").lower() == "true"
+
+
+def select_run_strategy(vectorized: bool = None):
+    """run_strategy for the backtest scripts, honouring USE_VECTORIZED."""
+    if vectorized is None:
+        vectorized = USE_VECTORIZED
+    if vectorized:
+        return run_strategy_vectorized
+    from strategies.strategy_sma_stoch_rr_v2 import run_strategy
+    return run_strategy
+
+
+def _time_index(data) -> pd.DatetimeIndex:
+    for col in ("Time", "time"):
+        if col in data:
+            return pd.DatetimeIndex(pd.to_datetime(data[col]))
+    return pd.DatetimeIndex(data.index)
+
+
+def _column(data, name: str) -> np.ndarray:
+    """float64 view of a DataFrame column or an array in a column mapping."""
+    return np.asarray(data[name], dtype=np.float64)
+
+
+def compute_indicators(data, atr_period: int, cache=None) -> dict:
+    """
+    Return the indicator arrays the kernel needs, keyed by column name.
+    Arrays come from the shared IndicatorCache, so a parameter grid only
+    computes each (dataset, indicator, params) once.
+    """
+    cache = cache or get_cache()
+    high = _column(data, "High")
+    low = _column(data, "Low")
+    close = _column(data, "Close")
+    fp = cache.fingerprint(high, low, close)
+    k, d = cache.get_or_compute(fp, "stochastic", (STOCH_K_PERIOD, STOCH_D_PERIOD),
+                                lambda: stochastic(high, low, close, STOCH_K_PERIOD, STOCH_D_PERIOD))
+    return {
+        "SMA50": cache.get_or_compute(fp, "sma", (SMA_PERIOD,), lambda: sma(close, SMA_PERIOD)),
+        "%K": k,
+        "%D": d,
+        "ATR": cache.get_or_compute(fp, "wilder_atr", (atr_period,),
+                                    lambda: wilder_atr(high, low, close, atr_period)),
+    }
+
+
+def entry_signals(o, c, ind: dict, params: dict) -> np.ndarray:
+    """Return an int8 array: +1 long signal, -1 short signal, 0 none."""
+    sma50, k, d, atr = ind["SMA50"], ind["%K"], ind["%D"], ind["ATR"]
+    prev_k = np.r_[np.nan, k[:-1]]
+    prev_d = np.r_[np.nan, d[:-1]]
+    dist = params["sma50_distance_pips"] * params["pip_factor"]
+    min_body = params["min_candle_size_pips"] * params["pip_factor"]
+
+    ready = ~(np.isnan(sma50) | np.isnan(d) | np.isnan(atr) | np.isnan(prev_d))
+    long_ = ready & (c > sma50) & ((c - sma50) <= dist) & ((c - o) >= min_body)
+    short = ready & (c < sma50) & ((sma50 - c) <= dist) & ((o - c) >= min_body)
+    if not params["test_mode"]:
+        long_ &= (prev_k <= prev_d) & (k > d) & (d < 50.0)
+        short &= (prev_k >= prev_d) & (k < d) & (d > 50.0)
+
+    signal = np.zeros(len(c), dtype=np.int8)
+    signal[long_] = 1
+    signal[short] = -1
+    return signal
+
+
+def _first_exit(start, direction, sl, tp, high, low):
+    """
+    Index of the first bar >= start touching sl or tp, plus whether the stop
+    was hit.  Returns (None, False) if the position never closes.
+    """
+    n = len(high)
+    chunk = EXIT_SCAN_CHUNK
+    while start < n:
+        stop = min(n, start + chunk)
+        hi, lo = high[start:stop], low[start:stop]
+        if direction > 0:
+            sl_hit, tp_hit = lo <= sl, hi >= tp
+        else:
+            sl_hit, tp_hit = hi >= sl, lo <= tp
+        hit = sl_hit | tp_hit
+        if hit.any():
+            j = int(hit.argmax())
+            return start + j, bool(sl_hit[j])
+        start = stop
+        chunk *= 2
+    return None, False
+
+
+def run_strategy_vectorized(df,
+                            *,
+                            test_mode: bool = False,
+                            initial_equity: float = DEFAULT_EQUITY,
+                            debug: bool = False,
+                            **kwargs):
+    """
+    Backtest df (Open/High/Low/Close plus a Time column or datetime index).
+    Returns (df_out, trades, equity_curve, debug_log, extra) like run_strategy.
+    Options are keyword-only: some run_strategy callers pass a balance as the
+    second positional argument.
+
+    df may also be a mapping of column arrays, e.g. a read-only
+    window_planner.window_view(); the input is never modified or copied and
+    df_out is then a dict of the input columns plus the indicator arrays.
+    """
+    params = resolve_params(test_mode=test_mode, **kwargs)
+    o = _column(df, "Open")
+    h = _column(df, "High")
+    l = _column(df, "Low")
+    c = _column(df, "Close")
+    n = len(c)
+    times = _time_index(df)
+
+    ind = compute_indicators(df, params["atr_period"])
+    signal = entry_signals(o, c, ind, params)
+    if params["use_atr_stop"]:
+        sl_dist = ind["ATR"] * params["atr_stop_multiplier"]
+    else:
+        sl_dist = np.maximum(params["stop_loss_pips"] * params["pip_factor"],
+                             ind["ATR"] * params["atr_multiplier"])
+    tp_dist = params["take_profit_pips"] * params["pip_factor"]
+    lot = params["lot_size"]
+
+    # --- state machine: hop from signal to exit to next signal -------------
+    sig_idx = np.flatnonzero(signal)
+    pnl_at = np.zeros(n)
+    if n:
+        pnl_at[0] = initial_equity
+    trades, debug_log = [], []
+    equity = float(initial_equity)
+    wins = losses = 0
+    open_position = None
+    pos = 0
+    while pos < len(sig_idx):
+        e = int(sig_idx[pos])
+        direction = int(signal[e])
+        entry = float(c[e])
+        sl = entry - direction * float(sl_dist[e])
+        tp = entry + direction * tp_dist
+        position = {
+            "direction": direction,
+            "side": "long" if direction > 0 else "short",
+            "entry_time": times[e].isoformat(),
+            "entry_price": entry,
+            "sl": sl,
+            "tp": tp,
+        }
+        if debug:
+            debug_log.append(f"{position['entry_time']} OPEN {position['side']} @ {entry:.5f} SL {sl:.5f} TP {tp:.5f}")
+
+        j, stopped = _first_exit(e + 1, direction, sl, tp, h, l)
+        if j is None:
+            open_position = position
+            break
+        exit_price = sl if stopped else tp
+        pnl = (exit_price - entry) * direction * lot
+        equity = equity + pnl
+        pnl_at[j] += pnl
+        if pnl > 0:
+            wins += 1
+        else:
+            losses += 1
+        trades.append({
+            **position,
+            "exit_time": times[j].isoformat(),
+            "exit_price": exit_price,
+            "exit_reason": "sl" if stopped else "tp",
+            "pnl": pnl,
+            "equity": equity,
+        })
+        if debug:
+            debug_log.append(f"{times[j].isoformat()} CLOSE {position['side']} @ {exit_price:.5f} PnL {pnl:.5f}")
+        # A new position may open on the exit bar itself
+        pos = int(np.searchsorted(sig_idx, j, side="left"))
+
+    equity_curve = np.cumsum(pnl_at)
+
+    if isinstance(df, pd.DataFrame):
+        df_out = df.copy()
+    else:
+        df_out = dict(df)
+    for name, values in ind.items():
+        df_out[name] = values
+    df_out["signal"] = signal
+    df_out["equity"] = equity_curve
+
+    extra = {
+        "wins": wins,
+        "losses": losses,
+        "final_equity": equity,
+        "open_position": open_position,
+        "params": params,
+    }
+    return df_out, trades, equity_curve.tolist(), debug_log, extra
@@ -8,21 +8,34 @@ Performs walk-forward testing with optional live MT5 data:
 2. Re-optimizes on each train slice using the grid
 3. Validates on the subsequent test slice
 4. Aggregates and writes results to CSV
+
+Work is fanned out over a process pool as (symbol, window, combo-chunk)
+units; each window's test run is scheduled as soon as its training
+chunks finish.  Window boundaries are planned up front as integer row
+offsets (window_planner), and the vectorized engine receives read-only
+array views of each window instead of copies.
 """
 import os
+import queue
+import time
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from itertools import product
-from strategies.strategy_sma_stoch_rr_v2 import run_strategy
+from concurrent.futures import ProcessPoolExecutor
+from vectorized_backtest import USE_VECTORIZED, select_run_strategy
 from utils.logger import log
+from indicator_cache import get_cache, merge_stats, format_stats
+from window_planner import plan_windows, to_bar_arrays, window_view
+from bar_store import STORE_ROOT, load_bars, normalize_bars, open_mmap, write_mmap
+from metrics import as_matrix, equity_sharpe, pnl_array, trade_stats
+
+run_strategy = select_run_strategy()
 
 # Optional MT5 integration
 use_mt5 = os.getenv("USE_MT5", "False").lower() == "true"
 if use_mt5:
     import MetaTrader5 as mt5
-    if not mt5.initialize():
-        raise RuntimeError(f"MT5 init failed: {mt5.last_error()}")
 
 # Configuration
 DATA_FOLDER  = 'data'
@@ -39,39 +52,16 @@ param_grid = {
     'atr_multiplier':       [1.0, 1.5],
 }
 REQUIRED_COLS = ['Open', 'High', 'Low', 'Close']
-records = []
+MAX_WORKERS  = os.cpu_count() or 4
+# Grid combos per work unit
+WF_CHUNK_SIZE = int(os.getenv("WF_CHUNK_SIZE", "24"))
+# USE_MMAP=true: workers memory-map each symbol's bars instead of unpickling frames
+USE_MMAP = os.getenv("USE_MMAP", "False").lower() == "true"
+MMAP_ROOT = os.path.join(STORE_ROOT, "_mmap")
 
-# CSV reader helper
+# CSV reader helper: normalized schema, cached in columnar form by bar_store
 def fetch_csv(path):
-    df = pd.read_csv(path)
-    # Normalize common column names (case-insensitive)
-    col_map = {}
-    for col in df.columns:
-        lower = col.lower()
-        if lower == 'time':
-            col_map[col] = 'Time'
-        elif lower == 'open':
-            col_map[col] = 'Open'
-        elif lower == 'high':
-            col_map[col] = 'High'
-        elif lower == 'low':
-            col_map[col] = 'Low'
-        elif lower == 'close':
-            col_map[col] = 'Close'
-        elif lower == 'volume':
-            col_map[col] = 'Volume'
-    if col_map:
-        df.rename(columns=col_map, inplace=True)
-
-    if 'Time' not in df.columns:
-        raise ValueError("Missing Time column in CSV")
-    # Ensure required OHLC columns exist
-    missing_cols = [c for c in ['Open','High','Low','Close'] if c not in df.columns]
-    if missing_cols:
-        raise ValueError(f"Missing OHLC columns in CSV: {missing_cols}")
-
-    df['Time'] = pd.to_datetime(df['Time'], errors='coerce')
-    return df.dropna(subset=['Time']).sort_values('Time')
+    return load_bars(path)
 
 # MT5 data fetcher
 def fetch_mt5(symbol, start, end):
@@ -85,95 +75,222 @@ def fetch_mt5(symbol, start, end):
     return df[['Time','Open','High','Low','Close','Volume']]
 
 # Build dataset list
-items = []
-if use_mt5:
-    symbols = [s.name for s in mt5.symbols_get() if s.name.endswith('.a')]
-    now = datetime.now()
-    start_dt = now - (TRAIN_LENGTH + TEST_LENGTH)
-    for sym in symbols:
-        log(f"Fetching MT5 data for {sym}")
-        try:
-            df_full = fetch_mt5(sym, start_dt, now)
-        except Exception as e:
-            log(f"MT5 fetch error {sym}: {e}", level='ERROR')
-            continue
-        items.append((sym, df_full))
-else:
-    for root, _, files in os.walk(DATA_FOLDER):
-        # Skip any result or temp CSVs
-        files = [f for f in files if f.lower().endswith('.csv') and not any(tag in f.lower() for tag in ('_results.csv','mock_','_raw.csv'))]
-        for fname in files:
-            path = os.path.join(root, fname)
-            rel  = os.path.relpath(path, DATA_FOLDER)
-            sym  = os.path.splitext(rel.replace(os.sep, '_'))[0]
+def load_items():
+    items = []
+    if use_mt5:
+        if not mt5.initialize():
+            raise RuntimeError(f"MT5 init failed: {mt5.last_error()}")
+        symbols = [s.name for s in mt5.symbols_get() if s.name.endswith('.a')]
+        now = datetime.now()
+        start_dt = now - (TRAIN_LENGTH + TEST_LENGTH)
+        for sym in symbols:
+            log(f"Fetching MT5 data for {sym}")
             try:
-                df_full = fetch_csv(path)
+                df_full = fetch_mt5(sym, start_dt, now)
             except Exception as e:
-                log(f"CSV read error {sym}: {e}", level='ERROR')
+                log(f"MT5 fetch error {sym}: {e}", level='ERROR')
                 continue
             items.append((sym, df_full))
+    else:
+        for root, _, files in os.walk(DATA_FOLDER):
+            # Skip any result or temp CSVs
+            files = [f for f in files if f.lower().endswith('.csv') and not any(tag in f.lower() for tag in ('_results.csv','mock_','_raw.csv'))]
+            for fname in files:
+                path = os.path.join(root, fname)
+                rel  = os.path.relpath(path, DATA_FOLDER)
+                sym  = os.path.splitext(rel.replace(os.sep, '_'))[0]
+                try:
+                    df_full = fetch_csv(path)
+                except Exception as e:
+                    log(f"CSV read error {sym}: {e}", level='ERROR')
+                    continue
+                items.append((sym, df_full))
+    return items
 
-# Walk-forward logic per symbol
-def run_wf(symbol, df_full):
-    if df_full.empty:
-        return
-    missing = [c for c in REQUIRED_COLS if c not in df_full.columns]
-    if missing:
-        log(f"Skipping {symbol}: missing cols {missing}", level='WARN')
+
+# --- worker side -----------------------------------------------------------
+_datasets = {}
+_arrays = {}
+
+
+def _init_worker(datasets):
+    """
+    Pool initializer: every symbol's frame is shipped once per worker.
+    With USE_MMAP the values are write_mmap() folders, mapped read-only here.
+    """
+    global _datasets, _arrays
+    if USE_MMAP:
+        _arrays = {sym: open_mmap(folder) for sym, folder in datasets.items()}
+        if not USE_VECTORIZED:
+            _datasets = {sym: pd.DataFrame(arrays) for sym, arrays in _arrays.items()}
         return
-    start = df_full['Time'].min()
-    end   = df_full['Time'].max()
-    ts = start
-    while ts + TRAIN_LENGTH + TEST_LENGTH <= end:
-        te   = ts + TRAIN_LENGTH
-        tst  = te
-        te2  = tst + TEST_LENGTH
-        df_tr = df_full[(df_full['Time']>=ts)&(df_full['Time']<te)]
-        df_te = df_full[(df_full['Time']>=tst)&(df_full['Time']<te2)]
-        if df_tr.empty or df_te.empty:
-            break
-        # Re-optimize
-        best_sh, best_p = -np.inf, None
-        for combo in product(*param_grid.values()):
-            p = dict(zip(param_grid.keys(), combo))
-            try:
-                _,_,eq_tr,_,_ = run_strategy(df_tr.copy(), test_mode=False, **p)
-            except:
-                continue
-            r = np.diff(eq_tr)/eq_tr[:-1]
-            s = (r.mean()/r.std(ddof=1)*np.sqrt(len(r))) if len(r)>1 and r.std(ddof=1)!=0 else 0.0
-            if s > best_sh:
-                best_sh, best_p = s, p
-        if not best_p:
-            ts += TEST_LENGTH
-            continue
-        # Test
+    _datasets = datasets
+    if USE_VECTORIZED:
+        _arrays = {sym: to_bar_arrays(df) for sym, df in datasets.items()}
+
+
+def window_input(symbol, start, stop):
+    """
+    Rows start:stop for the engine: a zero-copy read-only view for the
+    vectorized kernel, a private copy for run_strategy (which mutates it).
+    """
+    if USE_VECTORIZED:
+        return window_view(_arrays[symbol], start, stop)
+    return _datasets[symbol].iloc[start:stop].copy()
+
+
+def score_train_chunk(args):
+    """Score a chunk of grid combos on one train window."""
+    symbol, w, i0, i1, chunk = args
+    t0 = time.perf_counter()
+    ids, curves = [], []
+    for idx, p in chunk:
         try:
-            _,trds,eq_o,_,_ = run_strategy(df_te.copy(), test_mode=False, **best_p)
-        except:
-            ts += TEST_LENGTH
+            _,_,eq_tr,_,_ = run_strategy(window_input(symbol, i0, i1), test_mode=False, **p)
+        except Exception:
+            continue
+        ids.append(idx)
+        curves.append(eq_tr)
+    # One 2-D pass over the chunk's equity curves
+    sharpes = equity_sharpe(as_matrix(curves)) if curves else []
+    scores = list(zip(ids, map(float, sharpes)))
+    return symbol, w, scores, time.perf_counter() - t0, (os.getpid(), get_cache().stats())
+
+
+def run_test_window(args):
+    """Run the chosen combo on one test window and return its metrics."""
+    symbol, w, i1, i2, p = args
+    t0 = time.perf_counter()
+    _,trds,eq_o,_,_ = run_strategy(window_input(symbol, i1, i2), test_mode=False, **p)
+    stats = trade_stats(pnl_array(trds))
+    metrics = {
+        'test_sharpe':round(equity_sharpe(eq_o),3),
+        'test_win_rate':round(stats['win_rate']*100,2),
+        'test_avg_return':round(stats['avg_return'],4),
+        'test_trades':stats['trades'],
+    }
+    return symbol, w, metrics, time.perf_counter() - t0, (os.getpid(), get_cache().stats())
+
+
+# --- scheduler -------------------------------------------------------------
+def run_wf_parallel(items, max_workers=MAX_WORKERS, chunk_size=WF_CHUNK_SIZE):
+    """Walk-forward every (symbol, window) across a process pool."""
+    combos = [dict(zip(param_grid.keys(), c)) for c in product(*param_grid.values())]
+    chunks = [list(enumerate(combos))[i:i + chunk_size] for i in range(0, len(combos), chunk_size)]
+
+    datasets, plans = {}, {}
+    for symbol, df_full in items:
+        if df_full.empty:
+            continue
+        missing = [c for c in REQUIRED_COLS if c not in df_full.columns]
+        if missing:
+            log(f"Skipping {symbol}: missing cols {missing}", level='WARN')
             continue
-        tot = len(trds)
-        wins = sum(1 for t in trds if t.get('pnl',0)>0)
-        wr   = wins/tot*100 if tot>0 else 0
-        ar   = sum(t.get('pnl',0) for t in trds)/tot if tot>0 else 0
-        ro   = np.diff(eq_o)/eq_o[:-1]
-        so   = (ro.mean()/ro.std(ddof=1)*np.sqrt(len(ro))) if len(ro)>1 and ro.std(ddof=1)!=0 else 0.0
-        records.append({
-            'symbol':symbol,
-            'train_start':ts,'train_end':te,
-            'test_start':tst,'test_end':te2,
-            **best_p,
-            'train_sharpe':round(best_sh,3),'test_sharpe':round(so,3),
-            'test_win_rate':round(wr,2),'test_avg_return':round(ar,4),'test_trades':tot
-        })
-        ts += TEST_LENGTH
-
-# Execute
-for sym, df_full in items:
-    run_wf(sym, df_full)
-
-# Save results
-os.makedirs(os.path.dirname(OOS_RESULTS), exist_ok=True)
-pd.DataFrame(records).to_csv(OOS_RESULTS, index=False)
-print(f"Walk-forward summary saved to {OOS_RESULTS}")
+        # The .npy layout is normalized (sorted, de-duplicated); plan on the same rows
+        datasets[symbol] = normalize_bars(df_full) if USE_MMAP else df_full.reset_index(drop=True)
+        plans[symbol] = plan_windows(datasets[symbol]['Time'], TRAIN_LENGTH, TEST_LENGTH)
+
+    worker_data = datasets
+    if USE_MMAP:
+        worker_data = {}
+        for symbol, df in datasets.items():
+            worker_data[symbol] = os.path.join(MMAP_ROOT, symbol)
+            write_mmap(worker_data[symbol], df)
+
+    order = {symbol: n for n, symbol in enumerate(plans)}
+
+    def window_record(key, **fields):
+        symbol, w = key
+        ts, te, te2 = plans[symbol][w][:3]
+        return {'symbol':symbol,
+                'train_start':ts,'train_end':te,
+                'test_start':te,'test_end':te2,
+                **fields, '_order':(order[symbol], w)}
+
+    scores, pending, train_secs, failed = {}, {}, {}, {}
+    cache_stats, records = {}, []
+    with ProcessPoolExecutor(max_workers=max_workers,
+                             initializer=_init_worker,
+                             initargs=(worker_data,)) as executor:
+        futures = {}   # future -> (symbol, window)
+        # Finished futures arrive through done-callbacks: O(1) per task,
+        # where as_completed/wait would re-register on every pending future
+        finished = queue.SimpleQueue()
+
+        def submit(fn, args, key):
+            future = executor.submit(fn, args)
+            futures[future] = key
+            future.add_done_callback(finished.put)
+
+        for symbol, windows in plans.items():
+            for w, (_, _, _, i0, i1, _) in enumerate(windows):
+                scores[(symbol, w)] = {}
+                pending[(symbol, w)] = len(chunks)
+                train_secs[(symbol, w)] = 0.0
+                for chunk in chunks:
+                    submit(score_train_chunk, (symbol, w, i0, i1, chunk), (symbol, w))
+
+        while futures:
+            done = finished.get()
+            key = futures.pop(done)
+            symbol, w = key
+            i1, i2 = plans[symbol][w][4:]
+            testing = 'best' in scores[key]
+            try:
+                _, _, payload, secs, (pid, stats) = done.result()
+                cache_stats[pid] = stats
+            except Exception as e:
+                stage = 'test' if testing else 'train'
+                log(f"Walk-forward {stage} task failed for {symbol} window {w}: {e}", level='ERROR')
+                if testing:
+                    records.append(window_record(key, error=f"test: {e}"))
+                    continue
+                # Still count the chunk so the window is reported, as failed
+                failed.setdefault(key, f"train: {e}")
+                payload, secs = [], 0.0
+
+            if testing:
+                # Test finished: the window is complete
+                best_p, best_sh = scores[key]['best']
+                records.append(window_record(
+                    key, **best_p,
+                    train_sharpe=round(best_sh,3), **payload,
+                    train_secs=round(train_secs[key],3), test_secs=round(secs,3),
+                ))
+                continue
+
+            scores[key].update(payload)
+            train_secs[key] += secs
+            pending[key] -= 1
+            if pending[key]:
+                continue
+            if key in failed:
+                records.append(window_record(key, error=failed[key]))
+                continue
+            # All chunks in: pick the first combo (grid order) with the best Sharpe
+            best_sh, best_p = -np.inf, None
+            for idx in sorted(scores[key]):
+                if scores[key][idx] > best_sh:
+                    best_sh, best_p = scores[key][idx], combos[idx]
+            if not best_p:
+                log(f"Walk-forward {symbol} window {w}: no combo could be scored", level='WARN')
+                records.append(window_record(key, error="train: no combo could be scored"))
+                continue
+            scores[key] = {'best': (best_p, best_sh)}
+            submit(run_test_window, (symbol, w, i1, i2, best_p), key)
+
+    records.sort(key=lambda r: r['_order'])
+    for r in records:
+        del r['_order']
+    return records, merge_stats(cache_stats.values())
+
+
+if __name__ == '__main__':
+    t0 = time.perf_counter()
+    records, stats = run_wf_parallel(load_items())
+
+    # Save results
+    os.makedirs(os.path.dirname(OOS_RESULTS), exist_ok=True)
+    pd.DataFrame(records).to_csv(OOS_RESULTS, index=False)
+    print(f"Walk-forward summary saved to {OOS_RESULTS} ({time.perf_counter() - t0:.1f}s)")
+    print(format_stats(stats))
@@ -13,8 +13,12 @@ Steps:
    e. Record OOS performance metrics (win rate and expectancy).
 3. Save all window results to CSV and print summary.
 
+By default the full history is fetched once and windows are sliced by
+position (same windows and CSV as refetching each one); --workers N
+evaluates windows in parallel and --refetch restores the per-window fetch.
+
 Usage:
-    python walkforward_sweep.py
+    python walkforward_sweep.py [--workers N] [--refetch]
 
 Output:
     optimize_results/trade_logs/walkforward/walkforward_results.csv
@@ -22,14 +26,17 @@ Output:
 
 import os
 import sys
+import argparse
 import itertools
 import traceback
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
 import MetaTrader5 as mt5
 import pandas as pd
 
 from strategies.strategy_sma_stoch_rr_v2 import run_strategy
+from candle_cache import CandleCache
 
 # === Configuration ===
 SYMBOL = "NAS100.a"
@@ -40,6 +47,10 @@ TIMEFRAME = mt5.TIMEFRAME_M5
 BARS_PER_WINDOW = 2000
 OUT_OF_SAMPLE = 500
 WINDOW_STEP = 500
+# Rolling mode fetches this many bars once (MT5's default chart limit)
+HISTORY_BARS = 100_000
+# Overlapping windows are served from the local bar cache, not the terminal
+candles = CandleCache(mt5)
 
 # Parameter grid
 TP_SPACE = [20, 40, 60]
@@ -60,12 +71,13 @@ def initialize_mt5():
     print(f"[ℹ️] MT5 initialized for {SYMBOL}")
 
 
-def get_data(symbol: str, start_pos: int, bars: int) -> pd.DataFrame:
+def get_data(symbol: str, start_pos: int, bars: int, allow_short: bool = False) -> pd.DataFrame:
     """
-    Fetch `bars` bars starting at `start_pos`. Return None if insufficient data.
+    Fetch `bars` bars starting at `start_pos`. Return None if insufficient data
+    (with allow_short, only if there is none at all).
     """
-    rates = mt5.copy_rates_from_pos(symbol, TIMEFRAME, start_pos, bars)
-    if rates is None or len(rates) < bars:
+    rates = candles.copy_rates_from_pos(symbol, TIMEFRAME, start_pos, bars)
+    if rates is None or len(rates) == 0 or (len(rates) < bars and not allow_short):
         return None
     df = pd.DataFrame(rates)
     df['time'] = pd.to_datetime(df['time'], unit='s')
@@ -73,13 +85,102 @@ def get_data(symbol: str, start_pos: int, bars: int) -> pd.DataFrame:
     return df
 
 
-def main():
-    initialize_mt5()
+def run_config(df: pd.DataFrame, tp: int, atr_mult: float) -> dict:
+    """Run the strategy on one slice with the sweep's fixed settings."""
+    return run_strategy(
+        df,
+        take_profit_pips=tp,
+        stop_loss_pips=tp // 2,
+        pip_factor=PIP_FACTORS[SYMBOL],
+        use_atr_stop=True,
+        atr_stop_multiplier=atr_mult,
+        atr_period=10,
+        atr_multiplier=1.0,
+        sma50_distance_pips=30,
+        min_candle_size_pips=0.5,
+        min_leg_move=0.3,
+        max_leg_gap=10,
+        initial_equity=1000.0
+    )
+
+
+def evaluate_window(insample_df: pd.DataFrame, oos_df: pd.DataFrame) -> dict:
+    """Pick the best in-sample TP/ATR combo and test it out-of-sample."""
+    # In-sample optimization
+    best_cfg = None
+    best_exp = -float('inf')
+    for tp, atr_mult in itertools.product(TP_SPACE, ATR_MULT_SPACE):
+        res = run_config(insample_df, tp, atr_mult)
+        wins, losses = res['wins'], res['losses']
+        total = wins + losses
+        if total == 0:
+            continue
+        avg_win = res['trade_log']['profit'][res['trade_log']['profit'] > 0].mean() or 0
+        avg_loss = res['trade_log']['profit'][res['trade_log']['profit'] <= 0].mean() or 0
+        exp_val = (wins / total) * avg_win + (losses / total) * avg_loss
+        if exp_val > best_exp:
+            best_exp, best_cfg = exp_val, (tp, atr_mult)
+    print(f"[OPT] Best in-sample TP={best_cfg[0]} ATRmult={best_cfg[1]} (exp={best_exp:.3f})")
+
+    # Out-of-sample test
+    tp, atr_mult = best_cfg
+    oos_res = run_config(oos_df, tp, atr_mult)
+    wins_oos, losses_oos = oos_res['wins'], oos_res['losses']
+    total_oos = wins_oos + losses_oos
+    win_rate_oos = wins_oos / total_oos if total_oos else 0
+    avg_win_oos = oos_res['trade_log']['profit'][oos_res['trade_log']['profit'] > 0].mean() or 0
+    avg_loss_oos = oos_res['trade_log']['profit'][oos_res['trade_log']['profit'] <= 0].mean() or 0
+    exp_oos = win_rate_oos * avg_win_oos + (1 - win_rate_oos) * avg_loss_oos
+    print(f"[OOS] WinRate={win_rate_oos:.2%} Expectancy={exp_oos:.3f}")
+
+    return {
+        'window_start': insample_df['time'].iloc[0],
+        'window_end': insample_df['time'].iloc[-1],
+        'oos_start': oos_df['time'].iloc[0],
+        'tp': tp,
+        'atr_mult': atr_mult,
+        'oos_win_rate': win_rate_oos,
+        'oos_expectancy': exp_oos
+    }
+
+
+def window_slices(n_bars: int):
+    """
+    Row ranges (oldest-first array) matching the refetch loop's positions:
+    in-sample = positions [start, start+BARS_PER_WINDOW), OOS = the
+    OUT_OF_SAMPLE bars before it. Stops where get_data would run dry.
+    """
+    start = 0
+    while start + BARS_PER_WINDOW + OUT_OF_SAMPLE <= n_bars:
+        ins_hi = n_bars - start
+        ins_lo = ins_hi - BARS_PER_WINDOW
+        yield (ins_lo, ins_hi), (ins_lo - OUT_OF_SAMPLE, ins_lo)
+        start += WINDOW_STEP
+
+
+# Per-worker full history, installed once by _init_worker
+_history = None
+
+
+def _init_worker(history):
+    global _history
+    _history = history
+
+
+def _run_slice(task):
+    window_idx, ((ins_lo, ins_hi), (oos_lo, oos_hi)) = task
+    start = len(_history) - ins_hi
+    print(f"\n[INFO] Window #{window_idx}: bars {start} to {start + BARS_PER_WINDOW}")
+    insample_df = _history.iloc[ins_lo:ins_hi].reset_index(drop=True)
+    oos_df = _history.iloc[oos_lo:oos_hi].reset_index(drop=True)
+    return evaluate_window(insample_df, oos_df)
+
+
+def walk_refetch() -> list:
+    """Original mode: fetch both slices from MT5 on every iteration."""
     summary = []
     start = 0
     window_idx = 1
-
-    # Walk-forward loop
     while True:
         print(f"\n[INFO] Window #{window_idx}: bars {start} to {start + BARS_PER_WINDOW}")
         insample_df = get_data(SYMBOL, start, BARS_PER_WINDOW)
@@ -87,76 +188,37 @@ def main():
         if insample_df is None or oos_df is None:
             print("[ℹ️] No more data, finishing.")
             break
-
-        # In-sample optimization
-        best_cfg = None
-        best_exp = -float('inf')
-        for tp, atr_mult in itertools.product(TP_SPACE, ATR_MULT_SPACE):
-            res = run_strategy(
-                insample_df,
-                take_profit_pips=tp,
-                stop_loss_pips=tp // 2,
-                pip_factor=PIP_FACTORS[SYMBOL],
-                use_atr_stop=True,
-                atr_stop_multiplier=atr_mult,
-                atr_period=10,
-                atr_multiplier=1.0,
-                sma50_distance_pips=30,
-                min_candle_size_pips=0.5,
-                min_leg_move=0.3,
-                max_leg_gap=10,
-                initial_equity=1000.0
-            )
-            wins, losses = res['wins'], res['losses']
-            total = wins + losses
-            if total == 0:
-                continue
-            avg_win = res['trade_log']['profit'][res['trade_log']['profit'] > 0].mean() or 0
-            avg_loss = res['trade_log']['profit'][res['trade_log']['profit'] <= 0].mean() or 0
-            exp_val = (wins / total) * avg_win + (losses / total) * avg_loss
-            if exp_val > best_exp:
-                best_exp, best_cfg = exp_val, (tp, atr_mult)
-        print(f"[OPT] Best in-sample TP={best_cfg[0]} ATRmult={best_cfg[1]} (exp={best_exp:.3f})")
-
-        # Out-of-sample test
-        tp, atr_mult = best_cfg
-        oos_res = run_strategy(
-            oos_df,
-            take_profit_pips=tp,
-            stop_loss_pips=tp // 2,
-            pip_factor=PIP_FACTORS[SYMBOL],
-            use_atr_stop=True,
-            atr_stop_multiplier=atr_mult,
-            atr_period=10,
-            atr_multiplier=1.0,
-            sma50_distance_pips=30,
-            min_candle_size_pips=0.5,
-            min_leg_move=0.3,
-            max_leg_gap=10,
-            initial_equity=1000.0
-        )
-        wins_oos, losses_oos = oos_res['wins'], oos_res['losses']
-        total_oos = wins_oos + losses_oos
-        win_rate_oos = wins_oos / total_oos if total_oos else 0
-        avg_win_oos = oos_res['trade_log']['profit'][oos_res['trade_log']['profit'] > 0].mean() or 0
-        avg_loss_oos = oos_res['trade_log']['profit'][oos_res['trade_log']['profit'] <= 0].mean() or 0
-        exp_oos = win_rate_oos * avg_win_oos + (1 - win_rate_oos) * avg_loss_oos
-        print(f"[OOS] WinRate={win_rate_oos:.2%} Expectancy={exp_oos:.3f}")
-
-        # Record
-        summary.append({
-            'window_start': insample_df['time'].iloc[0],
-            'window_end': insample_df['time'].iloc[-1],
-            'oos_start': oos_df['time'].iloc[0],
-            'tp': tp,
-            'atr_mult': atr_mult,
-            'oos_win_rate': win_rate_oos,
-            'oos_expectancy': exp_oos
-        })
+        summary.append(evaluate_window(insample_df, oos_df))
 
         # Advance window
         start += WINDOW_STEP
         window_idx += 1
+    return summary
+
+
+def walk_rolling(history_bars: int = HISTORY_BARS, workers: int = 1) -> list:
+    """Fetch the history once and evaluate position-sliced windows, optionally in parallel."""
+    history = get_data(SYMBOL, 0, history_bars, allow_short=True)
+    if history is None:
+        print("[ℹ️] No data, finishing.")
+        return []
+    slices = list(enumerate(window_slices(len(history)), start=1))
+    print(f"[INFO] {len(history)} bars fetched once -> {len(slices)} windows")
+    if workers <= 1:
+        _init_worker(history)
+        return [_run_slice(b) for b in slices]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(history,)) as executor:
+        # map() keeps window order, so the CSV matches the serial loop
+        return list(executor.map(_run_slice, slices))
+
+
+def main(rolling=True, workers=1, history_bars=HISTORY_BARS):
+    initialize_mt5()
+    if rolling:
+        summary = walk_rolling(history_bars, workers)
+    else:
+        summary = walk_refetch()
 
     # Save results
     out_file = os.path.join(RESULTS_DIR, 'walkforward_results.csv')
@@ -179,4 +241,12 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    p = argparse.ArgumentParser(description="Walk-forward TP/ATR sweep on MT5 data")
+    p.add_argument("--refetch", action="store_true",
+                   help="Fetch every window from MT5 instead of slicing one history fetch")
+    p.add_argument("--workers", type=int, default=1,
+                   help="Processes for evaluating windows in rolling mode")
+    p.add_argument("--history_bars", type=int, default=HISTORY_BARS,
+                   help="Bars fetched once in rolling mode")
+    args = p.parse_args()
+    main(rolling=not args.refetch, workers=args.workers, history_bars=args.history_bars)
@@ -0,0 +1,71 @@
+# File: window_planner.py
+"""
+Integer-offset window planning for walk-forward splits.
+
+plan_windows() turns a sorted time column into (train_start, train_end,
+test_end) row offsets once, up front.  window_view() then hands out
+read-only NumPy views of the bar columns for any window, so walking N
+windows x M combos costs no per-window copies and memory stays flat.
+
+    bars = to_bar_arrays(df)
+    for w in plan_windows(df['Time'], timedelta(days=60), timedelta(days=20)):
+        train = window_view(bars, w.i0, w.i1)
+        test  = window_view(bars, w.i1, w.i2)
+
+Engines that need to mutate their input must copy it themselves.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+BAR_COLUMNS = ('Open', 'High', 'Low', 'Close', 'Volume')
+
+# Rows i0:i1 are the train slice, i1:i2 the test slice
+WindowPlan = namedtuple('WindowPlan', 'train_start train_end test_end i0 i1 i2')
+
+
+def plan_windows(times, train_length, test_length):
+    """
+    Plan rolling windows over a sorted time column, stepping by test_length.
+    Stops at the first window with an empty train or test slice.
+    """
+    times = pd.DatetimeIndex(times)
+    windows = []
+    if len(times) == 0:
+        return windows
+    ts  = times[0]
+    end = times[-1]
+    while ts + train_length + test_length <= end:
+        te  = ts + train_length
+        te2 = te + test_length
+        i0, i1, i2 = (int(i) for i in times.searchsorted([ts, te, te2], side='left'))
+        if i1 == i0 or i2 == i1:
+            break
+        windows.append(WindowPlan(ts, te, te2, i0, i1, i2))
+        ts += test_length
+    return windows
+
+
+def to_bar_arrays(df: pd.DataFrame) -> dict:
+    """
+    Contiguous, read-only column arrays for a bar frame: float64 OHLC(V)
+    plus a datetime64 'Time' column.
+    """
+    arrays = {}
+    if 'Time' in df.columns:
+        arrays['Time'] = pd.DatetimeIndex(df['Time']).to_numpy()
+    else:
+        arrays['Time'] = pd.DatetimeIndex(df.index).to_numpy()
+    for col in BAR_COLUMNS:
+        if col in df.columns:
+            arrays[col] = np.ascontiguousarray(df[col].to_numpy(dtype=np.float64))
+    for arr in arrays.values():
+        arr.flags.writeable = False
+    return arrays
+
+
+def window_view(arrays: dict, start: int, stop: int) -> dict:
+    """Zero-copy slice of every column; views inherit the read-only flag."""
+    return {name: arr[start:stop] for name, arr in arrays.items()}